@@ -0,0 +1,145 @@
+"""Offline end-to-end benchmark of receive_text using the fakes in benchmarks/fakes.py.
+
+Replays language -> wake -> login -> pickup -> dropoff -> options -> selection -> confirm
+against FakeDriver / FakeFirestore and reports per-state latency and allocations.
+
+    python benchmarks/bench_flow.py [--iterations 20] [--scale 1.0] [--zero-latency] [--think 0.5]
+
+--think pauses before each utterance (the rider speaking); it is not counted in the timings
+but gives background work such as the speculative browser prewarm time to run.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import firebase_client  # noqa: E402
+from benchmarks.fakes import SESSION_COOKIE, FakeDriver, FakeFirestore, Latency  # noqa: E402
+
+# (state the utterance is sent in, utterance, state expected afterwards)
+SCRIPT = [
+    ("language_selection", "english", "wake"),
+    ("wake", "wake up nova", "command"),
+    ("command", "book a cab", "login"),
+    ("login", "okay", "pickup"),
+    ("pickup", "mg road metro station", "dropoff"),
+    ("dropoff", "kempegowda airport", "ride_options"),
+    ("ride_options", "show me the options", "ride_selection"),
+    ("ride_selection", "option 2", "confirm_booking"),
+    ("confirm_booking", "yes confirm", "command"),
+]
+
+
+def install_fakes(latency, user_id="bench_user"):
+    """Point main at in-memory Firestore and fake browsers. Returns (main, fake_db)."""
+    fake_db = FakeFirestore(latency.firestore)
+    firebase_client.set_db(fake_db)
+    import main
+
+    main.driver_pool.factory = lambda: FakeDriver(latency)
+    main.profiles.factory = lambda profile_dir: FakeDriver(latency, profile_dir=profile_dir)
+    main.profiles.root = tempfile.mkdtemp(prefix="nova-bench-profiles-")
+    fake_db.collection("uber_cookies").document(user_id).set({
+        "cookies": [dict(SESSION_COOKIE)],
+        "timestamp": __import__("datetime").datetime.utcnow().isoformat(),
+    })
+    return main, fake_db
+
+
+def send(main, session, text, timeout=60):
+    """One utterance; waits for the browser job if one was started. Returns the final reply."""
+    result = main.receive_text(main.TextIn(text=text), session)
+    job_id = result.get("job_id")
+    if job_id:
+        job = main.jobs.get(job_id)
+        if not job.wait(timeout):
+            raise RuntimeError(f"job {job_id} did not finish in {timeout}s")
+        result = job.result or {"response": job.error}
+    return result
+
+
+def run_conversation(main, session_id, user_id, record, think=0.0):
+    session = main.sessions.get(session_id, user_id)
+    with session.lock:
+        main._quit_session_driver(session)
+        session.reset()
+    for state, text, expected in SCRIPT:
+        if session.waiting_for != state:
+            raise RuntimeError(f"expected state {state}, got {session.waiting_for}")
+        if think:
+            time.sleep(think)
+        started = time.perf_counter()
+        result = send(main, session, text)
+        record(state, time.perf_counter() - started, result)
+        if session.waiting_for != expected:
+            raise RuntimeError(f"{state!r} -> {session.waiting_for!r}, expected {expected!r}: {result['response']}")
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every simulated latency")
+    parser.add_argument("--zero-latency", action="store_true", help="measure pure Python overhead")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds of rider speech before each utterance")
+    args = parser.parse_args()
+
+    latency = Latency.zero() if args.zero_latency else Latency()
+    if args.scale != 1.0:
+        latency = Latency(**{k: v * args.scale for k, v in vars(latency).items()})
+    main, fake_db = install_fakes(latency)
+
+    timings = {state: [] for state, _, _ in SCRIPT}
+
+    def record_time(state, elapsed, result):
+        timings[state].append(elapsed)
+
+    # Warm-up conversation (first lease spawns a browser, caches are cold)
+    run_conversation(main, "bench-warmup", "bench_user", lambda *a: None)
+    started = time.perf_counter()
+    for i in range(args.iterations):
+        run_conversation(main, f"bench-{i}", "bench_user", record_time, args.think)
+    wall = time.perf_counter() - started
+
+    # Separate pass for allocations: tracemalloc distorts timings
+    allocations = {state: [] for state, _, _ in SCRIPT}
+    peaks = {state: 0 for state, _, _ in SCRIPT}
+    tracemalloc.start()
+
+    def record_alloc(state, elapsed, result):
+        current, peak = tracemalloc.get_traced_memory()
+        allocations[state].append(current - record_alloc.base)
+        peaks[state] = max(peaks[state], peak - record_alloc.base)
+        tracemalloc.reset_peak()
+        record_alloc.base = tracemalloc.get_traced_memory()[0]
+
+    record_alloc.base = tracemalloc.get_traced_memory()[0]
+    for i in range(min(args.iterations, 5)):
+        run_conversation(main, f"bench-alloc-{i}", "bench_user", record_alloc)
+    tracemalloc.stop()
+
+    print(f"{args.iterations} conversations in {wall:.2f}s ({wall / args.iterations * 1000:.0f}ms each)\n")
+    print(f"{'state':<20} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'net KiB':>9} {'peak KiB':>9}")
+    for state, _, _ in SCRIPT:
+        values = [v * 1000 for v in timings[state]]
+        net = statistics.fmean(allocations[state]) / 1024 if allocations[state] else 0.0
+        print(f"{state:<20} {percentile(values, 50):>8.1f} {percentile(values, 95):>8.1f} {max(values):>8.1f} "
+              f"{net:>9.1f} {peaks[state] / 1024:>9.1f}")
+    print(f"\nfirestore ops: {fake_db.ops}")
+    print(f"driver pool: {main.driver_pool.stats()['spawn_latency']['count']} spawned, "
+          f"{main.driver_pool.stats()['recycled']} recycled")
+    main.jobs.shutdown()
+    main.driver_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main_()
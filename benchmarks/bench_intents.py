@@ -0,0 +1,123 @@
+"""Microbenchmark: per-utterance intent classification cost, legacy keyword scans vs intents.classify.
+
+"all" classifies every intent; "per-state" passes the intents one state acts on, as
+main._process_text does, cycling through the conversation's states.
+
+    python benchmarks/bench_intents.py [--iterations 20000] [--threads 1,4,16]
+"""
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intents import classify  # noqa: E402
+
+UTTERANCES = [
+    "english",
+    "हिंदी",
+    "wake up nova",
+    "वेक अप नोवा",
+    "please book a cab for me",
+    "कैब बुक करो",
+    "can you open uber",
+    "change language",
+    "i'm logged in now",
+    "हो गया",
+    "what is your pickup location",
+    "mg road metro station bangalore",
+    "kempegowda international airport terminal 2",
+    "option 2 uber go",
+    "yes please confirm",
+    "haan ji",
+    "no thanks",
+    "something completely unrelated that the microphone picked up from the television",
+]
+
+
+# main.STATE_INTENTS values in conversation order (plus the confirm step), copied so the
+# benchmark does not import main
+STATE_INTENT_SETS = itertools.cycle([
+    ("english", "hindi"), ("wake",), ("book_ride", "change_language"), (), ("login_ready",),
+    ("pickup_echo",), ("dropoff_echo",), (), (), ("confirm",),
+])
+
+
+def per_state_classify(text):
+    return classify(text, next(STATE_INTENT_SETS))
+
+
+def legacy_classify(text):
+    """The pre-engine checks, with their keyword lists rebuilt per call as receive_text did."""
+    found = set()
+    if "english" in text:
+        found.add("english")
+    if "hindi" in text or "हिंदी" in text:
+        found.add("hindi")
+    wake_keywords = ["wake up nova", "wake nova", "wake", "wakeup", "वेक अप नोवा", "वेक नोवा"]
+    if any(k in text for k in wake_keywords):
+        found.add("wake")
+    if ("book" in text and "cab" in text) or ("book" in text and "ride" in text) or ("open" in text and "uber" in text) or ("कैब" in text and "बुक" in text):
+        found.add("book_ride")
+    if "change language" in text or "भाषा बदलो" in text:
+        found.add("change_language")
+    if any(word in text for word in ["logged in", "ready", "done", "finished", "complete", "हो गया", "तैयार"]):
+        found.add("login_ready")
+    if any(phrase in text for phrase in ["what is your pickup location", "what is your pick up location", "please say your pickup location"]):
+        found.add("pickup_echo")
+    if any(phrase in text for phrase in ["where are you going", "please say your drop location", "please say your dropoff location"]):
+        found.add("dropoff_echo")
+    if any(word in text.lower() for word in ["yes", "confirm", "yeah", "proceed", "haan", "haan ji"]):
+        found.add("confirm")
+    return found
+
+
+def _run(fn, iterations, samples):
+    local = []
+    n = len(UTTERANCES)
+    for i in range(iterations):
+        text = UTTERANCES[i % n]
+        started = time.perf_counter_ns()
+        fn(text)
+        local.append(time.perf_counter_ns() - started)
+    samples.extend(local)
+
+
+def bench(fn, iterations, threads):
+    samples = []
+    workers = [threading.Thread(target=_run, args=(fn, iterations, samples)) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    samples.sort()
+    return {
+        "per_sec": iterations * threads / elapsed,
+        "mean_us": statistics.fmean(samples) / 1000,
+        "p50_us": samples[len(samples) // 2] / 1000,
+        "p99_us": samples[int(len(samples) * 0.99) - 1] / 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000, help="utterances per thread")
+    parser.add_argument("--threads", default="1,4,16", help="comma separated thread counts")
+    args = parser.parse_args()
+
+    print(f"{'matcher':<10} {'threads':>7} {'utt/s':>12} {'mean µs':>9} {'p50 µs':>8} {'p99 µs':>8}")
+    for threads in [int(t) for t in args.threads.split(",")]:
+        for name, fn in (("legacy", legacy_classify), ("all", classify), ("per-state", per_state_classify)):
+            fn(UTTERANCES[0])  # warm up
+            r = bench(fn, args.iterations, threads)
+            print(f"{name:<10} {threads:>7} {r['per_sec']:>12,.0f} {r['mean_us']:>9.2f} {r['p50_us']:>8.2f} {r['p99_us']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Page weight with and without the DevTools resource filter, on a real Chrome.
+
+Loads the Uber mobile home page --runs times in each mode with the HTTP cache disabled, and
+reports median bytes transferred, subresource count and load time from the Navigation/Resource
+Timing API (see resource_filter.py). Needs Chrome and network access.
+
+    HEADLESS=true python benchmarks/bench_pages.py [--runs 5] [--url https://m.uber.com/go/home]
+"""
+import argparse
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import resource_filter  # noqa: E402
+
+
+def measure(driver, url, runs):
+    samples = []
+    for _ in range(runs):
+        driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        driver.get("about:blank")
+        stats = resource_filter.load(driver, url, page="bench")
+        if stats:
+            samples.append(stats)
+    return samples
+
+
+def summarize(label, samples):
+    if not samples:
+        print(f"{label:<12} no samples (Performance API unavailable?)")
+        return None
+    kib = statistics.median(s["bytes"] for s in samples) / 1024
+    resources = statistics.median(s["resources"] for s in samples)
+    load_ms = statistics.median(s["loadMs"] or 0 for s in samples)
+    print(f"{label:<12} {kib:>10.0f} {resources:>10.0f} {load_ms:>10.0f}")
+    return kib, load_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--url", default="https://m.uber.com/go/home")
+    args = parser.parse_args()
+
+    from main import _setup_driver
+
+    driver = _setup_driver()
+    if driver is None:
+        sys.exit("could not start Chrome")
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": True})
+        print(f"{'mode':<12} {'KiB':>10} {'resources':>10} {'load ms':>10}")
+        resource_filter.uninstall(driver)
+        unfiltered = summarize("unfiltered", measure(driver, args.url, args.runs))
+        resource_filter.install(driver)
+        filtered = summarize("filtered", measure(driver, args.url, args.runs))
+        if unfiltered and filtered and unfiltered[0]:
+            print(f"\nbytes -{(1 - filtered[0] / unfiltered[0]) * 100:.0f}%, "
+                  f"load time -{(1 - filtered[1] / unfiltered[1]) * 100 if unfiltered[1] else 0:.0f}%")
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
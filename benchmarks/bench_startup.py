@@ -0,0 +1,81 @@
+"""Startup-time guard: `python -X importtime -c "import main"`, summarized.
+
+Fails (exit 1) if importing main takes longer than --budget-ms or eagerly loads one of the
+heavy stacks that are supposed to stay lazy until the browser or Firestore is first used.
+
+    python benchmarks/bench_startup.py [--runs 5] [--budget-ms 1500] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must not be imported by `import main`
+LAZY_MODULES = (
+    "undetected_chromedriver",
+    "firebase_admin",
+    "google.cloud.firestore",
+    "grpc",
+    "selenium.webdriver",
+)
+
+
+def importtime(module):
+    """Run one cold import and return {module: (self_us, cumulative_us)}."""
+    env = dict(os.environ)
+    env.pop("FIREBASE_CRED_JSON", None)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.exit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level imports to list")
+    args = parser.parse_args()
+
+    totals, last = [], {}
+    for _ in range(args.runs):
+        last = importtime(args.module)
+        totals.append(last[args.module][1] / 1000)
+
+    # Top-level packages only (no dots), by cumulative time
+    packages = sorted(
+        ((name, cum) for name, (_, cum) in last.items() if "." not in name.strip() and name != args.module),
+        key=lambda item: item[1], reverse=True,
+    )
+    print(f"import {args.module}: median {statistics.median(totals):.0f}ms, min {min(totals):.0f}ms, max {max(totals):.0f}ms over {args.runs} runs")
+    print(f"\n{'package':<32} {'cumulative ms':>14}")
+    for name, cum in packages[:args.top]:
+        print(f"{name:<32} {cum / 1000:>14.1f}")
+
+    failures = []
+    eager = sorted(name for name in last if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES))
+    if eager:
+        failures.append(f"eagerly imported: {', '.join(eager[:10])}{' ...' if len(eager) > 10 else ''}")
+    if statistics.median(totals) > args.budget_ms:
+        failures.append(f"median {statistics.median(totals):.0f}ms exceeds budget {args.budget_ms:.0f}ms")
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
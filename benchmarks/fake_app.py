@@ -0,0 +1,16 @@
+"""main.app with fake browsers and Firestore, for running workers behind router.py without Chrome.
+
+    python router.py --workers 2 --app benchmarks.fake_app:app --store sqlite:////tmp/nova-bench.db
+    python benchmarks/loadgen.py --url http://127.0.0.1:8000 --levels 1,5,10
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_flow import install_fakes  # noqa: E402
+from benchmarks.fakes import Latency  # noqa: E402
+from benchmarks.loadgen import USER_ID  # noqa: E402
+
+main, _ = install_fakes(Latency(), USER_ID)
+app = main.app
@@ -0,0 +1,441 @@
+"""In-memory stand-ins for the Firestore client and the WebDriver surface used by main.py and login.py.
+
+FakeDriver models just enough of the m.uber.com/go flow (login button, pickup/dropoff inputs,
+suggestions, product list, request + confirm popup) to drive receive_text end to end, with a
+configurable simulated latency for each kind of browser work.
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from selenium.common.exceptions import NoSuchElementException, WebDriverException
+
+HOME_URL = "https://m.uber.com/go/home"
+LOGIN_BUTTON = "button.css-dHHA-DQ"
+PICKUP_BUTTON = '[data-testid="pudo-button-pickup"]'
+PICKUP_INPUT = 'input[placeholder="Pickup location"]'
+DROPOFF_INPUT = 'input[placeholder="Dropoff location"]'
+OPTION = '[role="option"]'
+RIDE_ITEM = "li[data-testid='product_selector.list_item']"
+REQUEST_BUTTON = '//*[@id="wrapper"]/div[1]/div[3]/main/div/section/div[3]/div/div/button'
+CONFIRM_BUTTON = '//*[@id="wrapper"]/div[2]/div/div[2]/div/div/div/div/div/div/div[3]/div[2]/button'
+SESSION_COOKIE = {"name": "sid", "value": "fake-session", "domain": ".uber.com", "path": "/"}
+
+RIDES = [
+    ("Uber Go", "3 mins away", "₹212.40"),
+    ("Go Sedan", "5 mins away", "₹248.10"),
+    ("Premier", "4 mins away", "₹301.75"),
+    ("Uber XL", "8 mins away", "₹389.00"),
+    ("Auto", "2 mins away", "₹118.00"),
+]
+
+
+@dataclass
+class Latency:
+    """Simulated costs, in seconds."""
+    roundtrip: float = 0.002  # every WebDriver command
+    spawn: float = 0.3  # launching a browser
+    page_load: float = 0.08  # get() / refresh()
+    panel: float = 0.03  # UI reacting to a click
+    autocomplete: float = 0.15  # suggestions after typing
+    rides: float = 0.25  # product list after both locations are set
+    popup: float = 0.05  # confirm popup after the request click
+    firestore: float = 0.02  # one Firestore round trip
+
+    @classmethod
+    def zero(cls):
+        return cls(*(0.0 for _ in range(8)))
+
+
+class FakeElement:
+    __slots__ = ("driver", "selector", "text", "handle", "displayed", "enabled", "attrs")
+
+    def __init__(self, driver, selector, text="", handle=None):
+        self.driver = driver
+        self.selector = selector
+        self.text = text
+        self.handle = handle
+        self.displayed = True
+        self.enabled = True
+        self.attrs = {}
+
+    def send_keys(self, value):
+        self.driver._call()
+        self.driver._typed(self.selector, value)
+
+    def click(self):
+        self.driver._call()
+        self.driver._clicked(self)
+
+    def is_displayed(self):
+        self.driver._call()
+        return self.displayed
+
+    def is_enabled(self):
+        self.driver._call()
+        return self.enabled
+
+    def get_attribute(self, name):
+        self.driver._call()
+        return self.text if name == "textContent" else self.attrs.get(name)
+
+
+class FakeDriver:
+    """WebDriver stand-in. Elements 'render' at simulated times and waits return when they do."""
+
+    _scripts = None  # script text -> method name, built on first use
+
+    def __init__(self, latency=None, auto_login_after=None, profile_dir=None):
+        self.latency = latency or Latency()
+        self.auto_login_after = auto_login_after
+        self.profile_dir = profile_dir
+        self.calls = 0
+        self.unknown_scripts = 0
+        self.cookies = self._read_profile()
+        self.url = "about:blank"
+        self.alive = True
+        self._lock = threading.Lock()
+        self._ready = {}  # selector -> monotonic time it renders
+        self._suggestions = []
+        self._login_clicked_at = None
+        time.sleep(self.latency.spawn)
+
+    # --- plumbing ---
+    def _call(self, extra=0.0):
+        if not self.alive:
+            raise WebDriverException("browser has been closed")
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency.roundtrip + extra)
+
+    def _render(self, selector, after):
+        self._ready[selector] = time.monotonic() + after
+
+    def _is_ready(self, selector):
+        at = self._ready.get(selector)
+        return at is not None and at <= time.monotonic()
+
+    def _logged_in(self):
+        if any(c.get("name") == SESSION_COOKIE["name"] for c in self.cookies):
+            return True
+        if self._login_clicked_at is not None and self.auto_login_after is not None:
+            if time.monotonic() - self._login_clicked_at >= self.auto_login_after:
+                self.cookies.append(dict(SESSION_COOKIE))
+                return True
+        return False
+
+    def _load(self, url):
+        self.url = url
+        self._ready.clear()
+        self._suggestions = []
+        if url.startswith(HOME_URL):
+            self._render(PICKUP_BUTTON, 0.0)
+
+    # --- WebDriver surface ---
+    @property
+    def current_url(self):
+        self._call()
+        return self.url
+
+    def get(self, url):
+        self._call(self.latency.page_load)
+        self._load(url)
+
+    def refresh(self):
+        self._call(self.latency.page_load)
+        self._load(self.url)
+
+    def quit(self):
+        if self.alive:
+            self._write_profile()
+        self.alive = False
+
+    # A user-data-dir keeps cookies across launches, like Chrome's
+    def _read_profile(self):
+        try:
+            with open(os.path.join(self.profile_dir, "fake_cookies.json")) as f:
+                return json.load(f)
+        except (TypeError, OSError, ValueError):
+            return []
+
+    def _write_profile(self):
+        if self.profile_dir:
+            with open(os.path.join(self.profile_dir, "fake_cookies.json"), "w") as f:
+                json.dump(self.cookies, f)
+
+    def set_window_size(self, width, height):
+        self._call()
+
+    def set_page_load_timeout(self, seconds):
+        self._call()
+
+    def set_script_timeout(self, seconds):
+        self._call()
+
+    def get_cookies(self):
+        self._call()
+        return [dict(c) for c in self.cookies]
+
+    def add_cookie(self, cookie):
+        self._call()
+        self.cookies = [c for c in self.cookies if c.get("name") != cookie.get("name")] + [dict(cookie)]
+
+    def delete_all_cookies(self):
+        self._call()
+        self.cookies = []
+
+    def execute_cdp_cmd(self, cmd, params):
+        self._call()
+        if cmd == "Network.clearBrowserCookies":
+            self.cookies = []
+        return {}
+
+    def find_element(self, by, selector):
+        found = self.find_elements(by, selector)
+        if not found:
+            raise NoSuchElementException(selector)
+        return found[0]
+
+    def find_elements(self, by, selector):
+        self._call()
+        if selector == LOGIN_BUTTON:
+            return [] if self._logged_in() else [FakeElement(self, LOGIN_BUTTON, "Log in")]
+        if selector == REQUEST_BUTTON:
+            return [FakeElement(self, REQUEST_BUTTON, "Request")] if self._is_ready(RIDE_ITEM) else []
+        if selector == OPTION:
+            return self._options() if self._is_ready(OPTION) else []
+        if selector == RIDE_ITEM:
+            return self._rides() if self._is_ready(RIDE_ITEM) else []
+        return [FakeElement(self, selector)] if self._is_ready(selector) else []
+
+    def _options(self):
+        return [FakeElement(self, OPTION, text, handle=i) for i, text in enumerate(self._suggestions)]
+
+    def _rides(self):
+        return [FakeElement(self, RIDE_ITEM, "\n".join(ride), handle=f"r-{i}") for i, ride in enumerate(RIDES)]
+
+    # --- page behaviour ---
+    def _typed(self, selector, value):
+        if selector in (PICKUP_INPUT, DROPOFF_INPUT):
+            label = value.strip().title()
+            self._suggestions = [label, f"{label} Main Gate", f"{label} Bus Stop"]
+            self._render(OPTION, self.latency.autocomplete)
+
+    def _clicked(self, element):
+        selector = element.selector
+        if selector == LOGIN_BUTTON:
+            self._login_clicked_at = time.monotonic()
+        elif selector == PICKUP_BUTTON:
+            self._render(PICKUP_INPUT, self.latency.panel)
+        elif selector == OPTION:
+            self._pick_option()
+        elif selector == RIDE_ITEM:
+            pass
+        elif selector == REQUEST_BUTTON:
+            self._render(CONFIRM_BUTTON, self.latency.popup)
+        elif selector == CONFIRM_BUTTON:
+            self._ready.pop(CONFIRM_BUTTON, None)
+
+    def _pick_option(self):
+        self._ready.pop(OPTION, None)
+        self._suggestions = []
+        if PICKUP_INPUT in self._ready and DROPOFF_INPUT not in self._ready:
+            self._ready.pop(PICKUP_INPUT, None)
+            self._render(DROPOFF_INPUT, self.latency.panel)
+        elif DROPOFF_INPUT in self._ready:
+            self._ready.pop(DROPOFF_INPUT, None)
+            self._render(RIDE_ITEM, self.latency.rides)
+
+    # --- scripts ---
+    @classmethod
+    def _script_table(cls):
+        if cls._scripts is None:
+            import locators
+            import main
+            import resource_filter
+            import rides
+            import waits
+
+            cls._scripts = {
+                waits.WAIT_JS: "_js_wait",
+                waits.TEXTS_JS: "_js_texts",
+                locators.PROBE_JS: "_js_probe",
+                rides.SCRAPE_RIDES_JS: "_js_scrape_rides",
+                rides.CLICK_RIDE_JS: "_js_click_ride",
+                main.SELECT_SUGGESTION_JS: "_js_select_suggestion",
+                resource_filter.PAGE_STATS_JS: "_js_page_stats",
+            }
+        return cls._scripts
+
+    @classmethod
+    def register_script(cls, script, method_name):
+        cls._script_table()[script] = method_name
+
+    def execute_script(self, script, *args):
+        self._call()
+        method = self._script_table().get(script)
+        if method:
+            return getattr(self, method)(*args)
+        if "click()" in script and args and isinstance(args[0], FakeElement):
+            self._clicked(args[0])
+            return None
+        if "localStorage" in script or "scrollIntoView" in script:
+            return None
+        with self._lock:
+            self.unknown_scripts += 1
+        return None
+
+    def execute_async_script(self, script, *args):
+        return self.execute_script(script, *args)
+
+    def _js_page_stats(self):
+        # No network here: only the simulated load time is meaningful
+        return {"bytes": 0, "resources": 0, "loadMs": self.latency.page_load * 1000}
+
+    def _js_texts(self, selector):
+        if selector == OPTION and self._is_ready(OPTION):
+            return list(self._suggestions)
+        return []
+
+    def _js_wait(self, selectors, mode, timeout_ms, stale=None):
+        deadline = time.monotonic() + timeout_ms / 1000.0
+        stale = set(stale or [])
+        while True:
+            for index, selector in enumerate(selectors):
+                # The request button shows with the product list
+                at = self._ready.get(RIDE_ITEM if selector == REQUEST_BUTTON else selector)
+                if at is None:
+                    continue
+                if selector == OPTION and all(text in stale for text in self._suggestions):
+                    continue
+                now = time.monotonic()
+                if at <= now:
+                    return {"element": self.find_elements(None, selector)[0], "index": index, "reason": "mutation"}
+                if at <= deadline:
+                    time.sleep(at - now)
+                    break
+            else:
+                # Nothing scheduled to render in time: wait out the timeout like the real observer would
+                time.sleep(max(0.0, deadline - time.monotonic()))
+                return {"element": None, "index": -1, "reason": "not_rendered"}
+
+    def _js_probe(self, selectors):
+        for index, selector in enumerate(selectors):
+            found = self.find_elements(None, selector)
+            if found:
+                return {"element": found[0], "index": index}
+        return None
+
+    def _js_scrape_rides(self, selector):
+        if not self._is_ready(RIDE_ITEM):
+            return []
+        return [{"index": i, "handle": f"r-{i}", "text": "\n".join(ride)} for i, ride in enumerate(RIDES)]
+
+    def _js_click_ride(self, handle, selector, index):
+        return self._is_ready(RIDE_ITEM) and 0 <= index < len(RIDES)
+
+    def _js_select_suggestion(self, selector, label, index, stale=None):
+        fresh = [text for text in self._suggestions if text not in (stale or ())]
+        if not fresh:
+            return None
+        chosen = fresh.index(label) if label in fresh else min(index, len(fresh) - 1)
+        text = fresh[chosen]
+        self._pick_option()
+        return {"index": chosen, "label": text}
+
+
+# === FIRESTORE ===
+class _Snapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class _DocumentRef:
+    def __init__(self, store, collection, doc_id):
+        self._store = store
+        self._collection = collection
+        self.id = doc_id
+
+    def get(self, **kwargs):
+        self._store._op("get")
+        return _Snapshot(self.id, self._store._docs(self._collection).get(self.id))
+
+    def set(self, data, **kwargs):
+        self._store._op("set")
+        self._store._docs(self._collection)[self.id] = dict(data)
+
+    def delete(self, **kwargs):
+        self._store._op("delete")
+        self._store._docs(self._collection).pop(self.id, None)
+
+
+class _Query:
+    def __init__(self, store, collection, field, op, value):
+        self._store, self._collection = store, collection
+        self._field, self._op, self._value = field, op, value
+
+    def stream(self, **kwargs):
+        self._store._op("query")
+        compare = {"<": lambda a, b: a < b, "<=": lambda a, b: a <= b, "==": lambda a, b: a == b,
+                   ">": lambda a, b: a > b, ">=": lambda a, b: a >= b}[self._op]
+        for doc_id, data in list(self._store._docs(self._collection).items()):
+            value = data.get(self._field)
+            if value is not None and compare(value, self._value):
+                yield _Snapshot(doc_id, data)
+
+
+class _Collection:
+    def __init__(self, store, name):
+        self._store = store
+        self._name = name
+
+    def document(self, doc_id):
+        return _DocumentRef(self._store, self._name, doc_id)
+
+    def where(self, field, op, value):
+        return _Query(self._store, self._name, field, op, value)
+
+
+class _Batch:
+    def __init__(self, store):
+        self._store = store
+        self._ops = []
+
+    def set(self, ref, data, **kwargs):
+        self._ops.append((ref, dict(data)))
+
+    def commit(self, **kwargs):
+        self._store._op("batch_commit")
+        for ref, data in self._ops:
+            self._store._docs(ref._collection)[ref.id] = data
+
+
+class FakeFirestore:
+    """Dict-backed replacement for firestore.client() with per-operation latency and counters."""
+
+    def __init__(self, latency=None):
+        self.latency = latency if latency is not None else Latency().firestore
+        self.data = {}
+        self.ops = {}
+        self._lock = threading.Lock()
+
+    def _docs(self, collection):
+        return self.data.setdefault(collection, {})
+
+    def _op(self, name):
+        with self._lock:
+            self.ops[name] = self.ops.get(name, 0) + 1
+        time.sleep(self.latency)
+
+    def collection(self, name):
+        return _Collection(self, name)
+
+    def batch(self):
+        return _Batch(self)
@@ -0,0 +1,205 @@
+"""Concurrent load generator: replays scripted English/Hindi conversations against the FastAPI app.
+
+By default it serves main.app in-process on localhost with FakeDriver / FakeFirestore behind it
+(see benchmarks/fakes.py), ramps the number of concurrent riders, and reports throughput plus
+p50/p95/p99 per endpoint and per waiting_for state. --url targets an already running server
+instead (whatever backends that server has).
+
+    python benchmarks/loadgen.py --levels 1,5,10,25 --conversations 3 --pool-max 8
+"""
+import argparse
+import contextlib
+import os
+import socket
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+USER_ID = "load_user"
+
+# (state the utterance is sent in, utterance)
+SCRIPTS = {
+    "en": [
+        ("language_selection", "english"),
+        ("wake", "wake up nova"),
+        ("command", "book a cab"),
+        ("login", "okay"),
+        ("pickup", "mg road metro station"),
+        ("dropoff", "kempegowda airport"),
+        ("ride_options", "show me the options"),
+        ("ride_selection", "option 2"),
+        ("confirm_booking", "yes confirm"),
+    ],
+    "hi": [
+        ("language_selection", "हिंदी"),
+        ("wake", "वेक अप नोवा"),
+        ("command", "कैब बुक करो"),
+        ("login", "ठीक है"),
+        ("pickup", "एमजी रोड मेट्रो स्टेशन"),
+        ("dropoff", "एयरपोर्ट"),
+        ("ride_options", "विकल्प बताओ"),
+        ("ride_selection", "option 1"),
+        ("confirm_booking", "हाँ जी"),
+    ],
+}
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = defaultdict(list)
+        self.states = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.requests = 0
+        self.conversations = 0
+
+    def endpoint(self, name, elapsed):
+        with self._lock:
+            self.endpoints[name].append(elapsed)
+            self.requests += 1
+
+    def state(self, name, elapsed):
+        with self._lock:
+            self.states[name].append(elapsed)
+
+    def error(self, name):
+        with self._lock:
+            self.errors[name] += 1
+
+
+def _timed(recorder, name, fn, *args, **kwargs):
+    started = time.perf_counter()
+    response = fn(*args, **kwargs)
+    recorder.endpoint(name, time.perf_counter() - started)
+    response.raise_for_status()
+    return response.json()
+
+
+def run_conversation(base_url, http, session_id, script, recorder, job_timeout, poll_interval):
+    headers = {"X-Session-Id": session_id, "X-User-Id": USER_ID}
+    _timed(recorder, "POST /api/start", http.post, f"{base_url}/api/start", headers=headers)
+    for state, text in script:
+        started = time.perf_counter()
+        body = _timed(recorder, "POST /api/receive-text", http.post, f"{base_url}/api/receive-text",
+                      json={"text": text}, headers=headers)
+        job_id = body.get("job_id")
+        if job_id:
+            deadline = time.monotonic() + job_timeout
+            while True:
+                job = _timed(recorder, "GET /api/jobs/{id}", http.get, f"{base_url}/api/jobs/{job_id}", headers=headers)
+                if job["status"] not in ("queued", "running"):
+                    break
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"job for {state} still {job['status']} after {job_timeout}s")
+                time.sleep(poll_interval)
+            if job["status"] != "done":
+                raise RuntimeError(f"job for {state} {job['status']}: {job.get('error')}")
+        recorder.state(state, time.perf_counter() - started)
+        status = _timed(recorder, "GET /api/status", http.get, f"{base_url}/api/status", headers=headers)
+        if status["waiting_for"] == state:
+            raise RuntimeError(f"stuck in {state}")
+
+
+def rider(base_url, rider_id, level, conversations, recorder, args):
+    http = requests.Session()
+    for n in range(conversations):
+        language = "hi" if (rider_id + n) % 2 else "en"
+        try:
+            run_conversation(base_url, http, f"load-{level}-{rider_id}", SCRIPTS[language], recorder,
+                             args.job_timeout, args.poll_interval)
+            with recorder._lock:
+                recorder.conversations += 1
+        except Exception as e:
+            recorder.error(type(e).__name__ + ": " + str(e)[:80])
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))] * 1000
+
+
+def report(level, recorder, wall, out):
+    print(f"\n=== {level} concurrent riders: {recorder.conversations} conversations, {recorder.requests} requests "
+          f"in {wall:.1f}s -> {recorder.conversations / wall:.2f} conv/s, {recorder.requests / wall:.1f} req/s ===", file=out)
+    print(f"{'endpoint / state':<26} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}", file=out)
+    for name, values in sorted(recorder.endpoints.items()):
+        print(f"{name:<26} {len(values):>6} {percentile(values, 50):>9.1f} {percentile(values, 95):>9.1f} "
+              f"{percentile(values, 99):>9.1f}", file=out)
+    for name in [state for state, _ in SCRIPTS["en"]]:
+        values = recorder.states.get(name)
+        if values:
+            print(f"  state:{name:<18} {len(values):>6} {percentile(values, 50):>9.1f} {percentile(values, 95):>9.1f} "
+                  f"{percentile(values, 99):>9.1f}", file=out)
+    for error, count in recorder.errors.items():
+        print(f"  ERROR x{count}: {error}", file=out)
+
+
+def serve_in_process(args):
+    """Start main.app on a free localhost port with fake browser and Firestore backends."""
+    os.environ.setdefault("NOVA_POOL_MIN", str(args.pool_min))
+    os.environ.setdefault("NOVA_POOL_MAX", str(args.pool_max))
+    os.environ.setdefault("NOVA_BROWSER_WORKERS", str(args.workers))
+    import uvicorn
+
+    from benchmarks.bench_flow import install_fakes
+    from benchmarks.fakes import Latency
+
+    latency = Latency(**{k: v * args.scale for k, v in vars(Latency()).items()})
+    main, _ = install_fakes(latency, USER_ID)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="loadgen-server", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", main, server
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="target a running server instead of serving in-process with fakes")
+    parser.add_argument("--levels", default="1,5,10,25", help="concurrency ramp, comma separated")
+    parser.add_argument("--conversations", type=int, default=3, help="conversations per rider per level")
+    parser.add_argument("--pool-min", type=int, default=2)
+    parser.add_argument("--pool-max", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=8, help="browser job workers (NOVA_BROWSER_WORKERS)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply simulated browser/Firestore latency")
+    parser.add_argument("--job-timeout", type=float, default=120.0)
+    parser.add_argument("--poll-interval", type=float, default=0.02)
+    parser.add_argument("--verbose", action="store_true", help="keep the server's own output")
+    args = parser.parse_args()
+
+    out = sys.stdout
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with quiet:
+        if args.url:
+            base_url, main, server = args.url.rstrip("/"), None, None
+        else:
+            base_url, main, server = serve_in_process(args)
+        print(f"target {base_url}", file=out)
+        for level in [int(x) for x in args.levels.split(",")]:
+            recorder = Recorder()
+            riders = [threading.Thread(target=rider, args=(base_url, i, level, args.conversations, recorder, args))
+                      for i in range(level)]
+            started = time.perf_counter()
+            for t in riders:
+                t.start()
+            for t in riders:
+                t.join()
+            report(level, recorder, time.perf_counter() - started, out)
+            if main is not None:
+                pool = main.driver_pool.stats()
+                print(f"  pool: max {pool['max_size']}, lease wait avg {pool['lease_wait']['avg_ms']}ms "
+                      f"max {pool['lease_wait']['max_ms']}ms, timeouts {pool['lease_timeouts']}", file=out)
+        if server is not None:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    main_()
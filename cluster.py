@@ -0,0 +1,22 @@
+import os
+import uuid
+
+# === WORKER IDENTITY (multi-worker mode, see router.py) ===
+# Set by router.py for each worker process it starts. Empty means a single standalone process.
+WORKER_ID = os.getenv("NOVA_WORKER_ID", "")
+# Where the router can reach this worker
+WORKER_URL = os.getenv("NOVA_WORKER_URL", "")
+ID_SEPARATOR = "."
+
+
+def local_id():
+    """A new id that names this worker as its owner, e.g. "w2.3f9c...". Plain hex when standalone."""
+    token = uuid.uuid4().hex
+    return f"{WORKER_ID}{ID_SEPARATOR}{token}" if WORKER_ID else token
+
+
+def owner_of(identifier):
+    """Worker id encoded in a session or job id, or None."""
+    if identifier and ID_SEPARATOR in identifier:
+        return identifier.split(ID_SEPARATOR, 1)[0]
+    return None
@@ -0,0 +1,306 @@
+import atexit
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from deadlines import DeadlineExceeded, cap
+from firebase_client import FIRESTORE_TIMEOUT
+from logs import get_logger
+
+log = get_logger("cookies")
+
+# === COOKIE CACHE CONFIG ===
+COOKIE_COLLECTION = "uber_cookies"
+COOKIE_MAX_AGE = timedelta(hours=24)
+COOKIE_CACHE_SIZE = int(os.getenv("NOVA_COOKIE_CACHE_SIZE", "512"))
+# How long a hit is trusted before re-reading Firestore (other instances may have written)
+COOKIE_CACHE_TTL = float(os.getenv("NOVA_COOKIE_CACHE_TTL", "600"))
+# How long "no cookies for this user" is remembered
+COOKIE_NEGATIVE_TTL = float(os.getenv("NOVA_COOKIE_NEGATIVE_TTL", "60"))
+COOKIE_SWEEP_INTERVAL = float(os.getenv("NOVA_COOKIE_SWEEP_INTERVAL", "3600"))
+# Write-behind: how often pending cookie writes are flushed
+COOKIE_FLUSH_INTERVAL = float(os.getenv("NOVA_COOKIE_FLUSH_INTERVAL", "2"))
+# Unchanged cookies are still re-written this often so the 24h timestamp keeps sliding
+COOKIE_REFRESH_AFTER = float(os.getenv("NOVA_COOKIE_REFRESH_AFTER", "3600"))
+FIRESTORE_BATCH_LIMIT = 500
+
+
+def _parse_timestamp(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def cookie_fingerprint(cookies):
+    """Stable digest of the cookie jar. Expiry is ignored since it moves on every page load."""
+    jar = sorted(
+        (c.get("domain", ""), c.get("path", ""), c.get("name", ""), c.get("value", ""))
+        for c in cookies or []
+    )
+    return hashlib.sha1(json.dumps(jar).encode("utf-8")).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("cookies", "timestamp", "saved_at", "cached_until")
+
+    def __init__(self, cookies, timestamp, saved_at, cached_until):
+        self.cookies = cookies
+        self.timestamp = timestamp  # ISO string as stored in Firestore
+        self.saved_at = saved_at  # parsed datetime, or None
+        self.cached_until = cached_until  # monotonic deadline for trusting this entry
+
+
+class CookieCache:
+    """Bounded LRU+TTL cache in front of the Firestore uber_cookies collection."""
+
+    def __init__(self, db_getter, max_entries=COOKIE_CACHE_SIZE, ttl=COOKIE_CACHE_TTL,
+                 negative_ttl=COOKIE_NEGATIVE_TTL, max_age=COOKIE_MAX_AGE):
+        self._db = db_getter
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._deletes = queue.Queue()
+        self._stop = threading.Event()
+        self._sweeper = None
+        self.hits = 0
+        self.misses = 0
+
+    # --- reads ---
+    def get(self, user_id):
+        """Return (cookies, timestamp) for a fresh login, or None if there is nothing usable."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.cached_until > now:
+                self._entries.move_to_end(user_id)
+                if entry.cookies is None:
+                    self.hits += 1
+                    return None
+                if not self._expired(entry.saved_at):
+                    self.hits += 1
+                    return entry.cookies, entry.timestamp
+                # Crossed the 24h line while cached
+                del self._entries[user_id]
+                self._deletes.put(user_id)
+                return None
+            self.misses += 1
+        return self._fetch(user_id)
+
+    def _fetch(self, user_id):
+        timeout = cap(FIRESTORE_TIMEOUT)
+        if timeout <= 0:
+            raise DeadlineExceeded("firestore_read")
+        doc = self._db().collection(COOKIE_COLLECTION).document(user_id).get(timeout=timeout)
+        if not doc.exists:
+            self._store(user_id, None, None, None, self.negative_ttl)
+            return None
+        data = doc.to_dict() or {}
+        cookies = data.get("cookies", [])
+        timestamp = data.get("timestamp")
+        saved_at = _parse_timestamp(timestamp)
+        if self._expired(saved_at):
+            # Stale cookies are removed by the sweeper, not on the request path
+            self._deletes.put(user_id)
+            self._store(user_id, None, None, None, self.negative_ttl)
+            return None
+        self._store(user_id, cookies, timestamp, saved_at, self.ttl)
+        return cookies, timestamp
+
+    def _expired(self, saved_at):
+        return saved_at is not None and datetime.utcnow() - saved_at > self.max_age
+
+    # --- writes ---
+    def put(self, user_id, cookies, timestamp):
+        """Record the latest cookie jar so the next login is served from memory."""
+        self._store(user_id, cookies, timestamp, _parse_timestamp(timestamp), self.ttl)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def _store(self, user_id, cookies, timestamp, saved_at, ttl):
+        with self._lock:
+            self._entries[user_id] = _Entry(cookies, timestamp, saved_at, time.monotonic() + ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # --- background expiry ---
+    def start_sweeper(self, interval=COOKIE_SWEEP_INTERVAL):
+        if self._sweeper and self._sweeper.is_alive():
+            return
+        self._stop.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, args=(interval,), name="cookie-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+        self._deletes.put(None)
+
+    def _sweep_loop(self, interval):
+        next_scan = time.monotonic() + interval
+        while not self._stop.is_set():
+            try:
+                user_id = self._deletes.get(timeout=max(0.0, next_scan - time.monotonic()))
+            except queue.Empty:
+                user_id = None
+            if user_id is not None:
+                self._delete(user_id)
+            if time.monotonic() >= next_scan:
+                self._scan_expired()
+                next_scan = time.monotonic() + interval
+
+    def _delete(self, user_id):
+        try:
+            self._db().collection(COOKIE_COLLECTION).document(user_id).delete(timeout=FIRESTORE_TIMEOUT)
+            log.info("deleted stale cookies", extra={"user_id": user_id})
+        except Exception as e:
+            log.warning("failed to delete stale cookies: %s", e, extra={"user_id": user_id})
+
+    def _scan_expired(self):
+        """Delete every document past the 24h cutoff, whether or not anyone asked for it."""
+        cutoff = (datetime.utcnow() - self.max_age).isoformat()
+        try:
+            stale = self._db().collection(COOKIE_COLLECTION).where("timestamp", "<", cutoff).stream()
+            for doc in stale:
+                self.invalidate(doc.id)
+                self._delete(doc.id)
+        except Exception as e:
+            log.warning("cookie sweep failed: %s", e)
+        now = time.monotonic()
+        with self._lock:
+            for user_id, entry in list(self._entries.items()):
+                if entry.cached_until <= now:
+                    del self._entries[user_id]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "pending_deletes": self._deletes.qsize()}
+
+
+class CookieWriter:
+    """Write-behind cookie persistence: skips no-op writes, coalesces bursts, flushes in batches."""
+
+    def __init__(self, db_getter, cache=None, interval=COOKIE_FLUSH_INTERVAL,
+                 refresh_after=COOKIE_REFRESH_AFTER, max_tracked=COOKIE_CACHE_SIZE * 4):
+        self._db = db_getter
+        self.cache = cache
+        self.interval = interval
+        self.refresh_after = refresh_after
+        self.max_tracked = max_tracked
+        self._pending = OrderedDict()  # user_id -> (cookies, timestamp, fingerprint)
+        self._persisted = OrderedDict()  # user_id -> (fingerprint, monotonic time of write)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.submitted = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self.written = 0
+        self.failed = 0
+
+    def submit(self, user_id, cookies):
+        """Queue cookies for user_id. Returns False when the write was skipped as a no-op."""
+        fingerprint = cookie_fingerprint(cookies)
+        timestamp = datetime.utcnow().isoformat()
+        with self._lock:
+            self.submitted += 1
+            persisted = self._persisted.get(user_id)
+            if (user_id not in self._pending and persisted is not None and persisted[0] == fingerprint
+                    and time.monotonic() - persisted[1] < self.refresh_after):
+                self.skipped += 1
+                return False
+            if user_id in self._pending:
+                self.coalesced += 1
+            self._pending[user_id] = (cookies, timestamp, fingerprint)
+        if self.cache is not None:
+            # Readers see the new jar right away, before it reaches Firestore
+            self.cache.put(user_id, cookies, timestamp)
+        if self._thread is None:
+            # No background thread (e.g. scripts); write through
+            self.flush()
+        return True
+
+    def flush(self):
+        """Write everything pending now. Safe to call from any thread."""
+        with self._flush_lock:
+            with self._lock:
+                pending = list(self._pending.items())
+                self._pending.clear()
+            for start in range(0, len(pending), FIRESTORE_BATCH_LIMIT):
+                self._write_batch(pending[start:start + FIRESTORE_BATCH_LIMIT])
+
+    def _write_batch(self, items):
+        try:
+            db = self._db()
+            batch = db.batch()
+            for user_id, (cookies, timestamp, _) in items:
+                batch.set(db.collection(COOKIE_COLLECTION).document(user_id), {
+                    "cookies": cookies,
+                    "timestamp": timestamp,
+                })
+            batch.commit(timeout=FIRESTORE_TIMEOUT)
+        except Exception as e:
+            log.warning("failed to save cookies: %s", e, extra={"users": len(items)})
+            with self._lock:
+                self.failed += len(items)
+                for user_id, item in items:
+                    # Keep for the next flush unless a newer jar arrived meanwhile
+                    if user_id not in self._pending:
+                        self._pending[user_id] = item
+            return
+        now = time.monotonic()
+        with self._lock:
+            self.written += len(items)
+            for user_id, (_, timestamp, fingerprint) in items:
+                self._persisted[user_id] = (fingerprint, now)
+                self._persisted.move_to_end(user_id)
+            while len(self._persisted) > self.max_tracked:
+                self._persisted.popitem(last=False)
+        for user_id, (_, timestamp, _) in items:
+            log.info("cookies saved", extra={"user_id": user_id, "timestamp": timestamp})
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cookie-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                log.warning("cookie writer error: %s", e)
+
+    def stop(self):
+        """Stop the background thread and flush whatever is still pending."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval + 5)
+        self._thread = None
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {"pending": len(self._pending), "submitted": self.submitted, "skipped": self.skipped,
+                    "coalesced": self.coalesced, "written": self.written, "failed": self.failed}
@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# === PER-UTTERANCE DEADLINE BUDGETS ===
+# Seconds a browser step may take, from the moment the utterance is accepted (queueing included)
+# to the reply. Override per state with NOVA_STATE_BUDGETS="pickup=15,ride_options=12".
+DEFAULT_BUDGET = float(os.getenv("NOVA_DEFAULT_BUDGET", "30"))
+STATE_BUDGETS = {
+    "login": 40.0,
+    "manual_login_wait": 15.0,
+    "pickup": 25.0,
+    "dropoff": 25.0,
+    "ride_options": 20.0,
+    "ride_selection": 10.0,
+    "confirm_booking": 20.0,
+}
+
+
+def _parse_budgets(spec):
+    budgets = {}
+    for item in spec.split(","):
+        state, _, seconds = item.partition("=")
+        if state.strip() and seconds.strip():
+            budgets[state.strip()] = float(seconds)
+    return budgets
+
+
+STATE_BUDGETS.update(_parse_budgets(os.getenv("NOVA_STATE_BUDGETS", "")))
+
+_current = threading.local()
+
+
+class DeadlineExceeded(Exception):
+    """The utterance's budget ran out at `step`."""
+
+    def __init__(self, step):
+        self.step = step
+        super().__init__(f"deadline reached at {step}")
+
+
+class Deadline:
+    """A point in time shared by everything working on one request; cancel() ends it early."""
+
+    __slots__ = ("seconds", "expires", "_cancelled")
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+        self._cancelled = threading.Event()
+
+    @property
+    def expired(self):
+        return self._cancelled.is_set() or time.monotonic() >= self.expires
+
+    def remaining(self, cap=None):
+        left = 0.0 if self._cancelled.is_set() else max(0.0, self.expires - time.monotonic())
+        return left if cap is None else min(cap, left)
+
+    def check(self, step):
+        """Raise DeadlineExceeded if the budget is spent; call between browser steps."""
+        if self.expired:
+            raise DeadlineExceeded(step)
+
+    def cancel(self):
+        self._cancelled.set()
+
+
+def budget_for(state):
+    return STATE_BUDGETS.get(state, DEFAULT_BUDGET)
+
+
+def current():
+    """The deadline bound to this thread, or None."""
+    return getattr(_current, "deadline", None)
+
+
+@contextmanager
+def bound(deadline):
+    """Make deadline the budget for blocking calls on this thread (page waits, Firestore, leases)."""
+    previous = current()
+    _current.deadline = deadline
+    try:
+        yield deadline
+    finally:
+        _current.deadline = previous
+
+
+def cap(timeout):
+    """timeout, cut down to what is left of this thread's deadline (0 once it has passed)."""
+    deadline = current()
+    return timeout if deadline is None else deadline.remaining(timeout)
+
+
+def check(step):
+    deadline = current()
+    if deadline is not None:
+        deadline.check(step)
+
+
+def expired():
+    """Whether this thread's deadline has passed (False when none is bound)."""
+    deadline = current()
+    return deadline is not None and deadline.expired
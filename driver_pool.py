@@ -0,0 +1,333 @@
+import os
+import threading
+import time
+from collections import deque
+
+from deadlines import cap
+from logs import get_logger
+from metrics import fallbacks, timeouts
+
+log = get_logger("driver_pool")
+
+# === DRIVER POOL CONFIG ===
+POOL_MIN_SIZE = int(os.getenv("NOVA_POOL_MIN", "1"))
+POOL_MAX_SIZE = int(os.getenv("NOVA_POOL_MAX", "4"))
+POOL_MAX_USES = int(os.getenv("NOVA_POOL_MAX_USES", "20"))
+POOL_MAX_MEMORY_MB = float(os.getenv("NOVA_POOL_MAX_MEMORY_MB", "800"))
+POOL_LEASE_TIMEOUT = float(os.getenv("NOVA_POOL_LEASE_TIMEOUT", "30"))
+SCRUB_ORIGINS = ["https://m.uber.com", "https://auth.uber.com"]
+
+
+def _proc_rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _child_pids(root_pid):
+    """All descendants of root_pid, read from /proc (Linux only)."""
+    parents = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # comm may contain spaces, ppid is the second field after the closing paren
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        parents.setdefault(ppid, []).append(int(entry))
+    found, stack = [], [root_pid]
+    while stack:
+        for child in parents.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def driver_memory_mb(driver):
+    """Resident memory of the browser process tree, or None if it can't be measured."""
+    pid = getattr(driver, "browser_pid", None)
+    if not pid:
+        service = getattr(driver, "service", None)
+        process = getattr(service, "process", None)
+        pid = getattr(process, "pid", None)
+    if not pid or not os.path.isdir("/proc"):
+        return None
+    total_kb = _proc_rss_kb(pid) + sum(_proc_rss_kb(child) for child in _child_pids(pid))
+    return total_kb / 1024.0
+
+
+def scrub_driver(driver):
+    """Remove cookies and storage left behind by the previous session."""
+    try:
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        for origin in SCRUB_ORIGINS:
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+    except Exception:
+        # Not a Chromium driver with CDP access; fall back to the current origin only
+        fallbacks.inc(kind="scrub_js")
+        try:
+            driver.execute_script("try { localStorage.clear(); sessionStorage.clear(); } catch (e) {}")
+        except Exception:
+            pass
+        driver.delete_all_cookies()
+    driver.get("about:blank")
+
+
+class _Stat:
+    __slots__ = ("count", "total", "max", "last")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.last = value
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 1) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 1),
+            "last_ms": round(self.last * 1000, 1),
+        }
+
+
+class _PooledDriver:
+    __slots__ = ("driver", "uses", "created")
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.created = time.monotonic()
+
+
+class DriverPool:
+    """Pre-launched browsers leased to sessions and scrubbed on return."""
+
+    def __init__(self, factory, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 max_uses=POOL_MAX_USES, max_memory_mb=POOL_MAX_MEMORY_MB):
+        self.factory = factory
+        # reclaim() -> True if it asked a speculative holder (prewarm) to hand a browser back.
+        # Called with the pool lock held, so it must not call into the pool itself.
+        self.reclaim = None
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max(1, max_size)
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self._idle = deque()
+        self._leased = {}
+        self._spawning = 0
+        self._external = 0  # browsers launched outside the pool (profiles) under the same cap
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._warmer = None
+        self.lease_wait = _Stat()
+        self.spawn_latency = _Stat()
+        self.recycled = 0
+        self.spawn_failures = 0
+        self.lease_timeouts = 0
+
+    # --- sizing ---
+    def _total_locked(self):
+        return len(self._idle) + len(self._leased) + self._spawning + self._external
+
+    def _spare_locked(self):
+        """Browsers a lease could get right now: idle ones plus room to launch more."""
+        return len(self._idle) + max(0, self.max_size - self._total_locked())
+
+    def reserve(self):
+        """Count a browser launched outside the pool against max_size. False when at the cap."""
+        with self._cond:
+            if self._total_locked() >= self.max_size:
+                return False
+            self._external += 1
+            return True
+
+    def unreserve(self):
+        """The browser counted by reserve() has quit."""
+        with self._cond:
+            self._external = max(0, self._external - 1)
+            self._cond.notify_all()
+
+    def _spawn(self):
+        """Launch one browser. The caller has already reserved a _spawning slot."""
+        started = time.monotonic()
+        driver = None
+        try:
+            driver = self.factory()
+        except Exception as e:
+            log.warning("failed to launch browser: %s", e)
+        elapsed = time.monotonic() - started
+        with self._cond:
+            self._spawning -= 1
+            if driver is None:
+                self.spawn_failures += 1
+            else:
+                self.spawn_latency.add(elapsed)
+            self._cond.notify_all()
+        return _PooledDriver(driver) if driver is not None else None
+
+    def _quit(self, pooled):
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+
+    # --- background pre-warming ---
+    def start(self):
+        if self._warmer and self._warmer.is_alive():
+            return
+        self._stop.clear()
+        self._warmer = threading.Thread(target=self._warm_loop, name="driver-pool-warmer", daemon=True)
+        self._warmer.start()
+
+    def _warm_loop(self):
+        while not self._stop.is_set():
+            with self._cond:
+                while not self._stop.is_set() and (
+                    len(self._idle) + self._spawning >= self.min_size
+                    or self._total_locked() >= self.max_size
+                ):
+                    self._cond.wait(timeout=5)
+                if self._stop.is_set():
+                    return
+                self._spawning += 1
+            pooled = self._spawn()
+            if pooled is None:
+                # Back off instead of hammering a broken Chrome install
+                self._stop.wait(10)
+                continue
+            with self._cond:
+                self._idle.append(pooled)
+                self._cond.notify_all()
+
+    # --- leasing ---
+    def lease(self, timeout=POOL_LEASE_TIMEOUT, speculative=False, headroom=0):
+        """Hand out a warm driver, launching one if under max_size. Returns None on timeout.
+
+        The wait is also capped by the calling thread's deadline (see deadlines.py). A real
+        lease that finds the pool full and is willing to wait first reclaims a browser held
+        speculatively; speculative leases never do. headroom leaves that many browsers (idle or
+        launchable) for others.
+        """
+        timeout = cap(timeout)
+        started = time.monotonic()
+        deadline = started + timeout
+        pooled = None
+        # A reclaimed browser comes back asynchronously, so a lease that will not wait cannot use it
+        reclaimed = speculative or timeout <= 0
+        with self._cond:
+            while True:
+                if self._spare_locked() > headroom:
+                    if self._idle:
+                        pooled = self._idle.popleft()
+                    else:
+                        self._spawning += 1
+                    break
+                if not reclaimed and self.reclaim is not None:
+                    # One per lease: the browser comes back through release(), which wakes us
+                    reclaimed = True
+                    if self.reclaim():
+                        fallbacks.inc(kind="pool_reclaim")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    if headroom:
+                        fallbacks.inc(kind="pool_headroom")
+                    else:
+                        self.lease_timeouts += 1
+                        timeouts.inc(kind="pool_lease")
+                    return None
+                self._cond.wait(timeout=remaining)
+        if pooled is None:
+            pooled = self._spawn()
+            if pooled is None:
+                return None
+        pooled.uses += 1
+        with self._cond:
+            self._leased[id(pooled.driver)] = pooled
+            self.lease_wait.add(time.monotonic() - started)
+            # Top the idle set back up in the background
+            self._cond.notify_all()
+        return pooled.driver
+
+    def release(self, driver, recycle=False):
+        """Return a leased driver. It is scrubbed and reused, or quit if it is worn out."""
+        if driver is None:
+            return
+        with self._cond:
+            pooled = self._leased.pop(id(driver), None)
+        if pooled is None:
+            # Not ours (e.g. created outside the pool); just close it
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            return
+        if not recycle and pooled.uses >= self.max_uses:
+            recycle = True
+        if not recycle and self.max_memory_mb:
+            memory = driver_memory_mb(driver)
+            if memory is not None and memory > self.max_memory_mb:
+                log.info("recycling browser over memory limit", extra={"memory_mb": round(memory)})
+                recycle = True
+        if not recycle:
+            try:
+                scrub_driver(driver)
+            except Exception as e:
+                log.warning("failed to scrub browser, recycling it: %s", e)
+                recycle = True
+        if recycle:
+            self._quit(pooled)
+            with self._cond:
+                self.recycled += 1
+                self._cond.notify_all()
+            return
+        with self._cond:
+            if self._stop.is_set():
+                self._quit(pooled)
+                return
+            self._idle.append(pooled)
+            self._cond.notify_all()
+
+    # --- introspection ---
+    def stats(self):
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "idle": len(self._idle),
+                "leased": len(self._leased),
+                "spawning": self._spawning,
+                "external": self._external,
+                "recycled": self.recycled,
+                "spawn_failures": self.spawn_failures,
+                "lease_timeouts": self.lease_timeouts,
+                "lease_wait": self.lease_wait.as_dict(),
+                "spawn_latency": self.spawn_latency.as_dict(),
+            }
+
+    def shutdown(self):
+        self._stop.set()
+        with self._cond:
+            drivers = list(self._idle) + list(self._leased.values())
+            self._idle.clear()
+            self._leased.clear()
+            self._cond.notify_all()
+        for pooled in drivers:
+            self._quit(pooled)
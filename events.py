@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+from collections import defaultdict, deque
+
+from metrics import counter, gauge
+
+# === SESSION EVENT STREAM CONFIG (Server-Sent Events at /api/events) ===
+# Recent events kept per session so a reconnecting EventSource (Last-Event-ID) misses nothing
+EVENT_BACKLOG = int(os.getenv("NOVA_EVENT_BACKLOG", "50"))
+# Events buffered per connection before a slow client starts losing them
+EVENT_QUEUE_MAX = int(os.getenv("NOVA_EVENT_QUEUE_MAX", "256"))
+# Comment line sent on idle streams so proxies keep the connection open
+EVENT_KEEPALIVE = float(os.getenv("NOVA_EVENT_KEEPALIVE", "15"))
+
+events_published = counter("nova_events_total", "Session events published, by kind")
+events_dropped = counter("nova_events_dropped_total", "Session events dropped for a slow subscriber")
+subscribers_gauge = gauge("nova_event_subscribers", "Open /api/events streams")
+
+
+class Event:
+    __slots__ = ("id", "kind", "data")
+
+    def __init__(self, event_id, kind, data):
+        self.id = event_id
+        self.kind = kind
+        self.data = data
+
+    def encode(self):
+        """One SSE frame (no id line for events outside the backlog, e.g. the initial state)."""
+        payload = json.dumps(self.data, ensure_ascii=False, default=str)
+        head = f"id: {self.id}\n" if self.id is not None else ""
+        return f"{head}event: {self.kind}\ndata: {payload}\n\n"
+
+
+class Subscriber:
+    """One open stream: events are handed to its event loop thread-safely."""
+
+    __slots__ = ("session_id", "loop", "queue")
+
+    def __init__(self, session_id, loop, queue):
+        self.session_id = session_id
+        self.loop = loop
+        self.queue = queue
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass  # loop closed; unsubscribe is on its way
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except Exception:
+            events_dropped.inc()
+
+
+class EventBus:
+    """Per-session fan-out from browser/job threads to asyncio SSE streams.
+
+    publish() is safe from any thread and never blocks on a subscriber.
+    """
+
+    def __init__(self, backlog=EVENT_BACKLOG):
+        self.backlog = backlog
+        self._subscribers = defaultdict(set)  # session_id -> {Subscriber}
+        self._recent = {}  # session_id -> deque of Event
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def publish(self, session_id, kind, **data):
+        with self._lock:
+            self._seq += 1
+            event = Event(self._seq, kind, data)
+            recent = self._recent.get(session_id)
+            if recent is None:
+                recent = self._recent[session_id] = deque(maxlen=self.backlog)
+            recent.append(event)
+            targets = list(self._subscribers.get(session_id, ()))
+        events_published.inc(kind=kind)
+        for subscriber in targets:
+            subscriber.deliver(event)
+        return event
+
+    def subscribe(self, session_id, loop, queue, last_event_id=None):
+        """Register a stream; events after last_event_id still in the backlog are queued first."""
+        subscriber = Subscriber(session_id, loop, queue)
+        with self._lock:
+            self._subscribers[session_id].add(subscriber)
+            missed = [event for event in self._recent.get(session_id, ())
+                      if last_event_id is not None and event.id > last_event_id]
+        for event in missed:
+            subscriber._put(event)
+        subscribers_gauge.inc()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.session_id)
+            if subscribers is None or subscriber not in subscribers:
+                return
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.session_id]
+        subscribers_gauge.dec()
+
+    def forget(self, session_id):
+        """Drop a session's backlog (it was evicted)."""
+        with self._lock:
+            self._recent.pop(session_id, None)
@@ -0,0 +1,70 @@
+import json
+import os
+import threading
+
+from logs import get_logger
+
+log = get_logger("firestore")
+
+# === FIREBASE SETUP (lazy; supports env var for Render) ===
+# firebase_admin and the Firestore client pull in grpc and google-cloud, so they are only
+# imported and initialized the first time something actually needs the database.
+FIREBASE_CRED_PATH = os.path.join(os.path.dirname(__file__), "serviceAccountKey.json")
+# Per-call timeout for Firestore reads and writes (reads on the request path are also capped by
+# the utterance's deadline, see deadlines.py)
+FIRESTORE_TIMEOUT = float(os.getenv("NOVA_FIRESTORE_TIMEOUT", "5"))
+
+_db = None
+_lock = threading.Lock()
+
+
+def _init_db():
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    if not firebase_admin._apps:
+        cred_env = os.getenv("FIREBASE_CRED_JSON")
+        try:
+            if cred_env:
+                cred_dict = json.loads(cred_env)
+                cred = credentials.Certificate(cred_dict)
+            else:
+                cred = credentials.Certificate(FIREBASE_CRED_PATH)
+            firebase_admin.initialize_app(cred)
+        except Exception:
+            # Fallback to file if env failed
+            cred = credentials.Certificate(FIREBASE_CRED_PATH)
+            firebase_admin.initialize_app(cred)
+    return firestore.client()
+
+
+def get_db():
+    """Firestore client, created on first use."""
+    global _db
+    if _db is None:
+        with _lock:
+            if _db is None:
+                _db = _init_db()
+    return _db
+
+
+def set_db(client):
+    """Install a client (e.g. an in-memory stand-in for benchmarks) instead of the real one."""
+    global _db
+    with _lock:
+        _db = client
+
+
+def is_ready():
+    return _db is not None
+
+
+def warm():
+    """Initialize the client ahead of the first request. Errors are reported, not raised."""
+    try:
+        get_db()
+        log.info("firestore client ready")
+        return True
+    except Exception as e:
+        log.warning("firestore init failed: %s", e)
+        return False
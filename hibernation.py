@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+
+from logs import get_logger
+from metrics import counter, gauge
+
+log = get_logger("hibernation")
+
+# === DRIVER HIBERNATION CONFIG ===
+# A session's browser is snapshotted and quit after this long without an utterance
+HIBERNATE_AFTER = float(os.getenv("NOVA_HIBERNATE_AFTER", "300"))
+# Total browser memory across sessions; the least recently active are hibernated first when over it
+BROWSER_MEMORY_BUDGET_MB = float(os.getenv("NOVA_BROWSER_MEMORY_BUDGET_MB", "3000"))
+# Never hibernate for memory a session that spoke more recently than this
+HIBERNATE_MIN_IDLE = float(os.getenv("NOVA_HIBERNATE_MIN_IDLE", "30"))
+HIBERNATE_INTERVAL = float(os.getenv("NOVA_HIBERNATE_INTERVAL", "30"))
+
+hibernations = counter("nova_hibernations_total", "Session browsers snapshotted and quit, by reason")
+session_browser_memory = gauge("nova_session_browser_memory_mb", "Resident memory of session and prewarmed browsers at the last reaper pass")
+
+
+class Hibernator:
+    """Reaper that quits idle session browsers and keeps the rest under a memory budget.
+
+    hibernate(session) snapshots and quits the driver; it is called with the session lock
+    held. Sessions that are busy (lock held or a job pending) are never touched. held() lists
+    browsers held outside any session (prewarms, with .driver and .reclaim()); they count
+    towards the memory budget and are given back before any session is hibernated.
+    """
+
+    def __init__(self, sessions, hibernate, is_busy, memory_of, idle_after=HIBERNATE_AFTER,
+                 budget_mb=BROWSER_MEMORY_BUDGET_MB, min_idle=HIBERNATE_MIN_IDLE, held=None):
+        self.sessions = sessions
+        self.hibernate = hibernate
+        self.is_busy = is_busy
+        self.memory_of = memory_of
+        self.held = held
+        self.idle_after = idle_after
+        self.budget_mb = budget_mb
+        self.min_idle = min_idle
+        self._thread = None
+        self._stop = threading.Event()
+
+    def run_once(self):
+        """One reaper pass. Returns the number of sessions hibernated."""
+        now = time.monotonic()
+        count = 0
+        live = []
+        for session in self.sessions.sessions():
+            if session.driver is None:
+                continue
+            if self.idle_after and session.idle_for(now) >= self.idle_after:
+                if self._try(session, "idle"):
+                    count += 1
+                    continue
+            live.append(session)
+        if not self.budget_mb:
+            return count
+        usage = [(session, self._memory(session.driver)) for session in live]
+        held = [(holder, self._memory(holder.driver)) for holder in (self.held() if self.held else ())
+                if holder.driver is not None]
+        total = sum(mb for _, mb in usage) + sum(mb for _, mb in held)
+        session_browser_memory.set(round(total, 1))
+        # An unclaimed prewarm is cheaper to give up than a rider's page
+        for holder, mb in held:
+            if total <= self.budget_mb:
+                break
+            if holder.reclaim():
+                total -= mb
+        # Oldest activity first
+        for session, mb in sorted(usage, key=lambda item: item[0].last_seen):
+            if total <= self.budget_mb:
+                break
+            if session.idle_for(now) < self.min_idle:
+                break
+            if self._try(session, "memory"):
+                total -= mb
+                count += 1
+        return count
+
+    def _memory(self, driver):
+        try:
+            return self.memory_of(driver) or 0.0
+        except Exception:
+            return 0.0
+
+    def _try(self, session, reason):
+        if self.is_busy(session) or not session.lock.acquire(blocking=False):
+            return False
+        try:
+            if session.driver is None:
+                return False
+            self.hibernate(session)
+        except Exception as e:
+            log.warning("hibernation failed: %s", e, extra={"session_id": session.session_id})
+            return False
+        finally:
+            session.lock.release()
+        hibernations.inc(reason=reason)
+        log.info("session browser hibernated", extra={"session_id": session.session_id,
+                                                       "state": session.waiting_for, "reason": reason})
+        return True
+
+    def start(self, interval=HIBERNATE_INTERVAL):
+        if self._thread and self._thread.is_alive():
+            return
+
+        def _run():
+            while not self._stop.wait(interval):
+                try:
+                    self.run_once()
+                except Exception as e:
+                    log.warning("hibernation reaper error: %s", e)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=_run, name="driver-reaper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
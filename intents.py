@@ -0,0 +1,103 @@
+import re
+
+# === INTENT KEYWORDS ===
+# Each intent is a list of alternatives; an alternative matches when all of its keywords
+# occur in the utterance (substring match, like the old `k in text` checks).
+INTENTS = {
+    "english": [("english",), ("अंग्रेजी",)],
+    "hindi": [("hindi",), ("हिंदी",)],
+    "wake": [("wake up nova",), ("wake nova",), ("wake",), ("wakeup",), ("वेक अप नोवा",), ("वेक नोवा",)],
+    "book_ride": [("book", "cab"), ("book", "ride"), ("open", "uber"), ("कैब", "बुक")],
+    "change_language": [("change language",), ("भाषा बदलो",)],
+    "login_ready": [("logged in",), ("ready",), ("done",), ("finished",), ("complete",), ("हो गया",), ("तैयार",)],
+    "confirm": [("yes",), ("confirm",), ("yeah",), ("proceed",), ("haan",), ("haan ji",)],
+    # Our own prompts, transcribed back by the microphone
+    "pickup_echo": [("what is your pickup location",), ("what is your pick up location",), ("please say your pickup location",)],
+    "dropoff_echo": [("where are you going",), ("please say your drop location",), ("please say your dropoff location",)],
+}
+
+# Romanized Hindi and Devanagari spellings of the keywords above. These only match as
+# whole words/phrases ("ha" must not fire inside "what"), and count as the keyword they map to.
+TRANSLITERATIONS = {
+    "han": "haan",
+    "haa": "haan",
+    "haaan": "haan",
+    "ha": "haan",
+    "हाँ": "haan",
+    "हां": "haan",
+    "हा": "haan",
+    "हाँ जी": "haan ji",
+    "हां जी": "haan ji",
+    "इंग्लिश": "english",
+    "अंग्रेज़ी": "अंग्रेजी",
+    "hindee": "hindi",
+    "हिन्दी": "हिंदी",
+    "बुक": "book",
+    "कैब": "cab",
+    "टैक्सी": "cab",
+    "taxi": "cab",
+    "गाड़ी": "cab",
+    "gaadi": "cab",
+    "राइड": "ride",
+    "उबर": "uber",
+    "ओपन": "open",
+    "वेक": "wake",
+    "रेडी": "ready",
+    "डन": "done",
+    "कन्फर्म": "confirm",
+    "taiyar": "तैयार",
+    "ho gaya": "हो गया",
+    "ho gya": "हो गया",
+    "bhasha badlo": "भाषा बदलो",
+}
+
+# Punctuation (including the Devanagari danda) becomes a word break
+_PUNCT_RE = re.compile(r"[^\w\s\u0900-\u0963\u0966-\u097f]+")
+
+
+def normalize(text):
+    """Lowercase, drop punctuation and pad with spaces so whole-word patterns can match at the edges."""
+    return " " + " ".join(_PUNCT_RE.sub(" ", (text or "").lower()).split()) + " "
+
+
+class IntentMatcher:
+    """Precompiled matcher for INTENTS. Build once at import, call classify per utterance.
+
+    Each keyword is a plain substring check on the normalized text (transliterations padded
+    with spaces, so they only match whole words). Passing the intents a state acts on checks
+    only their keywords; most states need one or two intents, or none.
+    """
+
+    def __init__(self, intents=INTENTS, transliterations=TRANSLITERATIONS):
+        self._intents = {intent: [frozenset(alternative) for alternative in alternatives]
+                         for intent, alternatives in intents.items()}
+        self._transliterations = dict(transliterations)
+        self._checks = {}  # frozenset of intents (None = all) -> (intents, ((pattern, keyword), ...))
+
+    def _checks_for(self, only):
+        key = None if only is None else frozenset(only)
+        checks = self._checks.get(key)
+        if checks is None:
+            intents = tuple(intent for intent in self._intents if key is None or intent in key)
+            keywords = {keyword for intent in intents for alternative in self._intents[intent] for keyword in alternative}
+            patterns = tuple((keyword, keyword) for keyword in sorted(keywords)) + tuple(
+                (f" {spelling} ", keyword) for spelling, keyword in self._transliterations.items() if keyword in keywords)
+            # Built once per intent set; a concurrent duplicate build is harmless
+            checks = self._checks[key] = (intents, patterns)
+        return checks
+
+    def classify(self, text, only=None):
+        """Return the set of intent names present in text (among only, when given)."""
+        intents, patterns = self._checks_for(only)
+        if not patterns:
+            return frozenset()
+        text = normalize(text)
+        found = {keyword for pattern, keyword in patterns if pattern in text}
+        if not found:
+            return frozenset()
+        return frozenset(intent for intent in intents
+                         if any(alternative <= found for alternative in self._intents[intent]))
+
+
+matcher = IntentMatcher()
+classify = matcher.classify
@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from cluster import local_id
+from logs import get_logger
+
+log = get_logger("jobs")
+
+# === BROWSER JOB CONFIG ===
+BROWSER_WORKERS = int(os.getenv("NOVA_BROWSER_WORKERS", "8"))
+MAX_FINISHED_JOBS = int(os.getenv("NOVA_MAX_FINISHED_JOBS", "1000"))
+
+_current = threading.local()
+
+
+def set_progress(message, **data):
+    """Record progress on the job running in this thread (no-op outside a job).
+
+    data rides along to the job's listener (e.g. the ride list as it is read) but is not stored.
+    """
+    job = getattr(_current, "job", None)
+    if job is not None:
+        job.progress = message
+        job.updated = time.time()
+        job.notify(message, data)
+
+
+class Job:
+    __slots__ = ("job_id", "session_id", "state", "status", "progress", "result", "error",
+                 "created", "updated", "started", "finished", "listener", "_done")
+
+    def __init__(self, session_id, state, listener=None):
+        self.job_id = local_id()  # names the owning worker, so the router can find it
+        self.session_id = session_id
+        self.state = state
+        self.status = "queued"  # queued | running | done | failed
+        self.progress = None
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.updated = self.created
+        self.started = None
+        self.finished = None
+        self.listener = listener  # listener(job, kind, data) for status changes and progress
+        self._done = threading.Event()
+
+    def notify(self, kind, data=None):
+        if self.listener is None:
+            return
+        try:
+            self.listener(self, kind, data or {})
+        except Exception as e:
+            log.warning("job listener failed: %s", e, extra={"job_id": self.job_id})
+
+    def wait(self, timeout=None):
+        """Block until the job has finished. Returns False on timeout."""
+        return self._done.wait(timeout)
+
+    @property
+    def pending(self):
+        return self.status in ("queued", "running")
+
+    def as_dict(self):
+        data = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "state": self.state,
+            "progress": self.progress,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+
+class JobManager:
+    """Runs slow browser steps on a dedicated executor so request threads return immediately."""
+
+    def __init__(self, max_workers=BROWSER_WORKERS, max_finished=MAX_FINISHED_JOBS, listener=None):
+        self.listener = listener
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="browser-job")
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._lock = threading.Lock()
+        self.max_finished = max_finished
+
+    def submit(self, session_id, state, fn, *args, **kwargs):
+        job = Job(session_id, state, self.listener)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._active[session_id] = job
+            self._prune_locked()
+        job.notify("job", {"status": job.status})
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = "running"
+        job.started = time.time()
+        job.notify("job", {"status": job.status})
+        _current.job = job
+        try:
+            job.result = fn(*args, **kwargs)
+            job.status = "done"
+        except Exception as e:
+            log.warning("job failed: %s", e, extra={"job_id": job.job_id, "session_id": job.session_id, "state": job.state})
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            _current.job = None
+            job.finished = job.updated = time.time()
+            with self._lock:
+                if self._active.get(job.session_id) is job:
+                    del self._active[job.session_id]
+            job._done.set()
+            job.notify("job", {"status": job.status, "result": job.result, "error": job.error})
+
+    def _prune_locked(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.pending]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_for(self, session_id):
+        with self._lock:
+            return self._active.get(session_id)
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
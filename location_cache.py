@@ -0,0 +1,132 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# === RESOLVED LOCATION CACHE CONFIG ===
+LOCATION_CACHE_PER_USER = int(os.getenv("NOVA_LOCATION_CACHE_PER_USER", "50"))
+LOCATION_CACHE_GLOBAL = int(os.getenv("NOVA_LOCATION_CACHE_GLOBAL", "2000"))
+LOCATION_CACHE_USERS = int(os.getenv("NOVA_LOCATION_CACHE_USERS", "1000"))
+
+# Spoken variants (Devanagari and romanized Hindi) folded onto one key
+_ALIASES = {
+    "घर": "home",
+    "ghar": "home",
+    "residence": "home",
+    "ऑफिस": "office",
+    "ओफिस": "office",
+    "आफिस": "office",
+    "दफ्तर": "office",
+    "दफ़्तर": "office",
+    "daftar": "office",
+    "work": "office",
+    "एयरपोर्ट": "airport",
+    "एअरपोर्ट": "airport",
+    "हवाई": "airport",
+    "अड्डा": "",
+    "adda": "",
+    "स्टेशन": "station",
+    "रेलवे": "railway",
+    "मेट्रो": "metro",
+    "बस": "bus",
+    "स्टैंड": "stand",
+    "अस्पताल": "hospital",
+    "hospital": "hospital",
+    "मॉल": "mall",
+    "मंदिर": "temple",
+    "mandir": "temple",
+}
+_FILLERS = {"my", "the", "to", "please", "मेरा", "मेरे", "मेरी", "mera", "mere", "meri", "का", "की", "के", "ka", "ki", "ke"}
+# Places that mean something different for every rider; never shared across users
+_PERSONAL = {"home", "office"}
+_PUNCT_RE = re.compile(r"[^\w\sऀ-ॿ]+")
+
+
+def normalize_location(text):
+    """Canonical cache key for a spoken location ("मेरा घर" and "my home" -> "home")."""
+    tokens = []
+    for token in _PUNCT_RE.sub(" ", (text or "").lower()).split():
+        if token in _FILLERS:
+            continue
+        token = _ALIASES.get(token, token)
+        if token:
+            tokens.append(token)
+    return " ".join(tokens)
+
+
+class LocationCache:
+    """Per-user and global LRU maps from normalized transcript to the suggestion that was picked."""
+
+    def __init__(self, per_user=LOCATION_CACHE_PER_USER, global_size=LOCATION_CACHE_GLOBAL,
+                 max_users=LOCATION_CACHE_USERS):
+        self.per_user = per_user
+        self.global_size = global_size
+        self.max_users = max_users
+        self._users = OrderedDict()  # user_id -> OrderedDict(key -> entry)
+        self._global = OrderedDict()
+        self._lock = threading.Lock()
+        self.user_hits = 0
+        self.global_hits = 0
+        self.misses = 0
+
+    def lookup(self, user_id, text):
+        """Return {"label", "index"} for a known place, or None."""
+        key = normalize_location(text)
+        if not key:
+            return None
+        with self._lock:
+            entries = self._users.get(user_id)
+            if entries is not None and key in entries:
+                entries.move_to_end(key)
+                self._users.move_to_end(user_id)
+                self.user_hits += 1
+                return dict(entries[key])
+            if key in self._global:
+                self._global.move_to_end(key)
+                self.global_hits += 1
+                return dict(self._global[key])
+            self.misses += 1
+            return None
+
+    def record(self, user_id, text, label, index=0):
+        key = normalize_location(text)
+        if not key or not label:
+            return
+        entry = {"label": label, "index": index}
+        with self._lock:
+            entries = self._users.get(user_id)
+            if entries is None:
+                entries = self._users[user_id] = OrderedDict()
+            entries[key] = entry
+            entries.move_to_end(key)
+            self._users.move_to_end(user_id)
+            while len(entries) > self.per_user:
+                entries.popitem(last=False)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            if not _PERSONAL.intersection(key.split()):
+                self._global[key] = entry
+                self._global.move_to_end(key)
+                while len(self._global) > self.global_size:
+                    self._global.popitem(last=False)
+
+    def forget(self, user_id, text):
+        """Drop a mapping that no longer resolves (e.g. the suggestion disappeared)."""
+        key = normalize_location(text)
+        with self._lock:
+            entries = self._users.get(user_id)
+            if entries is not None:
+                entries.pop(key, None)
+            self._global.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.user_hits + self.global_hits + self.misses
+            return {
+                "users": len(self._users),
+                "global_entries": len(self._global),
+                "user_hits": self.user_hits,
+                "global_hits": self.global_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.user_hits + self.global_hits) / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,239 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from logs import get_logger
+from metrics import counter
+from waits import wait_for_match
+
+log = get_logger("locators")
+
+# === LOCATOR REGISTRY CONFIG ===
+# Learned candidate ordering survives restarts here
+LOCATOR_FILE = os.getenv("NOVA_LOCATOR_FILE", os.path.join("/tmp", "nova-locators.json"))
+LOCATOR_SAVE_INTERVAL = 30
+# Once a locator has this many hits, waits for it are capped near its slowest observed hit
+LOCATOR_LEARN_MIN_HITS = int(os.getenv("NOVA_LOCATOR_LEARN_MIN_HITS", "20"))
+LOCATOR_FAST_FAIL_FACTOR = 3.0
+LOCATOR_FAST_FAIL_FLOOR = float(os.getenv("NOVA_LOCATOR_FAST_FAIL_FLOOR", "3"))
+
+# Candidate strategies per logical element (CSS, or XPath starting with '/'). The first is the
+# markup the flow was written against; the rest are looser fallbacks for when Uber changes it.
+# All candidates are probed in the same in-page script, so a stale first choice costs nothing.
+CANDIDATES = {
+    "login_button": (
+        "button.css-dHHA-DQ",
+        '[data-testid="login-button"]',
+        '//button[normalize-space()="Log in" or normalize-space()="Login"]',
+        '//a[normalize-space()="Log in" or normalize-space()="Login"]',
+    ),
+    "pickup_button": (
+        '[data-testid="pudo-button-pickup"]',
+        '[data-testid*="pickup"][role="button"]',
+        'button[aria-label*="pickup" i]',
+    ),
+    "pickup_input": (
+        'input[placeholder="Pickup location"]',
+        'input[data-testid*="pickup"]',
+        'input[aria-label*="pickup" i]',
+        'input[placeholder*="pickup" i]',
+    ),
+    "dropoff_input": (
+        'input[placeholder="Dropoff location"]',
+        'input[data-testid*="dropoff"]',
+        'input[aria-label*="dropoff" i]',
+        'input[placeholder*="dropoff" i]',
+        'input[placeholder*="where to" i]',
+    ),
+    "request_button": (
+        '//*[@id="wrapper"]/div[1]/div[3]/main/div/section/div[3]/div/div/button',
+        '[data-testid="request_trip_button"]',
+        '//main//section//button[starts-with(normalize-space(), "Request") or starts-with(normalize-space(), "Choose")]',
+    ),
+    "confirm_button": (
+        '//*[@id="wrapper"]/div[2]/div/div[2]/div/div/div/div/div/div/div[3]/div[2]/button',
+        '//*[@role="dialog"]//button[starts-with(normalize-space(), "Confirm")]',
+    ),
+}
+
+# Non-blocking variant of waits.WAIT_JS: the first present candidate right now, or null.
+PROBE_JS = """
+var selectors = arguments[0];
+for (var i = 0; i < selectors.length; i++) {
+  var el = null;
+  try {
+    var sel = selectors[i];
+    el = (sel.charAt(0) === '/' || sel.charAt(0) === '(')
+      ? document.evaluate(sel, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue
+      : document.querySelector(sel);
+  } catch (e) {}
+  if (el) return {element: el, index: i};
+}
+return null;
+"""
+
+locator_hits = counter("nova_locator_hits_total", "Locator matches, by locator and candidate rank (0 = first choice)")
+
+
+class _Stat:
+    __slots__ = ("hits", "misses", "latency", "slowest")
+
+    def __init__(self, hits=0, misses=0, latency=0.0, slowest=0.0):
+        self.hits = hits
+        self.misses = misses
+        self.latency = latency  # moving average of time to match, seconds
+        self.slowest = slowest
+
+    def score(self):
+        # Laplace-smoothed success rate, so a new candidate is neither trusted nor written off
+        return (self.hits + 1) / (self.hits + self.misses + 2)
+
+
+class LocatorRegistry:
+    """Candidate selectors per logical element, ranked by how often and how fast each matched.
+
+    Every wait probes all candidates at once (see waits.WAIT_JS) in ranked order; the one that
+    matched gets a hit and the candidates ranked above it a miss, so a selector that stops
+    matching sinks below one that still does. Stats are written to LOCATOR_FILE.
+    """
+
+    def __init__(self, candidates=CANDIDATES, path=LOCATOR_FILE, save_interval=LOCATOR_SAVE_INTERVAL):
+        self.candidates = {name: tuple(selectors) for name, selectors in candidates.items()}
+        self.path = path
+        self.save_interval = save_interval
+        self._stats = {name: {selector: _Stat() for selector in selectors}
+                       for name, selectors in self.candidates.items()}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved = time.monotonic()
+        self._load()
+
+    # --- persistence ---
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log.warning("ignoring unreadable locator stats: %s", e, extra={"path": self.path})
+            return
+        for name, selectors in saved.items():
+            known = self._stats.get(name, {})
+            # Candidates removed from CANDIDATES are dropped; new ones start fresh
+            for selector, values in selectors.items():
+                if selector in known:
+                    known[selector] = _Stat(*values)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {name: {selector: [s.hits, s.misses, round(s.latency, 4), round(s.slowest, 4)]
+                           for selector, s in stats.items()}
+                    for name, stats in self._stats.items()}
+            self._dirty = False
+            self._saved = time.monotonic()
+        # Each writer gets its own temp file, so workers sharing the path never clobber a half-written save
+        tmp = None
+        try:
+            with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(self.path) or ".",
+                                             prefix=os.path.basename(self.path) + ".", suffix=".tmp",
+                                             delete=False, encoding="utf-8") as f:
+                tmp = f.name
+                json.dump(data, f, indent=1)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            log.warning("failed to save locator stats: %s", e, extra={"path": self.path})
+            if tmp:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+
+    def _maybe_save(self):
+        if self._dirty and time.monotonic() - self._saved >= self.save_interval:
+            self.save()
+
+    # --- ranking ---
+    def ranked(self, name):
+        """Candidates for name, best first (declared order breaks ties)."""
+        stats = self._stats[name]
+        with self._lock:
+            order = sorted(enumerate(self.candidates[name]),
+                           key=lambda item: (-stats[item[1]].score(), stats[item[1]].latency, item[0]))
+        return [selector for _, selector in order]
+
+    def timeout_for(self, name, timeout):
+        """Cap a wait once the locator's normal latency is known, so markup drift fails fast."""
+        with self._lock:
+            stats = self._stats[name].values()
+            hits = sum(s.hits for s in stats)
+            slowest = max(s.slowest for s in stats)
+        if hits < LOCATOR_LEARN_MIN_HITS:
+            return timeout
+        return min(timeout, max(LOCATOR_FAST_FAIL_FLOOR, slowest * LOCATOR_FAST_FAIL_FACTOR))
+
+    def record(self, name, ranked, index, elapsed):
+        """ranked[index] matched after elapsed seconds; everything ranked above it did not."""
+        with self._lock:
+            stats = self._stats[name]
+            hit = stats[ranked[index]]
+            hit.hits += 1
+            hit.latency = elapsed if hit.hits == 1 else hit.latency * 0.8 + elapsed * 0.2
+            hit.slowest = max(hit.slowest, elapsed)
+            for selector in ranked[:index]:
+                stats[selector].misses += 1
+            self._dirty = True
+        locator_hits.inc(locator=name, rank=str(index))
+        if index:
+            log.info("locator fallback matched", extra={"locator": name, "selector": ranked[index], "rank": index})
+        self._maybe_save()
+
+    # --- lookups ---
+    def wait(self, driver, name, timeout=10, mode="clickable", step=None):
+        """waits.wait_for over every candidate for name, in ranked order."""
+        ranked = self.ranked(name)
+        started = time.monotonic()
+        element, index = wait_for_match(driver, ranked, self.timeout_for(name, timeout), mode, step or name)
+        self.record(name, ranked, index, time.monotonic() - started)
+        return element
+
+    def probe(self, driver, name):
+        """The first candidate present right now, in one script call; None if there is none.
+
+        Driver errors propagate: a dead browser is not a page without the element.
+        """
+        ranked = self.ranked(name)
+        started = time.monotonic()
+        found = driver.execute_script(PROBE_JS, ranked)
+        if not found:
+            return None
+        self.record(name, ranked, found["index"], time.monotonic() - started)
+        return found["element"]
+
+    def stats(self):
+        """Candidates per locator in ranked order, with their counts."""
+        ranking = {name: self.ranked(name) for name in self.candidates}
+        with self._lock:
+            return {name: [{"selector": selector, "hits": self._stats[name][selector].hits,
+                            "misses": self._stats[name][selector].misses,
+                            "latency_ms": round(self._stats[name][selector].latency * 1000, 1)}
+                           for selector in ranked]
+                    for name, ranked in ranking.items()}
+
+
+registry = LocatorRegistry()
+
+
+def wait_for_locator(driver, name, timeout=10, mode="clickable", step=None):
+    return registry.wait(driver, name, timeout, mode, step)
+
+
+def probe(driver, name):
+    return registry.probe(driver, name)
+
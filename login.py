@@ -1,18 +1,19 @@
-from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException
-import time
+from locators import probe
+from logs import get_logger
+from metrics import stage_seconds, timed
+
+log = get_logger("login")
 
 # === Check if user is already logged in ===
+@timed(stage_seconds, stage="is_logged_in")
 def is_logged_in(driver):
-    try:
-        # Mobile: if "Login" button is present, user is NOT logged in
-        driver.find_element(By.CSS_SELECTOR, "button.css-dHHA-DQ")
-        return False
-    except NoSuchElementException:
-        return True
+    # Mobile: if a "Login" button is present, user is NOT logged in (all candidates in one call).
+    # Driver errors raise, so a crashed browser never reads as logged in.
+    return probe(driver, "login_button") is None
 
 # === Click login button if needed ===
 def click_login_button(driver, speak_func, selected_language="en"):
+    """Prompt for and open the manual login. Returns at once; main's LoginWatcher notices the login."""
     if is_logged_in(driver):
         if selected_language == "hi":
             speak_func("आप पहले से लॉग इन हैं। लॉगिन छोड़ रहा हूँ।", lang=selected_language)
@@ -26,26 +27,13 @@ def click_login_button(driver, speak_func, selected_language="en"):
         speak_func("It looks like you're not logged in yet. Please log in manually.", lang=selected_language)
 
     try:
-        login_btn = driver.find_element(By.CSS_SELECTOR, "button.css-dHHA-DQ")
+        login_btn = probe(driver, "login_button")
+        if login_btn is None:
+            raise RuntimeError("login button not found")
         driver.execute_script("arguments[0].click();", login_btn)
     except Exception as e:
-        print(f"⚠️ Failed to click login button: {e}")
+        log.warning("failed to click login button: %s", e)
         if selected_language == "hi":
             speak_func("लॉगिन बटन पर क्लिक नहीं कर सका। कृपया मैन्युअल रूप से प्रयास करें।", lang=selected_language)
         else:
             speak_func("Couldn't click the login button. Please try manually.", lang=selected_language)
-
-    # Wait for manual login
-    for i in range(60):
-        if is_logged_in(driver):
-            if selected_language == "hi":
-                speak_func("लॉगिन का पता चला। आप अब लॉग इन हैं।", lang=selected_language)
-            else:
-                speak_func("Login detected. You're now logged in.", lang=selected_language)
-            return
-        time.sleep(2)
-
-    if selected_language == "hi":
-        speak_func("समय के भीतर लॉगिन का पता नहीं चला। कृपया पुनः प्रयास करें।", lang=selected_language)
-    else:
-        speak_func("Login not detected within time. Please try again.", lang=selected_language)
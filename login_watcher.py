@@ -0,0 +1,139 @@
+import os
+import random
+import threading
+import time
+
+from logs import get_logger
+from metrics import counter, gauge, timeouts
+
+log = get_logger("login_watcher")
+
+# === LOGIN WATCHER CONFIG ===
+# First check soon after the login page opens, then back off up to the max between checks
+LOGIN_WATCH_FIRST_DELAY = float(os.getenv("NOVA_LOGIN_WATCH_FIRST_DELAY", "1"))
+LOGIN_WATCH_MAX_DELAY = float(os.getenv("NOVA_LOGIN_WATCH_MAX_DELAY", "5"))
+LOGIN_WATCH_BACKOFF = 1.5
+# Stop watching after this long; the rider can still say "ready"
+LOGIN_WATCH_TIMEOUT = float(os.getenv("NOVA_LOGIN_WATCH_TIMEOUT", "600"))
+
+logins_detected = counter("nova_logins_detected_total", "Manual logins noticed by the login watcher")
+pending_logins = gauge("nova_pending_logins", "Sessions the login watcher is waiting on")
+
+
+class _Watch:
+    __slots__ = ("session", "driver", "due", "delay", "expires")
+
+    def __init__(self, session, now):
+        self.session = session
+        self.driver = session.driver
+        self.delay = LOGIN_WATCH_FIRST_DELAY
+        self.due = now + self.delay
+        self.expires = now + LOGIN_WATCH_TIMEOUT
+
+
+class LoginWatcher:
+    """One background loop that checks every session waiting on a manual login.
+
+    check(driver) says whether the browser is logged in; on_login(session) is called with the
+    session lock held once it is. A watch ends when the login is seen, when it times out, or
+    when the session moves on by itself (new state, browser released or hibernated).
+    """
+
+    def __init__(self, check, on_login, state="manual_login_wait"):
+        self.check = check
+        self.on_login = on_login
+        self.state = state
+        self._watches = {}  # session_id -> _Watch
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def watch(self, session):
+        """Start (or restart) watching a session that is now waiting on a manual login."""
+        with self._cond:
+            self._watches[session.session_id] = _Watch(session, time.monotonic())
+            pending_logins.set(len(self._watches))
+            self._cond.notify()
+
+    def watching(self, session_id):
+        with self._cond:
+            return session_id in self._watches
+
+    def unwatch(self, session_id):
+        with self._cond:
+            self._watches.pop(session_id, None)
+            pending_logins.set(len(self._watches))
+
+    def run_once(self, now=None):
+        """Check every due session. Returns the seconds until the next one is due (None if idle)."""
+        now = time.monotonic() if now is None else now
+        with self._cond:
+            due = [watch for watch in self._watches.values() if watch.due <= now]
+        for watch in due:
+            self._check(watch, now)
+        with self._cond:
+            pending_logins.set(len(self._watches))
+            if not self._watches:
+                return None
+            return max(0.0, min(watch.due for watch in self._watches.values()) - time.monotonic())
+
+    def _check(self, watch, now):
+        session = watch.session
+        if now >= watch.expires:
+            timeouts.inc(kind="manual_login")
+            self._drop(watch)
+            return
+        # A step holding the session (e.g. the rider said "ready") will see the login itself
+        if not session.lock.acquire(blocking=False):
+            watch.due = now + 0.5
+            return
+        try:
+            if session.waiting_for != self.state or session.driver is None or session.driver is not watch.driver:
+                self._drop(watch)
+                return
+            logged_in = self.check(session.driver)
+            if logged_in:
+                self._drop(watch)
+                logins_detected.inc()
+                self.on_login(session)
+                return
+        except Exception as e:
+            log.warning("login check failed: %s", e, extra={"session_id": session.session_id})
+        finally:
+            session.lock.release()
+        # Back off with jitter so hundreds of watches started together do not check in lockstep
+        watch.delay = min(watch.delay * LOGIN_WATCH_BACKOFF, LOGIN_WATCH_MAX_DELAY)
+        watch.due = now + watch.delay * random.uniform(0.8, 1.2)
+
+    def _drop(self, watch):
+        with self._cond:
+            if self._watches.get(watch.session.session_id) is watch:
+                del self._watches[watch.session.session_id]
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+
+        def _run():
+            while True:
+                try:
+                    wait = self.run_once()
+                except Exception as e:
+                    log.warning("login watcher error: %s", e)
+                    wait = 1.0
+                with self._cond:
+                    if self._stopped:
+                        return
+                    # watch() notifies, so a new login is picked up without waiting out an idle sleep
+                    self._cond.wait(timeout=wait)
+                    if self._stopped:
+                        return
+
+        self._stopped = False
+        self._thread = threading.Thread(target=_run, name="login-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
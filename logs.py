@@ -0,0 +1,130 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+# === LOGGING CONFIG ===
+# Records are put on a queue by the calling thread and written to stdout by one background
+# listener, so request threads never block on the stdout lock.
+LOG_LEVEL = os.getenv("NOVA_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("NOVA_LOG_FORMAT", "json")  # json | text
+# Fraction of "received"/"responding" lines that are logged (errors are never sampled)
+LOG_SAMPLE_RATE = float(os.getenv("NOVA_LOG_SAMPLE_RATE", "1.0"))
+# "false" keeps rider utterances and replies out of the logs entirely (metadata only)
+LOG_TRANSCRIPTS = os.getenv("NOVA_LOG_TRANSCRIPTS", "true").lower() == "true"
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_configured = False
+_listener = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg and any fields passed via extra=."""
+
+    def format(self, record):
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local runs, with extra fields as key=value."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = " ".join(f"{key}={value}" for key, value in vars(record).items()
+                          if key not in _STANDARD_ATTRS and not key.startswith("_"))
+        return f"{line} {fields}" if fields else line
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is at emit time (so redirection in tools still works)."""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+def configure():
+    """Route the "nova" logger through a queue to a background stdout writer. Idempotent."""
+    global _configured, _listener
+    with _lock:
+        if _configured:
+            return
+        _configured = True
+        handler = _StdoutHandler()
+        handler.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger("nova")
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        root.propagate = False
+        _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown)
+
+
+def shutdown():
+    """Flush queued records and stop the writer thread (at interpreter exit)."""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def get_logger(name):
+    configure()
+    return logging.getLogger(f"nova.{name}")
+
+
+def transcript(logger, message, text, session=None, **fields):
+    """Log a sampled conversation line. The text itself is dropped when transcripts are off."""
+    if LOG_SAMPLE_RATE < 1.0 and random.random() >= LOG_SAMPLE_RATE:
+        return
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    if session is not None:
+        fields.setdefault("session_id", session.session_id)
+        fields.setdefault("state", session.waiting_for)
+    fields = {key: value for key, value in fields.items() if value is not None}
+    if LOG_TRANSCRIPTS:
+        fields["text"] = text
+    logger.info(message, extra=fields)
+
+
+def rider_text(**fields):
+    """Fields holding what the rider said (locations, ride names) for extra=; empty when transcripts are off."""
+    return fields if LOG_TRANSCRIPTS else {}
+
+
+def elapsed_ms(started):
+    """Milliseconds since a time.perf_counter() reading, for latency_ms fields."""
+    return round((time.perf_counter() - started) * 1000, 1)
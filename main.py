@@ -1,28 +1,61 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from typing import List, Optional
 import uvicorn
+import asyncio
 import threading
 import time
 import os
-import json
-from datetime import datetime, timedelta
-import firebase_admin
-from firebase_admin import credentials, firestore
-
-# Optional: Selenium-based booking
-import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+# Selenium / undetected_chromedriver / firebase_admin are imported lazily where used,
+# so a worker can answer HTTP before the heavy browser and Firestore stacks are loaded.
+import firebase_client
+from firebase_client import get_db
 from login import click_login_button, is_logged_in
+from login_watcher import LoginWatcher
+import locators
+from locators import wait_for_locator
+from cookie_store import CookieCache, CookieWriter
+from events import EVENT_KEEPALIVE, EVENT_QUEUE_MAX, Event, EventBus
+from driver_pool import DriverPool, driver_memory_mb
+from hibernation import Hibernator
+from recovery import CrashWatcher, crash_recoveries, crash_recovery_seconds, driver_crashes
+from intents import classify
+from jobs import JobManager, set_progress
+from location_cache import LocationCache
+from logs import elapsed_ms, get_logger, rider_text, transcript
+from prewarm import Prewarmer
+from quotes import QUOTE_DEADLINE, QUOTE_MAX_DEADLINE, QUOTE_MAX_ROUTES, QUOTE_POOL_HEADROOM, QuoteService, QuoteSkipped, merge
+from deadlines import Deadline, DeadlineExceeded, bound, budget_for, expired
+import resource_filter
+from profiles import PROFILE_DISK_CACHE_BYTES, ProfileCache
+from metrics import fallbacks, gauge, render_prometheus, stage_failures, stage_seconds, timed, timeouts
+from rides import RIDE_ITEM_SELECTOR, click_ride, match_ride, scrape_ride_options
+from waits import WaitTimeout, snapshot_texts, wait_for, wait_seconds
+from sessions import SESSION_COOKIE, SESSION_HEADER, USER_HEADER, Session, SessionStore, SessionUserMismatch, new_session_id
+from cluster import WORKER_ID, WORKER_URL
+from state_store import STATE_STORE_URL, open_store
+
+
+log = get_logger("main")
 
 
 class TextIn(BaseModel):
     text: str
 
 
+class RouteIn(BaseModel):
+    pickup: str
+    dropoff: str
+
+
+class QuotesIn(BaseModel):
+    routes: List[RouteIn]
+    deadline: Optional[float] = None
+
+
 app = FastAPI()
 
 app.add_middleware(
@@ -31,133 +64,228 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[SESSION_HEADER],
 )
 
-# === FIREBASE SETUP (supports env var for Render) ===
-FIREBASE_CRED_PATH = os.path.join(os.path.dirname(__file__), "serviceAccountKey.json")
+# === METRICS (Prometheus text format at /api/metrics) ===
+live_drivers = gauge("nova_live_drivers", "Browsers currently running (idle, leased or on a Chrome profile)")
+live_drivers.set_function(lambda: (lambda pool: pool["idle"] + pool["leased"] + pool["external"])(driver_pool.stats()))
+active_sessions = gauge("nova_active_sessions", "Conversations held in memory")
+active_sessions.set_function(lambda: len(sessions.sessions()))
 
-if not firebase_admin._apps:
-    cred_env = os.getenv("FIREBASE_CRED_JSON")
-    try:
-        if cred_env:
-            cred_dict = json.loads(cred_env)
-            cred = credentials.Certificate(cred_dict)
-        else:
-            cred = credentials.Certificate(FIREBASE_CRED_PATH)
-        firebase_admin.initialize_app(cred)
-    except Exception:
-        # Fallback to file if env failed
-        cred = credentials.Certificate(FIREBASE_CRED_PATH)
-        firebase_admin.initialize_app(cred)
-db = firestore.client()
 
-# === COOKIE FUNCTIONS (timestamped with 24h TTL) ===
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+# === WARM-UP (HTTP is up immediately; Firestore and browsers warm in the background) ===
+@app.on_event("startup")
+def _warm_backends():
+    threading.Thread(target=firebase_client.warm, name="firestore-warm", daemon=True).start()
+
+
+@app.get("/api/ready")
+def ready():
+    """Readiness: 200 once Firestore and at least one browser are warm, 503 before that."""
+    pool = driver_pool.stats()
+    browser_ready = pool["idle"] + pool["leased"] + pool["external"] > 0
+    body = {
+        "http": True,
+        "firestore": firebase_client.is_ready(),
+        "browser": browser_ready,
+        "pool": {"idle": pool["idle"], "leased": pool["leased"], "external": pool["external"],
+                 "spawning": pool["spawning"]},
+    }
+    body["ready"] = body["firestore"] and body["browser"]
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
+# === COOKIE FUNCTIONS (timestamped with 24h TTL, cached in memory) ===
+UBER_HOME = "https://m.uber.com/go/home"
+cookie_cache = CookieCache(get_db)
+cookie_writer = CookieWriter(get_db, cookie_cache)
+
+
+@app.on_event("startup")
+def _start_cookie_workers():
+    cookie_cache.start_sweeper()
+    cookie_writer.start()
+
+
+@app.on_event("shutdown")
+def _flush_cookies():
+    cookie_cache.stop_sweeper()
+    cookie_writer.stop()
+
+
+@timed(stage_seconds, stage="save_cookies")
 def save_cookies_to_firebase(user_id, driver):
+    """Queue the driver's cookies for write-behind persistence (no-op if unchanged)."""
     try:
         cookies = driver.get_cookies()
-        timestamp = datetime.utcnow().isoformat()
-        db.collection("uber_cookies").document(user_id).set({
-            "cookies": cookies,
-            "timestamp": timestamp,
-        })
-        print(f"✅ Cookies saved for {user_id} at {timestamp}")
+        _remember_login(user_id, driver, cookies)
+        if not cookie_writer.submit(user_id, cookies):
+            log.debug("cookies unchanged, skipping write", extra={"user_id": user_id})
     except Exception as e:
-        print(f"⚠️ Failed to save cookies: {e}")
+        log.warning("failed to save cookies: %s", e, extra={"user_id": user_id})
 
 
+@timed(stage_seconds, stage="load_cookies")
 def load_cookies_from_firebase(user_id, driver):
     try:
-        doc_ref = db.collection("uber_cookies").document(user_id)
-        doc = doc_ref.get()
-        if not doc.exists:
-            print(f"⚠️ No cookies found for {user_id}")
+        cached = cookie_cache.get(user_id)
+        if cached is None:
+            log.info("no cookies found", extra={"user_id": user_id})
             return False
+        cookies, saved_time_str = cached
 
-        data = doc.to_dict()
-        cookies = data.get("cookies", [])
-        saved_time_str = data.get("timestamp")
-
-        if saved_time_str:
-            saved_time = datetime.fromisoformat(saved_time_str)
-            age = datetime.utcnow() - saved_time
-            if age > timedelta(hours=24):
-                # Delete stale cookies
-                doc_ref.delete()
-                print(f"🗑️ Cookies deleted for {user_id} (older than 24h)")
-                return False
-
-        driver.get("https://m.uber.com/go/home")
-        for cookie in cookies:
-            try:
-                driver.add_cookie(cookie)
-            except:
-                pass
-        driver.refresh()
-        print(f"✅ Cookies loaded for {user_id} (last updated {saved_time_str})")
+        _inject_cookies(driver, cookies)
+        log.info("cookies loaded", extra={"user_id": user_id, "saved_at": saved_time_str})
         return True
     except Exception as e:
-        print(f"⚠️ Failed to load cookies: {e}")
+        log.warning("failed to load cookies: %s", e, extra={"user_id": user_id})
         return False
 
-# In-memory state. For production, replace with per-user/session storage.
-nova_state = {
-    "awake": False,
-    "waiting_for": "wake",  # wake | command | pickup | dropoff | confirm_booking | login
-    "pickup": None,
-    "dropoff": None,
-    "driver": None,
-    "user_id": "test_user",
-    "language": "en",
-    "listen_language": "en-IN",
-    "login_started": False,
-}
+def _inject_cookies(driver, cookies):
+    resource_filter.load(driver, UBER_HOME, page="home")
+    for cookie in cookies:
+        try:
+            driver.add_cookie(cookie)
+        except:
+            pass
+    resource_filter.load(driver, UBER_HOME, page="home_refresh", reload=True)
+
+# === SESSIONS (one conversation per rider, keyed by header or cookie) ===
+def _quit_session_driver(session):
+    """Hand the session's browser back to the pool (scrubbed for the next rider)."""
+    _cancel_prewarm(session)
+    if session.driver:
+        try:
+            _release_browser(session.driver)
+        except Exception as e:
+            log.warning("failed to release driver: %s", e, extra={"session_id": session.session_id})
+        session.driver = None
+
+
+def _forget_session(session):
+    _quit_session_driver(session)
+    login_watcher.unwatch(session.session_id)
+    events.forget(session.session_id)
+
+
+def _on_job_event(job, kind, data):
+    events.publish(job.session_id, kind, job_id=job.job_id, **data)
+
+
+def _publish_state(session):
+    events.publish(session.session_id, "state", **session.status())
+
+
+# Conversation state is written through to a shared store when one is configured (router.py)
+state_store = open_store() if STATE_STORE_URL != "memory" else None
+sessions = SessionStore(on_evict=_forget_session, state_store=state_store)
+events = EventBus()
+jobs = JobManager(listener=_on_job_event)
+HEARTBEAT_INTERVAL = 5
+# Shared-store sessions untouched for this long are dropped
+STORED_SESSION_TTL = 24 * 3600
+
+
+@app.on_event("startup")
+def _start_session_sweeper():
+    sessions.start_sweeper()
+
+
+@app.on_event("shutdown")
+def _stop_session_sweeper():
+    sessions.stop_sweeper()
+
+
+@app.on_event("startup")
+def _start_worker_heartbeat():
+    """Tell the router this worker is alive; it re-homes sessions of workers that stop beating."""
+    if state_store is None or not WORKER_ID:
+        return
+
+    def _run():
+        beats = 0
+        while True:
+            try:
+                state_store.heartbeat(WORKER_ID, WORKER_URL)
+                if beats % 720 == 0:
+                    state_store.prune(STORED_SESSION_TTL)
+            except Exception as e:
+                log.warning("worker heartbeat failed: %s", e)
+            beats += 1
+            time.sleep(HEARTBEAT_INTERVAL)
+
+    threading.Thread(target=_run, name="worker-heartbeat", daemon=True).start()
+
+
+def _lookup_session(request, session_id, create=False):
+    """The session, checked against the caller's X-User-Id (403 if it belongs to someone else)."""
+    try:
+        return sessions.get(session_id, request.headers.get(USER_HEADER), create=create)
+    except SessionUserMismatch:
+        raise HTTPException(status_code=403, detail="Session belongs to another user")
+
+
+def get_session(request: Request, response: Response):
+    """Resolve the caller's session from the X-Session-Id header or nova_session cookie."""
+    session_id = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+    if not session_id:
+        session_id = new_session_id()
+    session = _lookup_session(request, session_id, create=True)
+    response.headers[SESSION_HEADER] = session_id
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True)
+    return session
+
+
+def find_session(request: Request):
+    """get_session for read-only endpoints: an unknown or missing session is None, not created."""
+    session_id = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+    return _lookup_session(request, session_id) if session_id else None
 
 
 @app.get("/api/status")
-def status():
-    return {
-        "awake": nova_state["awake"],
-        "waiting_for": nova_state["waiting_for"],
-        "pickup": nova_state["pickup"],
-        "dropoff": nova_state["dropoff"],
-        "language": nova_state["language"]
-    }
+def status(session=Depends(find_session)):
+    if session is None:
+        # Polling before the first utterance: what a new session would look like
+        return {**Session(None).status(), "job_id": None}
+    active = jobs.active_for(session.session_id)
+    return {**session.status(), "job_id": active.job_id if active else None}
 
 
 @app.post("/api/start")
-def start():
-    nova_state["awake"] = False
-    nova_state["waiting_for"] = "language_selection"
-    nova_state["pickup"] = None
-    nova_state["dropoff"] = None
-    nova_state["driver"] = None
-    nova_state["language"] = "en"
-    nova_state["listen_language"] = "en-IN"
-    nova_state["login_started"] = False
+def start(session=Depends(get_session)):
+    with session.lock:
+        _quit_session_driver(session)
+        session.reset()
+        sessions.save(session)
+    _publish_state(session)
     return {"response": "Hello! Please choose your preferred language: English or Hindi? / नमस्ते! कृपया अपनी पसंदीदा भाषा चुनें: अंग्रेजी या हिंदी?"}
 
 
 @app.post("/api/reset")
-def reset():
+def reset(session=Depends(get_session)):
     """Reset the conversation state"""
-    if nova_state["driver"]:
-        try:
-            nova_state["driver"].quit()
-        except:
-            pass
-    nova_state["awake"] = False
-    nova_state["waiting_for"] = "language_selection"
-    nova_state["pickup"] = None
-    nova_state["dropoff"] = None
-    nova_state["driver"] = None
-    nova_state["language"] = "en"
-    nova_state["listen_language"] = "en-IN"
-    nova_state["login_started"] = False
+    with session.lock:
+        _quit_session_driver(session)
+        session.reset()
+        sessions.save(session)
+    _publish_state(session)
     return {"response": "Conversation reset. Please choose your preferred language: English or Hindi?"}
 
 
-def _setup_driver():
-    """Setup Chrome driver with mobile user agent. Headless on servers."""
+@timed(stage_seconds, stage="setup_driver")
+def _setup_driver(profile_dir=None):
+    """Setup Chrome driver with mobile user agent. Headless on servers.
+
+    profile_dir is a persistent user-data-dir (see profiles.py); pooled browsers use a throwaway one.
+    """
+    import undetected_chromedriver as uc
+
     options = uc.ChromeOptions()
     options.add_argument(
         "user-agent=Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) "
@@ -169,10 +297,12 @@ def _setup_driver():
     options.add_argument("--disable-gpu")
     options.add_argument("--disable-extensions")
     options.add_argument("--disable-plugins")
-    options.add_argument("--disable-images")
-    options.add_argument("--disable-javascript")
     options.add_argument("--disable-web-security")
     options.add_argument("--allow-running-insecure-content")
+    if profile_dir:
+        options.add_argument(f"--user-data-dir={profile_dir}")
+        # Profiles are kept for the login, not the HTTP cache; keep them small
+        options.add_argument(f"--disk-cache-size={PROFILE_DISK_CACHE_BYTES}")
     
     # Set Chrome binary path for Alpine Linux
     chrome_bin = os.getenv("CHROME_BIN")
@@ -191,9 +321,12 @@ def _setup_driver():
         # Try undetected-chromedriver first
         driver = uc.Chrome(version_main=138, options=options)
         driver.set_window_size(420, 900)
+        driver.set_page_load_timeout(resource_filter.PAGE_LOAD_TIMEOUT)
+        # Images, fonts and trackers are blocked over DevTools (Chrome has no flag for it)
+        resource_filter.install(driver)
         return driver
     except Exception as e:
-        print(f"⚠️ Failed to setup Chrome driver: {e}")
+        log.warning("failed to setup Chrome driver: %s", e)
         # Fallback to regular Chrome if undetected-chromedriver fails
         try:
             from selenium import webdriver
@@ -206,6 +339,9 @@ def _setup_driver():
             chrome_options.add_argument("--headless=new")
             chrome_options.add_argument("--disable-gpu")
             chrome_options.add_argument("--window-size=420,900")
+            if profile_dir:
+                chrome_options.add_argument(f"--user-data-dir={profile_dir}")
+                chrome_options.add_argument(f"--disk-cache-size={PROFILE_DISK_CACHE_BYTES}")
             
             # Set Chrome binary path for Alpine Linux
             if chrome_bin:
@@ -219,9 +355,13 @@ def _setup_driver():
             else:
                 driver = webdriver.Chrome(options=chrome_options)
             
+            fallbacks.inc(kind="driver_non_uc")
+            driver.set_page_load_timeout(resource_filter.PAGE_LOAD_TIMEOUT)
+            resource_filter.install(driver)
             return driver
         except Exception as e2:
-            print(f"⚠️ Failed to setup fallback Chrome driver: {e2}")
+            log.error("failed to setup fallback Chrome driver: %s", e2)
+            fallbacks.inc(kind="driver_none")
             return None
 
 
@@ -233,51 +373,199 @@ def _is_driver_alive(driver):
         return False
 
 
-def _ensure_driver():
-    """Return an existing alive driver or create one. Never opens more than one."""
-    driver = nova_state.get("driver")
+# === RESOLVED LOCATIONS (repeat pickups/dropoffs skip fuzzy autocomplete) ===
+location_cache = LocationCache()
+
+
+@app.get("/api/cache")
+def cache_stats():
+    return {
+        "cookies": cookie_cache.stats(),
+        "cookie_writes": cookie_writer.stats(),
+        "locations": location_cache.stats(),
+        "profiles": profiles.stats(),
+    }
+
+
+# === DRIVER POOL (warm browsers leased per session) ===
+driver_pool = DriverPool(_setup_driver)
+
+
+@app.on_event("startup")
+def _start_driver_pool():
+    driver_pool.start()
+
+
+@app.on_event("shutdown")
+def _stop_driver_pool():
+    jobs.shutdown()
+    driver_pool.shutdown()
+
+
+@app.get("/api/pool")
+def pool_stats():
+    return driver_pool.stats()
+
+
+@app.get("/api/waits")
+def wait_stats():
+    """Per-step page wait times (see waits.py)."""
+    return wait_seconds.snapshot()
+
+
+@app.get("/api/locators")
+def locator_stats():
+    """Candidate selectors per page element with their learned hit/miss counts (see locators.py)."""
+    return locators.registry.stats()
+
+
+@app.on_event("shutdown")
+def _save_locators():
+    locators.registry.save()
+
+
+@app.get("/api/pages")
+def page_stats():
+    """Per-page load time and bytes transferred, with the URL patterns being blocked."""
+    return {
+        "load_seconds": resource_filter.page_load_seconds.snapshot(),
+        "bytes": resource_filter.page_bytes.snapshot(),
+        "resources": resource_filter.page_resources.snapshot(),
+        "blocked_urls": resource_filter.BLOCKED_URLS if resource_filter.RESOURCE_FILTER_ENABLED else [],
+    }
+
+
+# === CHROME PROFILES (returning riders start on their own logged-in user-data-dir) ===
+# Profile browsers count against the pool's NOVA_POOL_MAX, so Chrome processes stay bounded
+profiles = ProfileCache(_setup_driver, slots=driver_pool)
+
+
+def _lease_browser(user_id, timeout):
+    """The rider's warm profile browser if there is one, else a pooled browser.
+
+    Launching on a profile costs a Chrome start, so it is only done off the request path (prewarm).
+    """
+    driver = profiles.launch(user_id)
+    if driver is not None:
+        return driver
+    return driver_pool.lease(timeout=timeout, speculative=True)
+
+
+def _release_browser(driver, recycle=False):
+    if profiles.owns(driver):
+        profiles.close(driver)
+    else:
+        driver_pool.release(driver, recycle=recycle)
+
+
+def _open_uber(user_id, driver):
+    """Open Uber logged in as user_id if possible. Returns True if a saved login was restored.
+
+    A profile browser is usually logged in already, so the cookie replay and reload are skipped;
+    Firestore cookies remain the fallback for pooled browsers and lapsed profiles.
+    """
+    if profiles.owns(driver):
+        resource_filter.load(driver, UBER_HOME, page="home")
+        if is_logged_in(driver):
+            profiles.mark_authenticated(driver)
+            return True
+    if load_cookies_from_firebase(user_id, driver):
+        _remember_login(user_id, driver)
+        return True
+    resource_filter.load(driver, UBER_HOME, page="home")
+    return False
+
+
+def _remember_login(user_id, driver, cookies=None):
+    """Keep a logged-in state on disk: refresh this profile, or seed one for next time."""
+    if not profiles.enabled or profiles.mark_authenticated(driver) or profiles.is_warm(user_id):
+        return
+    try:
+        profiles.seed(user_id, cookies if cookies is not None else driver.get_cookies(), UBER_HOME)
+    except Exception as e:
+        log.warning("failed to seed profile: %s", e, extra={"user_id": user_id})
+
+
+# === SPECULATIVE PREWARM (browser readied while the rider is still on language/wake) ===
+prewarmer = Prewarmer(_lease_browser, _open_uber, _release_browser)
+driver_pool.reclaim = prewarmer.reclaim
+
+
+def _start_prewarm(session):
+    """Start readying a browser unless the session already has one (or one on the way)."""
+    if session.driver or (session.prewarm and session.prewarm.active):
+        return
+    session.prewarm = prewarmer.start(session.session_id, session.user_id)
+
+
+def _cancel_prewarm(session):
+    if session.prewarm:
+        session.prewarm.cancel()
+        session.prewarm = None
+
+
+def _claim_prewarm(session):
+    """Adopt the prewarmed browser if it is (or soon becomes) ready. Returns True if cookies were restored."""
+    prewarm, session.prewarm = session.prewarm, None
+    if prewarm is None or session.driver:
+        if prewarm:
+            prewarm.cancel()
+        return False
+    driver, cookies_loaded = prewarm.claim()
+    if driver is None:
+        return False
+    session.driver = driver
+    return bool(cookies_loaded)
+
+
+def _ensure_driver(session):
+    """Return the session's alive driver or lease one. Never holds more than one per session."""
+    driver = session.driver
     if driver and _is_driver_alive(driver):
         return driver
+    if driver:
+        _release_browser(driver, recycle=True)
+        session.driver = None
     try:
-        driver = _setup_driver()
-        nova_state["driver"] = driver
+        # A pooled browser is already running; profile launches only happen in the prewarm
+        driver = driver_pool.lease()
+        session.driver = driver
         return driver
     except Exception as e:
-        print(f"⚠️ Failed to setup driver: {e}")
+        log.warning("failed to lease driver: %s", e, extra={"session_id": session.session_id})
         return None
 
 
-def _handle_login_flow():
+@timed(stage_seconds, stage="login")
+def _handle_login_flow(session):
     """Handle the complete login flow with cookie persistence"""
     try:
-        driver = _ensure_driver()
+        # "Book a cab" usually lands on a browser prewarmed during language/wake
+        prewarmed = _claim_prewarm(session)
+        driver = _ensure_driver(session)
         if not driver:
             return "Failed to setup browser. Please try again."
+        set_progress("browser_ready")
         
         # Mark that we've started the login so subsequent prompts don't spawn another driver
-        nova_state["login_started"] = True
-        user_id = nova_state["user_id"]
+        session.login_started = True
+        user_id = session.user_id
         
-        # Try to load cookies from Firebase
-        cookies_loaded = load_cookies_from_firebase(user_id, driver)
+        # Restore the saved login (Chrome profile, else cookies from Firebase)
+        set_progress("restoring_cookies")
+        cookies_loaded = prewarmed or _open_uber(user_id, driver)
+        if cookies_loaded:
+            set_progress("cookies_restored")
         
         if not cookies_loaded:
-            # First time login
-            driver.get("https://m.uber.com/go/home")
-            
+            # First time login (_open_uber has already opened the home page)
             # Check if already logged in
             if not is_logged_in(driver):
                 # Click login button and wait for manual login
-                click_login_button(driver, lambda text: print(f"🔊 {text}"), selected_language=nova_state["language"])
+                click_login_button(driver, lambda text, lang=None: transcript(log, "speak", text, session), selected_language=session.language)
+                set_progress("waiting_for_login")
                 
-                # Wait for manual login (up to 60 seconds)
-                for i in range(30):  # 30 * 2 seconds = 60 seconds
-                    if is_logged_in(driver):
-                        save_cookies_to_firebase(user_id, driver)
-                        return "Login successful! Now let's book your ride. What is your pickup location?"
-                    time.sleep(2)
-                
-                # If login timeout, keep the driver open and ask user to log in manually
+                # Keep the driver open; the login watcher moves on to pickup once the rider has logged in
                 return "Please log in to Uber manually in the browser window that opened. Once logged in, say 'I'm logged in' or 'ready' to continue."
             else:
                 save_cookies_to_firebase(user_id, driver)
@@ -286,164 +574,188 @@ def _handle_login_flow():
             return "Logged in with saved credentials! Let's book your ride. What is your pickup location?"
             
     except Exception as e:
-        print(f"⚠️ Login error: {e}")
+        log.warning("login error: %s", e, extra={"session_id": session.session_id})
+        stage_failures.inc(stage="login")
         return "Login failed. Please try again."
 
 
-def _handle_location_input(location_text, is_pickup=True):
+@timed(stage_seconds, stage="location_input")
+def _handle_location_input(session, location_text, is_pickup=True):
     """Handle location input from frontend"""
     try:
-        driver = nova_state["driver"]
+        driver = session.driver
         if not driver:
             return "Browser not ready. Please try again."
         
-        wait = WebDriverWait(driver, 20)
-        
         if is_pickup:
             # Click pickup button
-            pickup_button = wait.until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, '[data-testid="pudo-button-pickup"]'))
-            )
+            pickup_button = wait_for_locator(driver, "pickup_button", 20)
             driver.execute_script("arguments[0].click();", pickup_button)
             
             # Enter pickup location
-            input_box = wait.until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'input[placeholder="Pickup location"]'))
-            )
-            input_box.send_keys(location_text)
-            time.sleep(2)
-            
-            # Select first suggestion
-            first_option = wait.until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, '[role="option"]'))
-            )
-            driver.execute_script("arguments[0].click();", first_option)
+            set_progress("entering_pickup")
+            input_box = wait_for_locator(driver, "pickup_input", 20, mode="present")
+            _enter_location(session.user_id, driver, input_box, location_text, step="pickup_suggestions")
             
             return "Pickup location set. Where are you going?"
         else:
             # Enter destination
-            destination_box = wait.until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'input[placeholder="Dropoff location"]'))
-            )
-            destination_box.send_keys(location_text)
-            time.sleep(2)
-            
-            # Select first destination suggestion
-            dest_suggestion = wait.until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, '[role="option"]'))
-            )
-            driver.execute_script("arguments[0].click();", dest_suggestion)
+            set_progress("entering_dropoff")
+            destination_box = wait_for_locator(driver, "dropoff_input", 20, mode="present")
+            _enter_location(session.user_id, driver, destination_box, location_text, step="dropoff_suggestions")
             
             return "Destination set. Let me show you the ride options."
             
     except Exception as e:
-        print(f"⚠️ Location error: {e}")
+        log.warning("location error: %s", e, extra={"session_id": session.session_id, "state": session.waiting_for})
+        stage_failures.inc(stage="location_input")
         return "Failed to set location. Please try again."
 
 
-def _handle_ride_options():
+# Clicks the suggestion whose text matches a remembered label, else the one at the given index.
+# Returns the clicked suggestion's text so it can be remembered.
+SELECT_SUGGESTION_JS = """
+var all = document.querySelectorAll(arguments[0]), label = arguments[1], index = arguments[2];
+var stale = arguments[3] || [], options = [];
+// Suggestions left over from before typing are not candidates (indexes count fresh ones only)
+for (var k = 0; k < all.length; k++) {
+  if (stale.indexOf(all[k].textContent) < 0) options.push(all[k]);
+}
+var chosen = -1;
+for (var i = 0; label && i < options.length; i++) {
+  var text = (options[i].innerText || options[i].textContent || '').trim();
+  if (text.split('\\n')[0].trim() === label) { chosen = i; break; }
+}
+if (chosen < 0) chosen = index < options.length ? index : 0;
+var el = options[chosen];
+if (!el) return null;
+el.click();
+return {index: chosen, label: (el.innerText || el.textContent || '').trim().split('\\n')[0].trim()};
+"""
+
+
+def _enter_location(user_id, driver, input_box, location_text, step, timeout=20):
+    """Type a location and pick a suggestion, reusing what this rider (or anyone) picked before."""
+    known = location_cache.lookup(user_id, location_text)
+    stale = snapshot_texts(driver, '[role="option"]')
+    # On a hit, type the exact label we picked last time so the first suggestion is the right one
+    input_box.send_keys(known["label"] if known else location_text)
+    
+    # Select a suggestion as soon as fresh ones render
+    wait_for(driver, '[role="option"]', timeout, step=step, exclude_texts=stale)
+    set_progress("suggestions_loaded")
+    picked = driver.execute_script(
+        SELECT_SUGGESTION_JS, '[role="option"]',
+        known["label"] if known else None, known["index"] if known else 0, stale,
+    )
+    if not picked:
+        if known:
+            location_cache.forget(user_id, location_text)
+        raise RuntimeError("No location suggestion to select")
+    if known and picked["label"] != known["label"]:
+        log.info("cached location not offered", extra={"user_id": user_id, **rider_text(cached=known["label"], picked=picked["label"])})
+    # The index is relative to the label query we type on a hit, not the raw transcript
+    location_cache.record(user_id, location_text, picked["label"], picked["index"] if known else 0)
+    return picked["label"]
+
+
+@timed(stage_seconds, stage="ride_options")
+def _handle_ride_options(session):
     """Handle ride options and selection"""
     try:
-        driver = nova_state["driver"]
+        driver = session.driver
         if not driver:
             return "Browser not ready. Please try again."
         
         # Wait for ride options to load
-        wait = WebDriverWait(driver, 15)
-        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "li[data-testid='product_selector.list_item']")))
+        set_progress("loading_ride_options")
+        wait_for(driver, RIDE_ITEM_SELECTOR, 15, mode="present", step="ride_options")
         
-        # Get ride options
-        ride_blocks = driver.find_elements(By.CSS_SELECTOR, "li[data-testid='product_selector.list_item']")
+        # Read every product in one round trip and keep the snapshot for selection
+        ride_options = scrape_ride_options(driver)
+        session.ride_options = ride_options
+        # Push the list to /api/events subscribers before the spoken reply is built
+        listed = [{"name": option["name"], "price": option["price"], "eta": option["eta"]} for option in ride_options]
+        for position, option in enumerate(listed):
+            set_progress("ride_option", position=position + 1, **option)
+        set_progress("ride_options_ready", options=listed)
         
-        if not ride_blocks:
+        if not ride_options:
             return "No ride options available. Please try again."
         
         # Format ride options for speech
-        ride_options = []
-        for ride in ride_blocks:
-            text = ride.text.strip()
-            if text:
-                lines = text.split("\n")
-                ride_name = lines[0].strip() if lines else text
-                price = next((line for line in lines if "₹" in line), "")
-                ride_options.append(f"{ride_name} for {price}")
-        
-        # Return formatted options
-        options_text = ". ".join([f"Option {i+1}: {option}" for i, option in enumerate(ride_options)])
+        options_text = ". ".join([f"Option {i+1}: {option['name']} for {option['price']}" for i, option in enumerate(ride_options)])
         return f"Available rides: {options_text}. Which ride would you like to choose? Say the ride name or option number."
         
     except Exception as e:
-        print(f"⚠️ Ride options error: {e}")
+        log.warning("ride options error: %s", e, extra={"session_id": session.session_id})
+        stage_failures.inc(stage="ride_options")
         return "Failed to load ride options. Please try again."
 
 
-def _handle_ride_selection(ride_choice):
+@timed(stage_seconds, stage="ride_selection")
+def _handle_ride_selection(session, ride_choice):
     """Handle ride selection and confirmation"""
     try:
-        driver = nova_state["driver"]
+        driver = session.driver
         if not driver:
             return "Browser not ready. Please try again."
         
-        wait = WebDriverWait(driver, 15)
-        ride_blocks = driver.find_elements(By.CSS_SELECTOR, "li[data-testid='product_selector.list_item']")
+        # Reuse the snapshot from the options step; only scrape if we don't have one
+        ride_options = session.ride_options or scrape_ride_options(driver)
+        session.ride_options = ride_options
         
         # Find matching ride
-        matched_index = None
-        for idx, ride in enumerate(ride_blocks):
-            text = ride.text.strip()
-            if text and (ride_choice.lower() in text.lower() or str(idx + 1) in ride_choice):
-                matched_index = idx
-                break
-        
-        if matched_index is None:
+        option = match_ride(ride_options, ride_choice)
+        if option is None:
             return "Ride not found. Please try again with a different choice."
         
         # Click the selected ride
-        ride_element = ride_blocks[matched_index]
-        driver.execute_script("arguments[0].scrollIntoView(true);", ride_element)
-        time.sleep(0.5)
-        driver.execute_script("arguments[0].click();", ride_element)
+        if not click_ride(driver, option):
+            return "Ride not found. Please try again with a different choice."
+        session.selected_ride = option
         
         return "Ride selected! Should I confirm and request this ride? Say yes or no."
         
     except Exception as e:
-        print(f"⚠️ Ride selection error: {e}")
+        log.warning("ride selection error: %s", e, extra={"session_id": session.session_id})
+        stage_failures.inc(stage="ride_selection")
         return "Failed to select ride. Please try again."
 
 
-def _handle_ride_confirmation(confirmation):
+@timed(stage_seconds, stage="ride_confirmation")
+def _handle_ride_confirmation(session, confirmation):
     """Handle final ride confirmation and booking"""
     try:
-        driver = nova_state["driver"]
+        driver = session.driver
         if not driver:
             return "Browser not ready. Please try again."
         
-        if any(word in confirmation.lower() for word in ["yes", "confirm", "yeah", "proceed", "haan", "haan ji"]):
+        if "confirm" in classify(confirmation, ("confirm",)):
             # Click request button
-            request_buttons = driver.find_elements(By.XPATH, '//*[@id="wrapper"]/div[1]/div[3]/main/div/section/div[3]/div/div/button')
-            for btn in request_buttons:
-                if btn.is_displayed() and btn.is_enabled():
-                    driver.execute_script("arguments[0].click();", btn)
-                    break
-            
-            time.sleep(2)
-            
-            # Handle final confirm/cancel popup
-            confirm_xpath = '//*[@id="wrapper"]/div[2]/div/div[2]/div/div/div/div/div/div/div[3]/div[2]/button'
-            cancel_xpath = '//*[@id="wrapper"]/div[2]/div/div[2]/div/div/div/div/div/div/div[3]/div[1]/button'
+            set_progress("requesting_ride")
+            try:
+                request_button = wait_for_locator(driver, "request_button", 5)
+                driver.execute_script("arguments[0].click();", request_button)
+            except WaitTimeout:
+                fallbacks.inc(kind="request_button_missing")
             
+            # Handle final confirm/cancel popup as soon as it renders
             try:
-                confirm_button = driver.find_element(By.XPATH, confirm_xpath)
+                confirm_button = wait_for_locator(driver, "confirm_button", 5, step="confirm_popup")
                 driver.execute_script("arguments[0].click();", confirm_button)
+                log.info("ride confirmed", extra={"session_id": session.session_id,
+                                                 **rider_text(ride=(session.selected_ride or {}).get("name"))})
                 # Refresh cookies after booking flow
                 try:
-                    save_cookies_to_firebase(nova_state["user_id"], driver)
+                    save_cookies_to_firebase(session.user_id, driver)
                 except Exception:
                     pass
                 return "Your ride is confirmed! What else can I help you with?"
             except:
+                fallbacks.inc(kind="confirm_popup_missing")
                 try:
-                    save_cookies_to_firebase(nova_state["user_id"], driver)
+                    save_cookies_to_firebase(session.user_id, driver)
                 except Exception:
                     pass
                 return "Ride request sent! What else can I help you with?"
@@ -451,187 +763,579 @@ def _handle_ride_confirmation(confirmation):
             return "Booking cancelled. What would you like to do next?"
             
     except Exception as e:
-        print(f"⚠️ Ride confirmation error: {e}")
+        log.warning("ride confirmation error: %s", e, extra={"session_id": session.session_id})
+        stage_failures.inc(stage="ride_confirmation")
         return "Failed to confirm ride. Please try again."
 
 
+# === FARE QUOTES (several routes compared at once, one pooled browser each) ===
+def _quote_route(user_id, pickup, dropoff, deadline):
+    """Read the product list for one route on a pooled browser (waits are capped by deadline).
+
+    Only a browser the pool can spare right now is used, so a comparison never makes a booking
+    wait in lease().
+    """
+    driver = driver_pool.lease(timeout=0, speculative=True, headroom=QUOTE_POOL_HEADROOM)
+    if driver is None:
+        raise QuoteSkipped("no spare browser")
+    try:
+        if not load_cookies_from_firebase(user_id, driver):
+            resource_filter.load(driver, UBER_HOME, page="home")
+        deadline.check("pickup")
+        pickup_button = wait_for_locator(driver, "pickup_button", 20, step="quote_pickup_button")
+        driver.execute_script("arguments[0].click();", pickup_button)
+        input_box = wait_for_locator(driver, "pickup_input", 20, mode="present", step="quote_pickup_input")
+        _enter_location(user_id, driver, input_box, pickup, step="quote_pickup_suggestions")
+        deadline.check("dropoff")
+        destination_box = wait_for_locator(driver, "dropoff_input", 20, mode="present", step="quote_dropoff_input")
+        _enter_location(user_id, driver, destination_box, dropoff, step="quote_dropoff_suggestions")
+        deadline.check("ride_options")
+        wait_for(driver, RIDE_ITEM_SELECTOR, 15, mode="present", step="quote_ride_options")
+        return [{"name": option["name"], "price": option["price"], "eta": option["eta"]}
+                for option in scrape_ride_options(driver)]
+    finally:
+        _release_browser(driver)
+
+
+quotes = QuoteService(_quote_route)
+
+
+@app.on_event("shutdown")
+def _stop_quotes():
+    quotes.shutdown()
+
+
+@app.post("/api/quotes")
+def compare_quotes(body: QuotesIn, session=Depends(get_session)):
+    """Fare comparison across routes, e.g. "how much to the airport vs the station?".
+
+    Routes are quoted concurrently, so the reply takes about as long as the slowest route (capped
+    at the deadline) rather than the sum. The booking conversation is not touched.
+    """
+    routes = [(route.pickup.strip(), route.dropoff.strip()) for route in body.routes]
+    if not routes or len(routes) > QUOTE_MAX_ROUTES:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {QUOTE_MAX_ROUTES} routes")
+    deadline = min(max(body.deadline or QUOTE_DEADLINE, 1.0), QUOTE_MAX_DEADLINE)
+    started = time.perf_counter()
+    results = quotes.compare(session.user_id, routes, deadline)
+    comparison = merge(results)
+    if comparison:
+        best = comparison[0]
+        response = _localized(
+            session,
+            f"The cheapest is {best['name']} from {best['pickup']} to {best['dropoff']} for {best['price']}.",
+            f"सबसे सस्ता {best['name']} है, {best['pickup']} से {best['dropoff']} तक {best['price']} में।",
+        )
+    else:
+        response = _localized(session, "I couldn't get any fares right now. Please try again.",
+                              "अभी कोई किराया नहीं मिल सका। कृपया फिर से कोशिश करें।")
+    log.info("quotes compared", extra={"session_id": session.session_id, "routes": len(routes),
+                                       "priced": len(comparison), "latency_ms": elapsed_ms(started)})
+    return {"response": response, "quotes": results, "comparison": comparison}
+
+
 @app.post("/api/receive-text")
-def receive_text(body: TextIn):
+def receive_text(body: TextIn, session=Depends(get_session)):
+    started = time.perf_counter()
     text = (body.text or "").lower().strip()
-    print(f"✅ Received from frontend: {text}")
-
-    # Language selection
-    if nova_state["waiting_for"] == "language_selection":
-        if "english" in text:
-            nova_state["language"] = "en"
-            nova_state["listen_language"] = "en-IN"
-            nova_state["waiting_for"] = "wake"
-            response = "Language set to English. Nova is standing by. Say 'wake up Nova' to begin."
-            print(f"↩️ Responding: {response}")
-            return {"response": response}
-        elif "hindi" in text or "हिंदी" in text:
-            nova_state["language"] = "hi"
-            nova_state["listen_language"] = "hi-IN"
-            nova_state["waiting_for"] = "wake"
-            response = "भाषा हिंदी में सेट की गई है। नोवा तैयार है। शुरू करने के लिए 'वेक अप नोवा' कहें।"
-            print(f"↩️ Responding: {response}")
-            return {"response": response}
-        else:
-            response = "Please say 'English' or 'Hindi' / कृपया 'अंग्रेजी' या 'हिंदी' कहें।"
-            print(f"↩️ Responding: {response}")
-            return {"response": response}
-
-    # Waiting for wake word
-    if nova_state["waiting_for"] == "wake":
-        wake_keywords = ["wake up nova", "wake nova", "wake", "wakeup", "वेक अप नोवा", "वेक नोवा"]
-        if any(k in text for k in wake_keywords):
-            nova_state["awake"] = True
-            nova_state["waiting_for"] = "command"
-            response = "Nova is now awake, how can I help you?"
-            print(f"↩️ Responding: {response}")
-            return {"response": response}
-        response = "Nova is on standby. Say 'wake up Nova' to begin."
-        print(f"↩️ Responding: {response}")
-        return {"response": response}
-
-    # After awake, expect a command
-    if nova_state["waiting_for"] == "command":
-        if ("book" in text and "cab" in text) or ("book" in text and "ride" in text) or ("open" in text and "uber" in text) or ("कैब" in text and "बुक" in text):
-            nova_state["waiting_for"] = "login"
-            response = "Opening Uber. Please wait while I set up the browser and check your login status."
-            print(f"↩️ Responding: {response}")
-            return {"response": response}
-        elif "change language" in text or "भाषा बदलो" in text:
-            nova_state["waiting_for"] = "language_selection"
-            response = "Please choose your preferred language: English or Hindi? / कृपया अपनी पसंदीदा भाषा चुनें: अंग्रेजी या हिंदी?"
-            print(f"↩️ Responding: {response}")
-            return {"response": response}
-        response = "I didn't understand that. You can say 'book a cab' to start booking."
-        print(f"↩️ Responding: {response}")
-        return {"response": response}
-
-    # Handle login flow
-    if nova_state["waiting_for"] == "login":
-        # If we've already opened a driver for login, don't reopen; just check status
-        existing_driver = nova_state.get("driver")
-        if nova_state.get("login_started") and existing_driver:
-            try:
-                if is_logged_in(existing_driver):
-                    save_cookies_to_firebase(nova_state["user_id"], existing_driver)
-                    nova_state["waiting_for"] = "pickup"
-                    response = "You're already logged in. What is your pickup location?"
-                    print(f"↩️ Responding: {response}")
-                    return {"response": response}
-            except Exception:
-                pass
-        response = _handle_login_flow()
-        response_lower = (response or "").lower()
-        if "successful" in response_lower or "logged in" in response_lower:
-            nova_state["waiting_for"] = "pickup"
-        elif "manually" in response_lower:
-            nova_state["waiting_for"] = "manual_login_wait"
-        print(f"↩️ Responding: {response}")
-        return {"response": response}
-
-    # Handle manual login confirmation
-    if nova_state["waiting_for"] == "manual_login_wait":
-        if any(word in text for word in ["logged in", "ready", "done", "finished", "complete", "हो गया", "तैयार"]):
-            driver = nova_state["driver"]
-            if driver and is_logged_in(driver):
-                save_cookies_to_firebase(nova_state["user_id"], driver)
-                nova_state["waiting_for"] = "pickup"
-                response = "Great! You're logged in. Now let's book your ride. What is your pickup location?"
-            else:
-                response = "I don't see that you're logged in yet. Please complete the login process in the browser window and then say 'ready'."
-        else:
-            response = "Please complete the login process in the browser window and then say 'ready' or 'I'm logged in'."
-        print(f"↩️ Responding: {response}")
-        return {"response": response}
-
-    # Collect pickup
-    if nova_state["waiting_for"] == "pickup":
-        # Ensure the driver is available (reuse existing, don't open extra if alive)
-        if not nova_state.get("driver") or not _is_driver_alive(nova_state.get("driver")):
-            # Attempt to prepare a driver silently if none; this will only create one if missing
-            _ = _ensure_driver()
-        # Ignore our own known prompts that might be transcribed by mistake
-        if any(phrase in text for phrase in [
-            "what is your pickup location",
-            "what is your pick up location",
-            "please say your pickup location",
-        ]):
-            response = "I'm listening. Please tell me your pickup location."
-            print(f"↩️ Responding: {response}")
-            return {"response": response}
-        if len(text) >= 3:
-            nova_state["pickup"] = text
-            response = _handle_location_input(text, is_pickup=True)
-            if "Pickup location set" in response:
-                nova_state["waiting_for"] = "dropoff"
-            print(f"↩️ Responding: {response}")
-            return {"response": response}
-        response = "Please say your pickup location again."
-        print(f"↩️ Responding: {response}")
-        return {"response": response}
-
-    # Collect dropoff
-    if nova_state["waiting_for"] == "dropoff":
-        # Ignore our own known prompts that might be transcribed by mistake
-        if any(phrase in text for phrase in [
-            "where are you going",
-            "please say your drop location",
-            "please say your dropoff location",
-        ]):
-            response = "I'm listening. Please tell me your drop location."
-            print(f"↩️ Responding: {response}")
-            return {"response": response}
-        if len(text) >= 3:
-            nova_state["dropoff"] = text
-            response = _handle_location_input(text, is_pickup=False)
-            if "Destination set" in response:
-                nova_state["waiting_for"] = "ride_options"
-            print(f"↩️ Responding: {response}")
-            return {"response": response}
-        response = "Please say your drop location again."
-        print(f"↩️ Responding: {response}")
-        return {"response": response}
-
-    # Handle ride options
-    if nova_state["waiting_for"] == "ride_options":
-        response = _handle_ride_options()
-        nova_state["waiting_for"] = "ride_selection"
-        print(f"↩️ Responding: {response}")
-        return {"response": response}
-
-    # Handle ride selection
-    if nova_state["waiting_for"] == "ride_selection":
-        response = _handle_ride_selection(text)
-        if "Ride selected" in response:
-            nova_state["waiting_for"] = "confirm_booking"
-        print(f"↩️ Responding: {response}")
-        return {"response": response}
-
-    # Confirm booking
-    if nova_state["waiting_for"] == "confirm_booking":
-        response = _handle_ride_confirmation(text)
-        if "confirmed" in response or "sent" in response or "cancelled" in response:
-            nova_state["waiting_for"] = "command"
-            # Clean up driver
-            if nova_state["driver"]:
+    transcript(log, "received", text, session)
+    # A browser step is still running for this rider; don't act on stale state
+    active = jobs.active_for(session.session_id)
+    if active:
+        return _busy_reply(session, active, started)
+    # Utterances for the same rider are handled one at a time; other riders are unaffected
+    with session.lock:
+        # Checked again under the lock: a concurrent utterance may have queued a step meanwhile
+        active = jobs.active_for(session.session_id)
+        if active:
+            return _busy_reply(session, active, started)
+        result = _process_text(session, text, started)
+        sessions.save(session)
+    _publish_state(session)
+    return result
+
+
+def _busy_reply(session, active, started):
+    response = _localized(session, "Still working on your last request. Please wait a moment.", "आपका पिछला अनुरोध अभी चल रहा है। कृपया एक क्षण रुकें।")
+    transcript(log, "responding", response, session, job_id=active.job_id, latency_ms=elapsed_ms(started))
+    return {"response": response, "job_id": active.job_id, "status": active.status}
+
+
+@app.get("/api/events")
+async def session_events(request: Request, session_id: Optional[str] = None):
+    """Server-Sent Events for one session, so the frontend need not poll /api/status or /api/jobs.
+
+    Streams job status ("job", with the reply when done), progress named after the step
+    (browser_ready, cookies_restored, suggestions_loaded, ride_option, ride_options_ready, ...)
+    and "state" after every reply. EventSource cannot set headers, so the session may also come
+    from the nova_session cookie or ?session_id=.
+    """
+    session_id = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE) or session_id
+    if not session_id:
+        raise HTTPException(status_code=400, detail="No session")
+    session = _lookup_session(request, session_id)
+    last_event_id = request.headers.get("last-event-id", "")
+    queue = asyncio.Queue(maxsize=EVENT_QUEUE_MAX)
+    subscriber = events.subscribe(session_id, asyncio.get_running_loop(), queue,
+                                  int(last_event_id) if last_event_id.isdigit() else None)
+
+    async def stream():
+        try:
+            yield "retry: 2000\n\n"
+            if session is not None:
+                yield Event(None, "state", session.status()).encode()
+            while True:
                 try:
-                    nova_state["driver"].quit()
-                except:
-                    pass
-                nova_state["driver"] = None
-        print(f"↩️ Responding: {response}")
-        return {"response": response}   
+                    event = await asyncio.wait_for(queue.get(), EVENT_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield event.encode()
+        finally:
+            # Also runs when the client disconnects and the response task is cancelled
+            events.unsubscribe(subscriber)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/api/jobs/{job_id}")
+def job_status(job_id: str, request: Request):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    # Replies carry the rider's booking; same X-User-Id check as every session endpoint
+    _lookup_session(request, job.session_id)
+    return job.as_dict()
+
+
+def _localized(session, english, hindi):
+    return hindi if session.language == "hi" else english
+
+
+def _process_text(session, text, started):
+    state = session.waiting_for
+    handler = STATE_HANDLERS.get(state, _on_unknown_state)
+    result = handler(session, text, classify(text, STATE_INTENTS.get(state, ())))
+    transcript(log, "responding", result["response"], session, state=state, job_id=result.get("job_id"),
+               latency_ms=elapsed_ms(started))
+    return result
+
+
+# === STATE HANDLERS (one per waiting_for value, dispatched via STATE_HANDLERS) ===
+def _on_language_selection(session, text, intents):
+    if "english" in intents:
+        session.language = "en"
+        session.listen_language = "en-IN"
+        session.waiting_for = "wake"
+        _start_prewarm(session)
+        return {"response": "Language set to English. Nova is standing by. Say 'wake up Nova' to begin."}
+    if "hindi" in intents:
+        session.language = "hi"
+        session.listen_language = "hi-IN"
+        session.waiting_for = "wake"
+        _start_prewarm(session)
+        return {"response": "भाषा हिंदी में सेट की गई है। नोवा तैयार है। शुरू करने के लिए 'वेक अप नोवा' कहें।"}
+    return {"response": "Please say 'English' or 'Hindi' / कृपया 'अंग्रेजी' या 'हिंदी' कहें।"}
+
+
+def _on_wake(session, text, intents):
+    if "wake" in intents:
+        session.awake = True
+        session.waiting_for = "command"
+        _start_prewarm(session)
+        return {"response": "Nova is now awake, how can I help you?"}
+    return {"response": "Nova is on standby. Say 'wake up Nova' to begin."}
+
+
+def _on_command(session, text, intents):
+    if "book_ride" in intents:
+        session.waiting_for = "login"
+        return {"response": "Opening Uber. Please wait while I set up the browser and check your login status."}
+    if "change_language" in intents:
+        session.waiting_for = "language_selection"
+        _cancel_prewarm(session)
+        return {"response": "Please choose your preferred language: English or Hindi? / कृपया अपनी पसंदीदा भाषा चुनें: अंग्रेजी या हिंदी?"}
+    return {"response": "I didn't understand that. You can say 'book a cab' to start booking."}
+
+
+def _on_login(session, text, intents):
+    return _submit_step(session, _step_login, text)
+
+
+def _on_manual_login_wait(session, text, intents):
+    if "login_ready" in intents:
+        return _submit_step(session, _step_manual_login, text)
+    return {"response": "Please complete the login process in the browser window and then say 'ready' or 'I'm logged in'."}
+
+
+def _on_pickup(session, text, intents):
+    # Ignore our own known prompts that might be transcribed by mistake
+    if "pickup_echo" in intents:
+        return {"response": "I'm listening. Please tell me your pickup location."}
+    if len(text) >= 3:
+        return _submit_step(session, _step_pickup, text)
+    return {"response": "Please say your pickup location again."}
+
+
+def _on_dropoff(session, text, intents):
+    # Ignore our own known prompts that might be transcribed by mistake
+    if "dropoff_echo" in intents:
+        return {"response": "I'm listening. Please tell me your drop location."}
+    if len(text) >= 3:
+        return _submit_step(session, _step_dropoff, text)
+    return {"response": "Please say your drop location again."}
+
+
+def _on_ride_options(session, text, intents):
+    return _submit_step(session, _step_ride_options, text)
+
+
+def _on_ride_selection(session, text, intents):
+    return _submit_step(session, _step_ride_selection, text)
+
+
+def _on_confirm_booking(session, text, intents):
+    return _submit_step(session, _step_confirm_booking, text)
+
+
+def _on_unknown_state(session, text, intents):
+    return {"response": "I didn't catch that. Please try again."}
+
+
+STATE_HANDLERS = {
+    "language_selection": _on_language_selection,
+    "wake": _on_wake,
+    "command": _on_command,
+    "login": _on_login,
+    "manual_login_wait": _on_manual_login_wait,
+    "pickup": _on_pickup,
+    "dropoff": _on_dropoff,
+    "ride_options": _on_ride_options,
+    "ride_selection": _on_ride_selection,
+    "confirm_booking": _on_confirm_booking,
+}
+
+# Intents each handler looks at; only their keywords are checked (states not listed need none)
+STATE_INTENTS = {
+    "language_selection": ("english", "hindi"),
+    "wake": ("wake",),
+    "command": ("book_ride", "change_language"),
+    "manual_login_wait": ("login_ready",),
+    "pickup": ("pickup_echo",),
+    "dropoff": ("dropoff_echo",),
+}
+
 
-    # Fallback
-    response = "I didn't catch that. Please try again."
-    print(f"↩️ Responding: {response}")
+# === HIBERNATION (idle browsers are quit and rebuilt on the next utterance) ===
+_AFTER_PICKUP = ("dropoff", "ride_options", "ride_selection", "confirm_booking")
+_AFTER_DROPOFF = ("ride_options", "ride_selection", "confirm_booking")
+_AFTER_RIDE_LIST = ("ride_selection", "confirm_booking")
+
+
+def _hibernate(session):
+    """Snapshot the login and quit the browser. Called by the reaper with session.lock held."""
+    driver = session.driver
+    snapshot = {"state": session.waiting_for, "cookies": None}
+    try:
+        if is_logged_in(driver):
+            snapshot["cookies"] = driver.get_cookies()
+            cookie_writer.submit(session.user_id, snapshot["cookies"])
+    except Exception as e:
+        log.warning("could not snapshot cookies before hibernating: %s", e, extra={"session_id": session.session_id})
+    session.hibernated = snapshot
+    _quit_session_driver(session)
+
+
+def _rehydrate(session):
+    """Rebuild a hibernated session's browser and replay its booking page.
+
+    Returns None on success, or a reply for the rider if the page could not be rebuilt.
+    """
+    snapshot = session.hibernated
+    set_progress("rehydrating")
+    driver = _ensure_driver(session)
+    if not driver:
+        return "Failed to setup browser. Please try again."
+    session.hibernated = None
+    if snapshot["cookies"]:
+        _inject_cookies(driver, snapshot["cookies"])
+    else:
+        _open_uber(session.user_id, driver)
+    state = snapshot["state"]
+    if state == "manual_login_wait" and not is_logged_in(driver):
+        click_login_button(driver, lambda text, lang=None: transcript(log, "speak", text, session), selected_language=session.language)
+        login_watcher.watch(session)
+    replayed = True
+    if state in _AFTER_PICKUP and session.pickup:
+        replayed = "Pickup location set" in _handle_location_input(session, session.pickup, is_pickup=True)
+    if replayed and state in _AFTER_DROPOFF and session.dropoff:
+        replayed = "Destination set" in _handle_location_input(session, session.dropoff, is_pickup=False)
+    if replayed and state in _AFTER_RIDE_LIST:
+        # Ride handles are tied to the old page; scrape them again
+        replayed = _handle_ride_options(session).startswith("Available rides")
+    if replayed and state == "confirm_booking" and session.selected_ride:
+        option = match_ride(session.ride_options or [], session.selected_ride["name"])
+        replayed = option is not None and click_ride(driver, option)
+    if replayed:
+        log.info("session browser rehydrated", extra={"session_id": session.session_id, "state": state})
+        return None
+    if expired():
+        # Slow, not broken: keep the booking and replay it again on the next utterance
+        session.hibernated = snapshot
+        return _out_of_time(session, state, replay=False)
+    session.waiting_for = "pickup"
+    session.ride_options = None
+    session.selected_ride = None
+    return _localized(session, "I had to reopen your booking. What is your pickup location?",
+                      "मुझे आपकी बुकिंग फिर से खोलनी पड़ी। आपका पिकअप स्थान क्या है?")
+
+
+hibernator = Hibernator(
+    sessions, _hibernate,
+    # A rider logging in by hand is busy in the browser, not talking (bounded by LOGIN_WATCH_TIMEOUT)
+    is_busy=lambda session: jobs.active_for(session.session_id) is not None
+    or login_watcher.watching(session.session_id),
+    memory_of=driver_memory_mb,
+    held=prewarmer.holding,
+)
+
+
+@app.on_event("startup")
+def _start_hibernator():
+    hibernator.start()
+
+
+@app.on_event("shutdown")
+def _stop_hibernator():
+    hibernator.stop()
+
+
+# === CRASH RECOVERY (a dead browser is replaced and the booking replayed onto it) ===
+def _mark_crashed(session, where):
+    """Release a dead browser and mark the booking for replay. Called with session.lock held."""
+    state = session.waiting_for
+    driver_crashes.inc(where=where)
+    log.warning("session browser crashed", extra={"session_id": session.session_id, "state": state, "where": where})
+    # Recycled, so the pool quits what is left of it instead of scrubbing it
+    _release_browser(session.driver, recycle=True)
+    session.driver = None
+    session.hibernated = {"state": state, "cookies": None}
+
+
+def _recover(session, where):
+    """Chrome died under the session during a step. Called with session.lock held.
+
+    The booking is replayed onto a pooled browser through the hibernation path: the login comes
+    back from Firestore cookies, and pickup, dropoff and the chosen ride from the session, which
+    only records them once the page accepted them. Returns None once the page is back, or a reply.
+    """
+    _mark_crashed(session, where)
+    set_progress("recovering")
+    started = time.monotonic()
+    response = _rehydrate(session)
+    outcome = "replayed" if response is None else "failed"
+    crash_recovery_seconds.observe(time.monotonic() - started, outcome=outcome)
+    crash_recoveries.inc(outcome=outcome)
+    events.publish(session.session_id, "recovered", state=session.waiting_for, outcome=outcome)
+    return response
+
+
+def _on_idle_crash(session):
+    """Crash found by the watcher. The replay is left to the rider's next step, which runs it
+    within its own (doubled) budget instead of tying up the session lock here."""
+    _mark_crashed(session, "idle")
+    sessions.save(session)
+    events.publish(session.session_id, "crashed", state=session.waiting_for)
+
+
+crash_watcher = CrashWatcher(
+    sessions, _is_driver_alive, _on_idle_crash,
+    is_busy=lambda session: jobs.active_for(session.session_id) is not None,
+)
+
+
+@app.on_event("startup")
+def _start_crash_watcher():
+    crash_watcher.start()
+
+
+@app.on_event("shutdown")
+def _stop_crash_watcher():
+    crash_watcher.stop()
+
+
+# === LOGIN WATCHER (one loop for every rider logging in by hand) ===
+def _on_login_detected(session):
+    """Called with the session lock held once the watcher sees the rider logged in."""
+    save_cookies_to_firebase(session.user_id, session.driver)
+    session.waiting_for = "pickup"
+    sessions.save(session)
+    response = "Login successful! Now let's book your ride. What is your pickup location?"
+    transcript(log, "login detected", response, session)
+    events.publish(session.session_id, "login_detected", response=response)
+    _publish_state(session)
+
+
+login_watcher = LoginWatcher(is_logged_in, _on_login_detected)
+
+
+@app.on_event("startup")
+def _start_login_watcher():
+    login_watcher.start()
+
+
+@app.on_event("shutdown")
+def _stop_login_watcher():
+    login_watcher.stop()
+
+
+# === BROWSER STEPS (run as background jobs, see jobs.py) ===
+def _submit_step(session, step, text):
+    """Queue a browser step and reply straight away with the job id.
+
+    The step's budget starts now, so time spent queued for a job worker counts against it;
+    a hibernated browser gets a second budget for the page replay.
+    """
+    seconds = budget_for(session.waiting_for) * (2 if session.hibernated else 1)
+    job = jobs.submit(session.session_id, session.waiting_for, _run_step, session, step, text, Deadline(seconds),
+                      expected=session.waiting_for)
+    response = _localized(session, "One moment, I'm working on it.", "एक क्षण, मैं इस पर काम कर रहा हूँ।")
+    return {"response": response, "job_id": job.job_id, "status": job.status}
+
+
+def _run_step(session, step, text, deadline=None, expected=None):
+    started = time.perf_counter()
+    deadline = deadline or Deadline(budget_for(session.waiting_for))
+    with session.lock, bound(deadline):
+        state = session.waiting_for
+        session.touch()
+        if expected is not None and state != expected:
+            # Queued for a state the conversation has since left (e.g. login detected meanwhile)
+            response = _localized(session, "We've already moved past that step. Please say it again.",
+                                  "हम उस चरण से आगे बढ़ चुके हैं। कृपया फिर से कहें।")
+        elif deadline.expired:
+            # Queued past the budget; the browser has not been touched
+            response = _out_of_time(session, state, replay=False)
+        else:
+            try:
+                if session.hibernated:
+                    # The reaper may have quit this session's browser while the rider was away
+                    response = _rehydrate(session)
+                elif session.driver is not None and not _is_driver_alive(session.driver):
+                    response = _recover(session, "before_step")
+                else:
+                    response = None
+                if response is None:
+                    response = step(session, text)
+                    # Handlers turn errors into replies, so a crash mid-step shows up as a step
+                    # that did not advance on a dead browser: replay the booking and try once more
+                    if (session.waiting_for == state and session.driver is not None
+                            and not deadline.expired and not _is_driver_alive(session.driver)):
+                        response = _recover(session, "during_step") or step(session, text)
+                    # ...and the deadline is checked on the way out
+                    if deadline.expired and session.waiting_for == state:
+                        response = _out_of_time(session, state)
+            except DeadlineExceeded:
+                response = _out_of_time(session, state)
+        session.touch()
+        sessions.save(session)
+    _publish_state(session)
+    transcript(log, "job responding", response, session, state=state, step=step.__name__,
+               latency_ms=elapsed_ms(started))
     return {"response": response}
 
 
+def _out_of_time(session, state, replay=True):
+    """The step ran out of budget. Keep the state so the rider can simply repeat themselves.
+
+    With replay, the browser may be stuck mid-step, so it is marked for a clean page replay on
+    the next utterance (the same path as a hibernated browser, minus the relaunch).
+    """
+    timeouts.inc(kind="step_budget")
+    log.warning("step out of budget", extra={"session_id": session.session_id, "state": state})
+    if replay and session.driver is not None and not session.hibernated:
+        session.hibernated = {"state": state, "cookies": None}
+    return _localized(session, "I'm still working on that. Please say it again in a moment.",
+                      "मैं अभी भी इस पर काम कर रहा हूँ। कृपया एक क्षण बाद फिर से कहें।")
+
+
+def _step_login(session, text):
+    # If we've already opened a driver for login, don't reopen; just check status
+    existing_driver = session.driver
+    if session.login_started and existing_driver:
+        try:
+            if is_logged_in(existing_driver):
+                save_cookies_to_firebase(session.user_id, existing_driver)
+                session.waiting_for = "pickup"
+                return "You're already logged in. What is your pickup location?"
+        except Exception:
+            pass
+    response = _handle_login_flow(session)
+    response_lower = (response or "").lower()
+    # "manually" first: the manual login prompt also says "once logged in"
+    if "manually" in response_lower:
+        session.waiting_for = "manual_login_wait"
+        login_watcher.watch(session)
+    elif "successful" in response_lower or "logged in" in response_lower:
+        session.waiting_for = "pickup"
+    return response
+
+
+def _step_manual_login(session, text):
+    driver = session.driver
+    if driver and is_logged_in(driver):
+        save_cookies_to_firebase(session.user_id, driver)
+        session.waiting_for = "pickup"
+        return "Great! You're logged in. Now let's book your ride. What is your pickup location?"
+    return "I don't see that you're logged in yet. Please complete the login process in the browser window and then say 'ready'."
+
+
+def _step_pickup(session, text):
+    # _run_step has already replaced a crashed browser
+    if not session.driver:
+        _ = _ensure_driver(session)
+    response = _handle_location_input(session, text, is_pickup=True)
+    if "Pickup location set" in response:
+        # Recorded only once the page took it: crash recovery replays these fields
+        session.pickup = text
+        session.waiting_for = "dropoff"
+    return response
+
+
+def _step_dropoff(session, text):
+    response = _handle_location_input(session, text, is_pickup=False)
+    if "Destination set" in response:
+        session.dropoff = text
+        session.waiting_for = "ride_options"
+    return response
+
+
+def _step_ride_options(session, text):
+    session.ride_options = None
+    response = _handle_ride_options(session)
+    session.waiting_for = "ride_selection"
+    return response
+
+
+def _step_ride_selection(session, text):
+    response = _handle_ride_selection(session, text)
+    if "Ride selected" in response:
+        session.waiting_for = "confirm_booking"
+    return response
+
+
+def _step_confirm_booking(session, text):
+    response = _handle_ride_confirmation(session, text)
+    if "confirmed" in response or "sent" in response or "cancelled" in response:
+        session.waiting_for = "command"
+        session.ride_options = None
+        session.selected_ride = None
+        # Return the driver to the pool for the next booking
+        _quit_session_driver(session)
+    return response
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
@@ -0,0 +1,227 @@
+import functools
+import math
+import threading
+import time
+
+# === METRICS (in-process, no external dependency) ===
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, in seconds by convention."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        """{label string: {count, sum, avg, buckets}} for JSON endpoints."""
+        result = {}
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            count = series[len(self.buckets)]
+            total = series[-1]
+            label = ",".join(f"{k}={v}" for k, v in key) or "all"
+            result[label] = {
+                "count": count,
+                "sum": round(total, 4),
+                "avg": round(total / count, 4) if count else 0.0,
+                "buckets": {str(bound): series[i] for i, bound in enumerate(self.buckets)},
+            }
+        return result
+
+    def samples(self):
+        """(suffix, labels, value) rows for the text exposition format."""
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in sorted(items):
+            for i, bound in enumerate(self.buckets):
+                yield "_bucket", key + (("le", _format_value(bound)),), series[i]
+            yield "_bucket", key + (("le", "+Inf"),), series[len(self.buckets)]
+            yield "_sum", key, series[-1]
+            yield "_count", key, series[len(self.buckets)]
+
+
+class Counter:
+    """Monotonic count with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def snapshot(self):
+        with self._lock:
+            return {",".join(f"{k}={v}" for k, v in key) or "all": value for key, value in self._values.items()}
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield "", key, value
+
+
+class Gauge(Counter):
+    """Point-in-time value. set_function() samples it lazily at render time instead."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text):
+        super().__init__(name, help_text)
+        self._function = None
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        """Report function() (an unlabelled number) instead of the stored values."""
+        self._function = function
+
+    def samples(self):
+        if self._function is None:
+            yield from super().samples()
+            return
+        try:
+            value = self._function()
+        except Exception:
+            return
+        yield "", (), value
+
+
+def _get_or_create(cls, name, *args):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, *args)
+        elif type(metric) is not cls:
+            raise ValueError(f"metric {name} already registered as a {metric.kind}")
+        return metric
+
+
+def histogram(name, help_text, buckets=DEFAULT_BUCKETS):
+    """Get or create a registered histogram."""
+    return _get_or_create(Histogram, name, help_text, buckets)
+
+
+def counter(name, help_text):
+    """Get or create a registered counter."""
+    return _get_or_create(Counter, name, help_text)
+
+
+def gauge(name, help_text):
+    """Get or create a registered gauge."""
+    return _get_or_create(Gauge, name, help_text)
+
+
+class timed:
+    """Observe wall time into a histogram, as a context manager or a decorator.
+
+        with timed(stage_seconds, stage="pickup"): ...
+
+        @timed(stage_seconds, stage="setup_driver")
+        def _setup_driver(): ...
+
+    An `outcome` label of "ok" or "error" (exception raised) is added to each observation.
+    """
+
+    def __init__(self, metric, **labels):
+        self.metric = metric
+        self.labels = labels
+        self._started = []
+
+    def __enter__(self):
+        self._started.append(time.perf_counter())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._started.pop()
+        self.metric.observe(elapsed, outcome="error" if exc_type else "ok", **self.labels)
+        return False
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = fn(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                self.metric.observe(time.perf_counter() - started, outcome=outcome, **self.labels)
+        return wrapper
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus():
+    """All registered metrics in the Prometheus text exposition format (version 0.0.4)."""
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: m.name)
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for suffix, key, value in metric.samples():
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in key)
+            lines.append(f"{metric.name}{suffix}{{{labels}}} {_format_value(value)}" if labels
+                         else f"{metric.name}{suffix} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# === SHARED METRICS (used across modules) ===
+stage_seconds = histogram("nova_stage_seconds", "Wall time per booking stage")
+stage_failures = counter("nova_stage_failures_total", "Booking stages that ended in an error reply")
+timeouts = counter("nova_timeouts_total", "Waits that gave up, by kind")
+fallbacks = counter("nova_fallbacks_total", "Times a slower or degraded fallback path was taken, by kind")
@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+
+from deadlines import cap
+from logs import get_logger
+from metrics import counter
+
+log = get_logger("prewarm")
+
+# === SPECULATIVE PREWARM CONFIG ===
+PREWARM_ENABLED = os.getenv("NOVA_PREWARM", "true").lower() == "true"
+# A prepared browser nobody claims within this long goes back to the pool
+PREWARM_TTL = float(os.getenv("NOVA_PREWARM_TTL", "45"))
+# Speculative work only takes a browser the pool can spare right now; a real booking that
+# finds the pool full reclaims the oldest unclaimed prewarm (Prewarmer.reclaim)
+PREWARM_LEASE_TIMEOUT = float(os.getenv("NOVA_PREWARM_LEASE_TIMEOUT", "0"))
+# How long "book a cab" waits for a prewarm still in flight before leasing its own browser
+PREWARM_CLAIM_TIMEOUT = float(os.getenv("NOVA_PREWARM_CLAIM_TIMEOUT", "20"))
+
+prewarm_outcomes = counter("nova_prewarm_total", "Speculative browser prewarms, by outcome")
+
+
+class Prewarm:
+    """A browser being readied for one session in the background.
+
+    The preparing thread owns the driver until claim() hands it to the session or
+    cancel()/expiry hands it back to the pool. Never holds the session lock.
+    """
+
+    __slots__ = ("session_id", "driver", "ready", "status", "started", "_lock", "_cancel", "_done", "_claimed",
+                 "_reclaimed")
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.driver = None
+        self.ready = None  # whatever prepare() returned (e.g. cookies restored)
+        self.status = "running"  # running | ready | failed | claimed | cancelled | reclaimed | expired
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._claimed = False
+        self._reclaimed = False
+
+    @property
+    def active(self):
+        return self.status in ("running", "ready")
+
+    def cancel(self):
+        """Abandon the prewarm. The preparing thread returns the browser to the pool."""
+        self._cancel.set()
+
+    def reclaim(self):
+        """Cancel on behalf of a booking that needs the browser. False if already claimed or ended."""
+        with self._lock:
+            if self._claimed or self._cancel.is_set():
+                return False
+            self._reclaimed = True
+            self._cancel.set()
+            return True
+
+    def claim(self, timeout=PREWARM_CLAIM_TIMEOUT):
+        """Wait for preparation, then take the driver. Returns (driver, ready) or (None, None).
+
+        A prewarm that is not ready in time is cancelled so its browser is not held for nothing.
+        """
+        self._done.wait(cap(timeout))
+        with self._lock:
+            if self.status != "ready" or self._cancel.is_set():
+                self._cancel.set()
+                return None, None
+            self._claimed = True
+            self.status = "claimed"
+            self._cancel.set()  # wake the owner thread; it no longer owns the driver
+            return self.driver, self.ready
+
+
+class Prewarmer:
+    """Leases and prepares browsers for sessions that are likely to book soon.
+
+    lease(user_id, timeout) -> driver or None, prepare(user_id, driver) -> ready, release(driver).
+    """
+
+    def __init__(self, lease, prepare, release, ttl=PREWARM_TTL, lease_timeout=PREWARM_LEASE_TIMEOUT,
+                 enabled=PREWARM_ENABLED):
+        self.lease = lease
+        self.prepare = prepare
+        self.release = release
+        self.ttl = ttl
+        self.lease_timeout = lease_timeout
+        self.enabled = enabled
+        self._holding = []  # prewarms with a browser, oldest first
+        self._lock = threading.Lock()
+
+    def holding(self):
+        """Prewarms that have a browser, oldest first."""
+        with self._lock:
+            return list(self._holding)
+
+    def reclaim(self):
+        """Hand the oldest unclaimed prewarmed browser back for a real booking. True if one was."""
+        with self._lock:
+            holding = list(self._holding)
+        return any(prewarm.reclaim() for prewarm in holding)
+
+    def start(self, session_id, user_id):
+        """Begin preparing a browser for user_id. Returns the Prewarm, or None if disabled."""
+        if not self.enabled:
+            return None
+        prewarm = Prewarm(session_id)
+        threading.Thread(target=self._run, args=(prewarm, user_id), name=f"prewarm-{session_id[:8]}",
+                         daemon=True).start()
+        return prewarm
+
+    def _run(self, prewarm, user_id):
+        driver = None
+        try:
+            driver = self.lease(user_id, timeout=self.lease_timeout)
+            if driver is None:
+                self._finish(prewarm, "failed", None)
+                return
+            prewarm.driver = driver
+            with self._lock:
+                self._holding.append(prewarm)
+            if prewarm._cancel.is_set():
+                self._finish(prewarm, "cancelled", driver)
+                return
+            prewarm.ready = self.prepare(user_id, driver)
+        except Exception as e:
+            log.warning("prewarm failed: %s", e, extra={"session_id": prewarm.session_id})
+            self._finish(prewarm, "failed", driver)
+            return
+        with prewarm._lock:
+            if not prewarm._cancel.is_set():
+                prewarm.status = "ready"
+        prewarm._done.set()
+        log.info("browser prewarmed", extra={"session_id": prewarm.session_id, "ready": prewarm.ready,
+                                              "latency_ms": round((time.monotonic() - prewarm.started) * 1000, 1)})
+        # Hold the browser until it is claimed, cancelled or unused for too long
+        expired = not prewarm._cancel.wait(self.ttl)
+        self._finish(prewarm, "expired" if expired else "cancelled", driver)
+
+    def _finish(self, prewarm, status, driver):
+        with self._lock:
+            if prewarm in self._holding:
+                self._holding.remove(prewarm)
+        if prewarm._reclaimed:
+            status = "reclaimed"
+        with prewarm._lock:
+            claimed = prewarm._claimed
+            if not claimed:
+                prewarm.status = status
+        prewarm._done.set()
+        prewarm_outcomes.inc(outcome="claimed" if claimed else status)
+        if claimed or driver is None:
+            return
+        try:
+            self.release(driver)
+        except Exception as e:
+            log.warning("failed to release prewarmed browser: %s", e, extra={"session_id": prewarm.session_id})
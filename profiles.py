@@ -0,0 +1,324 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+from logs import get_logger
+from metrics import counter
+
+try:
+    import fcntl
+except ImportError:  # not on Linux; in-process locking only
+    fcntl = None
+
+log = get_logger("profiles")
+
+# === CHROME PROFILE CACHE CONFIG ===
+PROFILES_ENABLED = os.getenv("NOVA_PROFILES", "true").lower() == "true"
+PROFILE_DIR = os.getenv("NOVA_PROFILE_DIR", os.path.join("/tmp", "nova-profiles"))
+PROFILE_CACHE_MB = float(os.getenv("NOVA_PROFILE_CACHE_MB", "2048"))
+PROFILE_MAX_COUNT = int(os.getenv("NOVA_PROFILE_MAX", "200"))
+# A profile whose login is older than this is treated as cold (Firestore cookies are used instead)
+PROFILE_MAX_AGE = float(os.getenv("NOVA_PROFILE_MAX_AGE", str(7 * 24 * 3600)))
+# Background launches that turn a Firestore login into a warm profile
+PROFILE_SEED_CONCURRENCY = int(os.getenv("NOVA_PROFILE_SEED_CONCURRENCY", "1"))
+# Passed to Chrome as --disk-cache-size for profile browsers
+PROFILE_DISK_CACHE_BYTES = int(float(os.getenv("NOVA_PROFILE_DISK_CACHE_MB", "32")) * 1024 * 1024)
+
+AUTH_MARKER = ".nova-authenticated"
+LOCK_FILE = ".nova.lock"
+
+profile_events = counter("nova_profile_total", "Chrome profile cache events, by kind")
+
+
+def profile_key(user_id):
+    """Directory name for a user (user ids are not filesystem-safe)."""
+    return hashlib.sha1(str(user_id).encode("utf-8")).hexdigest()[:20]
+
+
+def dir_size(path):
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+    return total
+
+
+class _Profile:
+    __slots__ = ("key", "path", "size", "authenticated_at", "lock_fd")
+
+    def __init__(self, key, path):
+        self.key = key
+        self.path = path
+        self.size = 0
+        self.authenticated_at = None
+        self.lock_fd = None
+
+    @property
+    def in_use(self):
+        return self.lock_fd is not None
+
+    def warm(self, now=None):
+        if self.authenticated_at is None:
+            return False
+        return (now if now is not None else time.time()) - self.authenticated_at < PROFILE_MAX_AGE
+
+
+class ProfileCache:
+    """Per-user Chrome user-data-dirs on local disk, LRU-evicted to a size and count budget.
+
+    A profile is used by at most one browser at a time: in-process via the in-use set, across
+    worker processes via an flock on a lock file inside the profile. Only profiles that have
+    held a logged-in session are launched; everyone else gets a pooled browser and Firestore
+    cookies, and their profile is seeded in the background afterwards.
+
+    Profile browsers are not pooled but share the pool's browser cap: slots.reserve() must
+    succeed before each launch (slots.unreserve() after quit), else the caller uses the pool.
+    """
+
+    def __init__(self, factory, root=PROFILE_DIR, max_mb=PROFILE_CACHE_MB, max_count=PROFILE_MAX_COUNT,
+                 enabled=PROFILES_ENABLED, seed_concurrency=PROFILE_SEED_CONCURRENCY, slots=None):
+        self.factory = factory  # factory(profile_dir) -> driver or None
+        self.slots = slots
+        self.root = root
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_count = max_count
+        self.enabled = enabled
+        self._profiles = OrderedDict()  # key -> _Profile, least recently used first
+        self._drivers = {}  # id(driver) -> _Profile
+        self._seeding = set()
+        self._seed_slots = threading.BoundedSemaphore(max(1, seed_concurrency))
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    # --- bookkeeping ---
+    def _load_locked(self):
+        """Pick up profiles left on disk by a previous run, oldest first."""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            entries = [entry for entry in os.scandir(self.root) if entry.is_dir()]
+        except OSError as e:
+            log.warning("profile directory unavailable, disabling profiles: %s", e, extra={"root": self.root})
+            self.enabled = False
+            return
+        found = []
+        for entry in entries:
+            profile = _Profile(entry.name, entry.path)
+            try:
+                profile.authenticated_at = os.stat(os.path.join(entry.path, AUTH_MARKER)).st_mtime
+            except OSError:
+                pass
+            profile.size = dir_size(entry.path)
+            found.append(profile)
+        for profile in sorted(found, key=lambda p: p.authenticated_at or 0):
+            self._profiles[profile.key] = profile
+
+    def _get_locked(self, user_id, create):
+        self._load_locked()
+        key = profile_key(user_id)
+        profile = self._profiles.get(key)
+        if profile is None and create:
+            profile = self._profiles[key] = _Profile(key, os.path.join(self.root, key))
+        if profile is not None:
+            self._profiles.move_to_end(key)
+        return profile
+
+    def _lock_profile(self, profile):
+        """Take the profile for one browser. Returns False if another browser has it."""
+        if profile.in_use:
+            return False
+        os.makedirs(profile.path, exist_ok=True)
+        fd = os.open(os.path.join(profile.path, LOCK_FILE), os.O_CREAT | os.O_RDWR, 0o600)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+        profile.lock_fd = fd
+        return True
+
+    def _unlock_profile(self, profile):
+        fd, profile.lock_fd = profile.lock_fd, None
+        if fd is not None:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+
+    def _evict_locked(self):
+        """Delete least recently used idle profiles until within budget."""
+        total = sum(p.size for p in self._profiles.values())
+        count = len(self._profiles)
+        for key in list(self._profiles):
+            if total <= self.max_bytes and count <= self.max_count:
+                break
+            profile = self._profiles[key]
+            # The flock also keeps us from deleting a profile another worker process is using
+            if key in self._seeding or not self._lock_profile(profile):
+                continue
+            shutil.rmtree(profile.path, ignore_errors=True)
+            self._unlock_profile(profile)
+            del self._profiles[key]
+            total -= profile.size
+            count -= 1
+            profile_events.inc(kind="evicted")
+
+    # --- launching ---
+    def is_warm(self, user_id):
+        if not self.enabled:
+            return False
+        with self._lock:
+            profile = self._get_locked(user_id, create=False)
+            return profile is not None and profile.warm() and not profile.in_use
+
+    def launch(self, user_id):
+        """Start a browser on the user's logged-in profile. None if there is no free warm profile."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            profile = self._get_locked(user_id, create=False)
+            if profile is None or not profile.warm():
+                profile_events.inc(kind="miss")
+                return None
+            if not self._lock_profile(profile):
+                profile_events.inc(kind="busy")
+                return None
+        driver = self._start(profile)
+        if driver is not None:
+            profile_events.inc(kind="hit")
+        return driver
+
+    def _start(self, profile):
+        """Launch on a locked profile. Unlocks it again if no browser could be started."""
+        if self.slots is not None and not self.slots.reserve():
+            profile_events.inc(kind="at_browser_cap")
+            with self._lock:
+                self._unlock_profile(profile)
+            return None
+        driver = None
+        try:
+            driver = self.factory(profile.path)
+        except Exception as e:
+            log.warning("failed to launch browser on profile: %s", e, extra={"profile": profile.key})
+        with self._lock:
+            if driver is None:
+                self._unlock_profile(profile)
+            else:
+                self._drivers[id(driver)] = profile
+        if driver is None:
+            profile_events.inc(kind="launch_failed")
+            if self.slots is not None:
+                self.slots.unreserve()
+        return driver
+
+    def owns(self, driver):
+        with self._lock:
+            return id(driver) in self._drivers
+
+    def mark_authenticated(self, driver):
+        """Record that this profile's browser holds a logged-in session."""
+        with self._lock:
+            profile = self._drivers.get(id(driver))
+        if profile is None:
+            return False
+        try:
+            with open(os.path.join(profile.path, AUTH_MARKER), "w") as f:
+                f.write(str(time.time()))
+            profile.authenticated_at = time.time()
+        except OSError as e:
+            log.warning("failed to mark profile authenticated: %s", e, extra={"profile": profile.key})
+        return True
+
+    def close(self, driver):
+        """Quit a profile browser, account for its size and free the profile for reuse."""
+        with self._lock:
+            profile = self._drivers.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        if profile is None:
+            return
+        if self.slots is not None:
+            self.slots.unreserve()
+        # Chrome flushes the profile on exit; measure after quit
+        size = dir_size(profile.path)
+        with self._lock:
+            profile.size = size
+            self._unlock_profile(profile)
+            self._evict_locked()
+
+    # --- seeding (cold login -> warm profile, off the request path) ---
+    def seed(self, user_id, cookies, open_url):
+        """Write cookies into the user's profile in the background so the next login is warm."""
+        if not self.enabled or not cookies:
+            return False
+        with self._lock:
+            profile = self._get_locked(user_id, create=True)
+            if profile.warm() or profile.key in self._seeding or profile.in_use:
+                return False
+            self._seeding.add(profile.key)
+        threading.Thread(target=self._seed, args=(profile, cookies, open_url), name=f"profile-seed-{profile.key[:8]}",
+                         daemon=True).start()
+        return True
+
+    def _seed(self, profile, cookies, open_url):
+        try:
+            with self._seed_slots:
+                with self._lock:
+                    locked = self._lock_profile(profile)
+                if not locked:
+                    return
+                driver = self._start(profile)
+                if driver is None:
+                    return
+                try:
+                    driver.get(open_url)
+                    for cookie in cookies:
+                        try:
+                            driver.add_cookie(cookie)
+                        except Exception:
+                            pass
+                    self.mark_authenticated(driver)
+                    profile_events.inc(kind="seeded")
+                except Exception as e:
+                    log.warning("failed to seed profile: %s", e, extra={"profile": profile.key})
+                finally:
+                    self.close(driver)
+        finally:
+            with self._lock:
+                self._seeding.discard(profile.key)
+
+    # --- introspection ---
+    def stats(self):
+        with self._lock:
+            self._load_locked()
+            profiles = list(self._profiles.values())
+            return {
+                "enabled": self.enabled,
+                "root": self.root,
+                "profiles": len(profiles),
+                "warm": sum(1 for p in profiles if p.warm()),
+                "in_use": sum(1 for p in profiles if p.in_use),
+                "seeding": len(self._seeding),
+                "size_mb": round(sum(p.size for p in profiles) / (1024 * 1024), 1),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 1),
+            }
@@ -0,0 +1,116 @@
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from deadlines import Deadline, DeadlineExceeded, bound
+from logs import get_logger, rider_text
+from metrics import counter, histogram
+
+log = get_logger("quotes")
+
+# === FARE QUOTE CONFIG ===
+# Quotes run on their own executor so a comparison cannot starve booking steps of job workers;
+# each quote still needs a pooled browser, so the pool size bounds real parallelism.
+QUOTE_WORKERS = int(os.getenv("NOVA_QUOTE_WORKERS", "4"))
+QUOTE_DEADLINE = float(os.getenv("NOVA_QUOTE_DEADLINE", "25"))
+QUOTE_MAX_DEADLINE = 60.0
+QUOTE_MAX_ROUTES = int(os.getenv("NOVA_QUOTE_MAX_ROUTES", "6"))
+# Quotes only use browsers the pool can spare without waiting, and always leave this many for
+# bookings; routes that find none are reported as "skipped" rather than queued. Quotes never
+# reclaim prewarmed browsers. The pool's background top-up also takes a slot once a quote has
+# leased the idle browser, so at most NOVA_POOL_MAX - headroom - 1 routes run at once with the
+# default NOVA_POOL_MIN=1 (2 of 3 routes with NOVA_POOL_MAX=4); raise NOVA_POOL_MAX for more.
+QUOTE_POOL_HEADROOM = int(os.getenv("NOVA_QUOTE_POOL_HEADROOM", "1"))
+
+quote_seconds = histogram("nova_quote_seconds", "Time to quote one route, by outcome")
+quote_results = counter("nova_quotes_total", "Route quotes, by outcome")
+
+_PRICE_RE = re.compile(r"(\d[\d,]*(?:\.\d+)?)")
+
+
+def parse_fare(price):
+    """Numeric fare from a price label ("₹1,212.40" -> 1212.4), or None. Ranges use the low end."""
+    match = _PRICE_RE.search(price or "")
+    return float(match.group(1).replace(",", "")) if match else None
+
+
+class QuoteSkipped(Exception):
+    """No browser could be spared for this route."""
+
+
+class QuoteService:
+    """Quotes several pickup/dropoff pairs concurrently, one pooled browser each.
+
+    quote(user_id, pickup, dropoff, deadline) reads one route's products. It runs with the
+    comparison's deadline bound to its thread, so page waits are capped by it; it should also
+    call deadline.check() between steps, and raise QuoteSkipped when it gets no browser.
+    """
+
+    def __init__(self, quote, workers=QUOTE_WORKERS):
+        self.quote = quote
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="quote")
+
+    def compare(self, user_id, routes, deadline=QUOTE_DEADLINE):
+        """Quote every (pickup, dropoff) in routes within deadline seconds.
+
+        Returns one entry per route in request order; routes not finished in time come back with
+        status "timeout" and no options, so a slow route never holds up the others. Routes that
+        got no browser come back "skipped".
+        """
+        shared = Deadline(deadline)
+        futures = [self._executor.submit(self._quote_route, user_id, pickup, dropoff, shared)
+                   for pickup, dropoff in routes]
+        done, _ = wait(futures, timeout=deadline)
+        # Stragglers stop at their next step and hand their browser back
+        shared.cancel()
+        results = []
+        for future, (pickup, dropoff) in zip(futures, routes):
+            if future in done:
+                results.append(future.result())
+            else:
+                quote_results.inc(outcome="timeout")
+                results.append({"pickup": pickup, "dropoff": dropoff, "status": "timeout", "options": []})
+        return results
+
+    def _quote_route(self, user_id, pickup, dropoff, deadline):
+        started = time.monotonic()
+        result = {"pickup": pickup, "dropoff": dropoff, "status": "ok", "options": []}
+        try:
+            with bound(deadline):
+                result["options"] = self.quote(user_id, pickup, dropoff, deadline)
+        except DeadlineExceeded as e:
+            result["status"] = "timeout"
+            result["error"] = str(e)
+        except QuoteSkipped as e:
+            result["status"] = "skipped"
+            result["error"] = str(e)
+        except Exception as e:
+            log.warning("quote failed: %s", e, extra={"user_id": user_id, **rider_text(pickup=pickup, dropoff=dropoff)})
+            result["status"] = "failed"
+            result["error"] = str(e)
+        elapsed = time.monotonic() - started
+        result["elapsed_ms"] = round(elapsed * 1000, 1)
+        quote_seconds.observe(elapsed, outcome=result["status"])
+        quote_results.inc(outcome=result["status"])
+        return result
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def merge(results):
+    """Every product of every quoted route in one list, cheapest first (unpriced last)."""
+    rows = []
+    for result in results:
+        for option in result["options"]:
+            rows.append({
+                "pickup": result["pickup"],
+                "dropoff": result["dropoff"],
+                "name": option["name"],
+                "price": option["price"],
+                "fare": parse_fare(option["price"]),
+                "eta": option.get("eta", ""),
+            })
+    rows.sort(key=lambda row: (row["fare"] is None, row["fare"] or 0.0))
+    return rows
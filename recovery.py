@@ -0,0 +1,85 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from logs import get_logger
+from metrics import counter, histogram
+
+log = get_logger("recovery")
+
+# === BROWSER CRASH RECOVERY CONFIG ===
+# How often idle session browsers are checked; a dead one is released at once and the booking
+# is replayed onto a fresh browser by the rider's next step, within that step's budget
+CRASH_CHECK_INTERVAL = float(os.getenv("NOVA_CRASH_CHECK_INTERVAL", "10"))
+# Probes run in parallel and a hung browser is given up on after this long (checked next pass)
+CRASH_PROBE_WORKERS = int(os.getenv("NOVA_CRASH_PROBE_WORKERS", "4"))
+CRASH_PROBE_TIMEOUT = float(os.getenv("NOVA_CRASH_PROBE_TIMEOUT", "5"))
+
+driver_crashes = counter("nova_driver_crashes_total", "Session browsers found dead, by where they were noticed")
+crash_recoveries = counter("nova_crash_recoveries_total", "Booking replays onto a fresh browser after a crash, by outcome")
+crash_recovery_seconds = histogram("nova_crash_recovery_seconds", "Time to replay a booking onto a fresh browser")
+
+
+class CrashWatcher:
+    """Background check that finds session browsers which died while the rider was idle.
+
+    is_alive(driver) is a cheap liveness probe, run without the session lock so a hung browser
+    holds up neither the rider nor the other probes. on_crash(session) is called with the lock
+    held and must be quick: it only marks the session for replay. Busy sessions are skipped,
+    since the step holding them checks its own browser.
+    """
+
+    def __init__(self, sessions, is_alive, on_crash, is_busy, workers=CRASH_PROBE_WORKERS):
+        self.sessions = sessions
+        self.is_alive = is_alive
+        self.on_crash = on_crash
+        self.is_busy = is_busy
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crash-probe")
+        self._thread = None
+        self._stop = threading.Event()
+
+    def run_once(self, timeout=CRASH_PROBE_TIMEOUT):
+        """One pass over every idle session browser. Returns the number of crashes found."""
+        probes = {}
+        for session in self.sessions.sessions():
+            driver = session.driver
+            if driver is None or session.hibernated or self.is_busy(session):
+                continue
+            probes[self._executor.submit(self.is_alive, driver)] = (session, driver)
+        done, _ = wait(probes, timeout=timeout)
+        count = 0
+        for future in done:
+            session, driver = probes[future]
+            if future.result():
+                continue
+            if not session.lock.acquire(blocking=False):
+                continue  # a step is starting; it checks the browser itself
+            try:
+                # The browser may have been replaced or released while it was probed
+                if session.driver is driver and not session.hibernated:
+                    count += 1
+                    self.on_crash(session)
+            except Exception as e:
+                log.warning("crash handling failed: %s", e, extra={"session_id": session.session_id})
+            finally:
+                session.lock.release()
+        return count
+
+    def start(self, interval=CRASH_CHECK_INTERVAL):
+        if self._thread and self._thread.is_alive():
+            return
+
+        def _run():
+            while not self._stop.wait(interval):
+                try:
+                    self.run_once()
+                except Exception as e:
+                    log.warning("crash watcher error: %s", e)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=_run, name="crash-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,136 @@
+import os
+import time
+
+from deadlines import DeadlineExceeded, cap
+from logs import get_logger
+from metrics import counter, fallbacks, histogram
+
+log = get_logger("resource_filter")
+
+# === RESOURCE FILTER CONFIG ===
+# Chrome ignores --disable-images / --disable-javascript; blocking is done over DevTools instead.
+RESOURCE_FILTER_ENABLED = os.getenv("NOVA_RESOURCE_FILTER", "true").lower() == "true"
+PAGE_STATS_ENABLED = os.getenv("NOVA_PAGE_STATS", "true").lower() == "true"
+# Set on every browser at launch; Selenium's default would let one navigation block for 300s
+PAGE_LOAD_TIMEOUT = float(os.getenv("NOVA_PAGE_LOAD_TIMEOUT", "20"))
+
+# Network.setBlockedURLs wildcard patterns. Nothing here is needed to drive the booking flow:
+# the app is clicked through selectors and the ride list is read as text.
+DEFAULT_BLOCKED_URLS = (
+    # images and media
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.ico", "*.mp4", "*.webm",
+    # fonts
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    # analytics, tag managers and beacons
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*facebook.net*",
+    "*connect.facebook.com*", "*hotjar.com*", "*segment.io*", "*amplitude.com*", "*branch.io*",
+    "*appsflyer.com*", "*braze.com*", "*sentry.io*",
+)
+
+
+def _env_list(name):
+    return [item.strip() for item in os.getenv(name, "").split(",") if item.strip()]
+
+
+def blocked_urls(deny=None, allow=None):
+    """Default deny list plus NOVA_BLOCK_URLS, minus any pattern listed in NOVA_ALLOW_URLS.
+
+    setBlockedURLs has no allow rules of its own, so allowing means dropping the deny pattern
+    (e.g. NOVA_ALLOW_URLS=*.svg,*.png to get icons back while debugging headful).
+    """
+    deny = list(DEFAULT_BLOCKED_URLS) + (_env_list("NOVA_BLOCK_URLS") if deny is None else list(deny))
+    allowed = set(_env_list("NOVA_ALLOW_URLS") if allow is None else allow)
+    seen = set()
+    result = []
+    for pattern in deny:
+        if pattern not in allowed and pattern not in seen:
+            seen.add(pattern)
+            result.append(pattern)
+    return result
+
+
+BLOCKED_URLS = blocked_urls()
+
+page_load_seconds = histogram("nova_page_load_seconds", "Page load time reported by the Navigation Timing API, per page")
+page_bytes = histogram(
+    "nova_page_transfer_bytes", "Bytes transferred per page load (document plus subresources)",
+    buckets=(50e3, 100e3, 250e3, 500e3, 1e6, 2e6, 4e6, 8e6, 16e6),
+)
+page_resources = counter("nova_page_resources_total", "Subresources fetched by page loads, by page")
+
+# Navigation plus resource timing for the current document, in one round trip.
+# transferSize is 0 for cache hits and for cross-origin entries without Timing-Allow-Origin,
+# so bytes are a lower bound; encodedBodySize fills in where it is exposed.
+PAGE_STATS_JS = """
+var nav = performance.getEntriesByType('navigation')[0];
+var resources = performance.getEntriesByType('resource');
+var bytes = nav ? (nav.transferSize || nav.encodedBodySize || 0) : 0;
+for (var i = 0; i < resources.length; i++) {
+  bytes += resources[i].transferSize || resources[i].encodedBodySize || 0;
+}
+return {
+  bytes: bytes,
+  resources: resources.length,
+  loadMs: nav ? (nav.loadEventEnd > 0 ? nav.loadEventEnd : nav.domContentLoadedEventEnd) : null,
+};
+"""
+
+
+def install(driver, urls=None):
+    """Block images, fonts and trackers for every later navigation of this driver."""
+    if not RESOURCE_FILTER_ENABLED:
+        return False
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(BLOCKED_URLS if urls is None else urls)})
+        return True
+    except Exception as e:
+        # Not a Chromium driver with DevTools access; pages load unfiltered
+        fallbacks.inc(kind="resource_filter_unavailable")
+        log.warning("could not install resource filter: %s", e)
+        return False
+
+
+def uninstall(driver):
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": []})
+
+
+def record_page(driver, page, started=None):
+    """Record bytes and load time of the page the driver just loaded. Returns the stats or None."""
+    if not PAGE_STATS_ENABLED:
+        return None
+    try:
+        stats = driver.execute_script(PAGE_STATS_JS)
+    except Exception:
+        return None
+    if not stats:
+        return None
+    load_ms = stats.get("loadMs")
+    if load_ms is None and started is not None:
+        load_ms = (time.monotonic() - started) * 1000
+    if load_ms is not None:
+        page_load_seconds.observe(load_ms / 1000, page=page)
+    page_bytes.observe(stats.get("bytes") or 0, page=page)
+    page_resources.inc(stats.get("resources") or 0, page=page)
+    return stats
+
+
+def load(driver, url, page, reload=False):
+    """driver.get (or refresh) plus record_page, within the thread's deadline (see deadlines.py)."""
+    timeout = cap(PAGE_LOAD_TIMEOUT)
+    if timeout <= 0:
+        raise DeadlineExceeded(f"load_{page}")
+    # Only pay for the extra round trips when the budget is tighter than the usual limit
+    shortened = timeout < PAGE_LOAD_TIMEOUT
+    if shortened:
+        driver.set_page_load_timeout(timeout)
+    started = time.monotonic()
+    try:
+        if reload:
+            driver.refresh()
+        else:
+            driver.get(url)
+    finally:
+        if shortened:
+            driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    return record_page(driver, page, started)
@@ -0,0 +1,68 @@
+import re
+
+# === RIDE OPTION EXTRACTION (one round trip for the whole product list) ===
+RIDE_ITEM_SELECTOR = "li[data-testid='product_selector.list_item']"
+
+# Tags each product with a stable data-nova-ride handle and returns its visible text,
+# so the list is read with a single execute_script instead of one .text call per item.
+SCRAPE_RIDES_JS = """
+var items = document.querySelectorAll(arguments[0]);
+var stamp = Date.now().toString(36);
+var out = [];
+for (var i = 0; i < items.length; i++) {
+  var el = items[i];
+  var text = (el.innerText || el.textContent || '').trim();
+  if (!text) continue;
+  var handle = el.getAttribute('data-nova-ride');
+  if (!handle) {
+    handle = stamp + '-' + i;
+    el.setAttribute('data-nova-ride', handle);
+  }
+  out.push({index: i, handle: handle, text: text});
+}
+return out;
+"""
+
+# Scrolls to and clicks a product by handle, falling back to its index if React re-rendered it.
+CLICK_RIDE_JS = """
+var el = document.querySelector('[data-nova-ride="' + arguments[0] + '"]')
+  || document.querySelectorAll(arguments[1])[arguments[2]];
+if (!el) return false;
+el.scrollIntoView(true);
+el.click();
+return true;
+"""
+
+_ETA_RE = re.compile(r"\b\d{1,2}:\d{2}\b|\b\d+\s*min", re.IGNORECASE)
+
+
+def parse_ride(record):
+    """Turn a raw {index, handle, text} record into name / price / ETA fields."""
+    lines = [line.strip() for line in record["text"].split("\n") if line.strip()]
+    return {
+        "index": record["index"],
+        "handle": record["handle"],
+        "name": lines[0] if lines else record["text"],
+        "price": next((line for line in lines if "₹" in line), ""),
+        "eta": next((line for line in lines[1:] if _ETA_RE.search(line)), ""),
+        "text": record["text"],
+    }
+
+
+def scrape_ride_options(driver):
+    """Read every listed product in one WebDriver call."""
+    records = driver.execute_script(SCRAPE_RIDES_JS, RIDE_ITEM_SELECTOR) or []
+    return [parse_ride(record) for record in records]
+
+
+def match_ride(options, ride_choice):
+    """Pick the option the rider asked for, by name or by spoken option number."""
+    choice = ride_choice.lower()
+    for position, option in enumerate(options):
+        if choice in option["text"].lower() or str(position + 1) in ride_choice:
+            return option
+    return None
+
+
+def click_ride(driver, option):
+    return bool(driver.execute_script(CLICK_RIDE_JS, option["handle"], RIDE_ITEM_SELECTOR, option["index"]))
@@ -0,0 +1,274 @@
+"""Sticky router for running the backend as several worker processes.
+
+A session's browser lives in one worker process, so every request for a session has to reach that
+worker. `uvicorn --workers N` shares one socket between processes and cannot do that; this router
+starts N uvicorn workers on their own ports and proxies each request to the worker that owns it:
+
+- session and job ids minted by a worker carry its id as a prefix ("w2.3f9c..."), see cluster.py;
+- other ids are looked up in the shared state store, else placed by rendezvous hashing;
+- sessions of a worker that stopped heartbeating are re-homed to a live one, which loads the
+  conversation from the store and reopens the browser on the next utterance (see _rehydrate).
+
+    python router.py --workers 4 --port 8000 --store sqlite:////tmp/nova-state.db
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import os
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from cluster import owner_of
+from logs import get_logger
+from sessions import SESSION_COOKIE, SESSION_HEADER
+from state_store import open_store
+
+log = get_logger("router")
+
+# === ROUTER CONFIG ===
+DEFAULT_STORE = os.getenv("NOVA_STATE_STORE", "sqlite:////tmp/nova-state.db")
+# How long the live worker list is cached between store reads
+WORKERS_REFRESH = 1.0
+# Seconds to wait for a worker's response headers
+UPSTREAM_TIMEOUT = float(os.getenv("NOVA_ROUTER_TIMEOUT", "120"))
+
+# Headers that describe one connection, not the request; never forwarded
+HOP_BY_HOP = {b"connection", b"keep-alive", b"proxy-connection", b"transfer-encoding", b"te", b"trailer",
+              b"upgrade", b"host", b"content-length"}
+
+
+class NoWorkers(Exception):
+    pass
+
+
+class Router:
+    """Picks the worker for a request; the live worker list comes from store heartbeats."""
+
+    def __init__(self, store, refresh=WORKERS_REFRESH):
+        self.store = store
+        self.refresh = refresh
+        self._live = {}
+        self._checked = 0.0
+        self._round_robin = itertools.count()
+        self._lock = threading.Lock()
+
+    def live(self):
+        now = time.monotonic()
+        if now - self._checked > self.refresh:
+            try:
+                workers = self.store.workers()
+            except Exception as e:
+                log.warning("could not read worker heartbeats: %s", e)
+                workers = self._live
+            with self._lock:
+                self._live, self._checked = workers, now
+        return self._live
+
+    def forget(self, worker_id):
+        """Stop routing to a worker until its next heartbeat is read (it refused a connection)."""
+        with self._lock:
+            self._live = {w: url for w, url in self._live.items() if w != worker_id}
+
+    def pick(self, session_id=None, job_id=None):
+        """(worker_id, url) for a request."""
+        live = self.live()
+        if not live:
+            raise NoWorkers()
+        owner = owner_of(job_id) or owner_of(session_id)
+        if owner in live:
+            return owner, live[owner]
+        if session_id:
+            owner = self.store.owner(session_id)
+            if owner not in live:
+                # Rendezvous hashing: stable while the worker set is, and moves only this worker's sessions
+                owner = max(live, key=lambda w: hashlib.sha1(f"{w}:{session_id}".encode()).digest())
+                self.store.set_owner(session_id, owner)
+            return owner, live[owner]
+        workers = sorted(live)
+        owner = workers[next(self._round_robin) % len(workers)]
+        return owner, live[owner]
+
+
+def _session_id(request):
+    # EventSource cannot set headers, so /api/events may carry it as ?session_id=
+    return (request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+            or request.query_params.get("session_id"))
+
+
+def _job_id(path):
+    prefix = "/api/jobs/"
+    return path[len(prefix):].split("/", 1)[0] if path.startswith(prefix) else None
+
+
+async def _read_head(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("worker closed the connection")
+    status = int(status_line.split(b" ", 2)[1])
+    headers = []
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        headers.append((name.strip().lower(), value.strip()))
+    return status, headers
+
+
+async def _chunks(reader, writer):
+    try:
+        while True:
+            size = int((await reader.readline()).split(b";", 1)[0], 16)
+            if size == 0:
+                break
+            yield await reader.readexactly(size)
+            await reader.readexactly(2)
+    finally:
+        writer.close()
+
+
+async def _until_eof(reader, writer):
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            yield data
+    finally:
+        writer.close()
+
+
+async def forward(url, request, body):
+    """Send the request to a worker over HTTP/1.1 and relay the response (streamed if it is)."""
+    target = urlsplit(url)
+    reader, writer = await asyncio.open_connection(target.hostname, target.port)
+    path = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+    head = [f"{request.method} {path} HTTP/1.1".encode("latin-1"),
+            f"Host: {target.netloc}".encode("latin-1"),
+            b"Connection: close",
+            f"Content-Length: {len(body)}".encode("latin-1")]
+    head += [name + b": " + value for name, value in request.headers.raw if name.lower() not in HOP_BY_HOP]
+    if request.client:
+        head.append(f"X-Forwarded-For: {request.client.host}".encode("latin-1"))
+    writer.write(b"\r\n".join(head) + b"\r\n\r\n" + body)
+    await writer.drain()
+    status, headers = await asyncio.wait_for(_read_head(reader), UPSTREAM_TIMEOUT)
+    fields = dict(headers)
+    relayed = [(name, value) for name, value in headers if name not in HOP_BY_HOP]
+    if b"content-length" in fields:
+        data = await reader.readexactly(int(fields[b"content-length"]))
+        writer.close()
+        response = Response(content=data, status_code=status)
+        # raw_headers keeps repeated headers (Set-Cookie) that a dict would merge
+        response.raw_headers = relayed + [(b"content-length", str(len(data)).encode("latin-1"))]
+        return response
+    chunked = b"chunked" in fields.get(b"transfer-encoding", b"").lower()
+    body_iter = _chunks(reader, writer) if chunked else _until_eof(reader, writer)
+    response = StreamingResponse(body_iter, status_code=status)
+    response.raw_headers = relayed
+    return response
+
+
+def create_app(router):
+    app = FastAPI(title="Nova router")
+
+    @app.get("/router/status")
+    def router_status():
+        return {"workers": router.live()}
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"])
+    async def proxy(request: Request, path: str):
+        body = await request.body()
+        session_id, job_id = _session_id(request), _job_id(request.url.path)
+        for _ in range(2):
+            try:
+                worker_id, url = await asyncio.to_thread(router.pick, session_id, job_id)
+            except NoWorkers:
+                return JSONResponse({"detail": "No workers available"}, status_code=503)
+            try:
+                return await forward(url, request, body)
+            except ConnectionRefusedError:
+                # Nothing was sent, so trying another worker is safe
+                log.warning("worker refused connection", extra={"worker": worker_id})
+                router.forget(worker_id)
+            except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                log.warning("worker request failed: %s", e, extra={"worker": worker_id, "path": request.url.path})
+                return JSONResponse({"detail": "Worker unavailable"}, status_code=502)
+        return JSONResponse({"detail": "Worker unavailable"}, status_code=502)
+
+    return app
+
+
+class WorkerSupervisor:
+    """Starts one uvicorn process per worker and restarts any that exit."""
+
+    def __init__(self, count, base_port, app_path, store_url, host="127.0.0.1"):
+        self.specs = [(f"w{i}", host, base_port + i) for i in range(count)]
+        self.app_path = app_path
+        self.store_url = store_url
+        self.processes = {}
+        self._stop = threading.Event()
+
+    def _spawn(self, worker_id, host, port):
+        env = dict(os.environ, NOVA_WORKER_ID=worker_id, NOVA_WORKER_URL=f"http://{host}:{port}",
+                   NOVA_STATE_STORE=self.store_url)
+        command = [sys.executable, "-m", "uvicorn", self.app_path, "--host", host, "--port", str(port),
+                   "--log-level", "warning"]
+        self.processes[worker_id] = subprocess.Popen(command, env=env)
+        log.info("worker started", extra={"worker": worker_id, "port": port})
+
+    def start(self):
+        for spec in self.specs:
+            self._spawn(*spec)
+        threading.Thread(target=self._watch, name="worker-supervisor", daemon=True).start()
+
+    def _watch(self):
+        while not self._stop.wait(1):
+            for spec in self.specs:
+                process = self.processes.get(spec[0])
+                if process is not None and process.poll() is not None:
+                    log.warning("worker exited, restarting", extra={"worker": spec[0], "code": process.returncode})
+                    self._spawn(*spec)
+
+    def stop(self):
+        self._stop.set()
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sticky router in front of N backend worker processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--base-port", type=int, default=8001, help="worker i listens on base-port + i")
+    parser.add_argument("--app", default="main:app", help="ASGI app each worker runs")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="shared state store (sqlite:///path)")
+    args = parser.parse_args()
+    if not args.store.startswith("sqlite:///"):
+        parser.error("workers are separate processes; --store must be a shared sqlite:/// store")
+
+    store = open_store(args.store)
+    supervisor = WorkerSupervisor(args.workers, args.base_port, args.app, args.store)
+    supervisor.start()
+    try:
+        uvicorn.run(create_app(Router(store)), host=args.host, port=args.port)
+    finally:
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    main()
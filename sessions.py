@@ -0,0 +1,285 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from cluster import WORKER_ID, local_id
+from logs import get_logger
+
+log = get_logger("sessions")
+
+# === SESSION CONFIG ===
+SESSION_HEADER = "X-Session-Id"
+# Names whose Firestore cookies and Chrome profile a session uses. Not authenticated here: it must
+# be set by an authenticating layer in front (gateway/proxy) and stripped from client requests.
+# It binds to the session when the session is created; a different value later is rejected.
+USER_HEADER = "X-User-Id"
+SESSION_COOKIE = "nova_session"
+DEFAULT_USER_ID = os.getenv("NOVA_DEFAULT_USER_ID", "test_user")
+SESSION_IDLE_TIMEOUT = float(os.getenv("NOVA_SESSION_IDLE_TIMEOUT", "1800"))
+MAX_SESSIONS = int(os.getenv("NOVA_MAX_SESSIONS", "1000"))
+
+
+def new_session_id():
+    return local_id()
+
+
+class SessionUserMismatch(Exception):
+    """A request named a different user than the one its session belongs to."""
+
+
+# States whose next step expects the booking page to be open in this session's browser
+BROWSER_STATES = ("manual_login_wait", "pickup", "dropoff", "ride_options", "ride_selection", "confirm_booking")
+# States before any booking progress; such sessions are the first to go when the store is full
+OPENING_STATES = ("language_selection", "wake", "command")
+
+
+class Session:
+    """Conversation state for a single rider. Replaces the old global nova_state dict."""
+
+    __slots__ = (
+        "session_id",
+        "user_id",
+        "awake",
+        "waiting_for",  # language_selection | wake | command | login | manual_login_wait | pickup | dropoff | ride_options | ride_selection | confirm_booking
+        "pickup",
+        "dropoff",
+        "driver",
+        "prewarm",  # prewarm.Prewarm readying a browser before the rider asks to book
+        "hibernated",  # snapshot taken when the idle reaper quit the browser (see hibernation.py)
+        "language",
+        "listen_language",
+        "login_started",
+        "ride_options",  # snapshot from rides.scrape_ride_options, reused by selection
+        "selected_ride",
+        "last_seen",
+        "lock",
+    )
+
+    def __init__(self, session_id, user_id=DEFAULT_USER_ID):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.awake = False
+        self.waiting_for = "wake"
+        self.pickup = None
+        self.dropoff = None
+        self.driver = None
+        self.prewarm = None
+        self.hibernated = None
+        self.language = "en"
+        self.listen_language = "en-IN"
+        self.login_started = False
+        self.ride_options = None
+        self.selected_ride = None
+        self.last_seen = time.monotonic()
+        self.lock = threading.RLock()
+
+    def reset(self):
+        """Back to language selection. The caller is responsible for the driver and prewarm."""
+        self.awake = False
+        self.waiting_for = "language_selection"
+        self.pickup = None
+        self.dropoff = None
+        self.driver = None
+        self.prewarm = None
+        self.hibernated = None
+        self.language = "en"
+        self.listen_language = "en-IN"
+        self.login_started = False
+        self.ride_options = None
+        self.selected_ride = None
+
+    # Conversation fields shared through the state store; the driver and locks stay in-process
+    SHARED_FIELDS = ("user_id", "awake", "waiting_for", "pickup", "dropoff", "language", "listen_language",
+                     "ride_options", "selected_ride", "hibernated")
+
+    def to_dict(self):
+        data = {field: getattr(self, field) for field in self.SHARED_FIELDS}
+        if self.hibernated:
+            # Cookies go to Firestore, not the session store
+            data["hibernated"] = {"state": self.hibernated["state"], "cookies": None}
+        return data
+
+    @classmethod
+    def from_dict(cls, session_id, data):
+        """Rebuild a session saved by this or another worker. It has no browser here yet."""
+        session = cls(session_id, data.get("user_id") or DEFAULT_USER_ID)
+        for field in cls.SHARED_FIELDS:
+            if field in data:
+                setattr(session, field, data[field])
+        if session.waiting_for in BROWSER_STATES and session.hibernated is None:
+            # The page lived in another process; replay it on the next step (see main._rehydrate)
+            session.hibernated = {"state": session.waiting_for, "cookies": None}
+        return session
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def idle_for(self, now=None):
+        return (now if now is not None else time.monotonic()) - self.last_seen
+
+    def status(self):
+        return {
+            "awake": self.awake,
+            "waiting_for": self.waiting_for,
+            "pickup": self.pickup,
+            "dropoff": self.dropoff,
+            "language": self.language,
+            "hibernated": self.hibernated is not None,
+        }
+
+
+class SessionStore:
+    """Thread-safe session map with LRU ordering and idle eviction.
+
+    With a state_store (see state_store.py) conversation state is also written through on save()
+    and read back on a miss, so another worker or a restarted one can pick the session up.
+    """
+
+    def __init__(self, idle_timeout=SESSION_IDLE_TIMEOUT, max_sessions=MAX_SESSIONS, on_evict=None, state_store=None):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.on_evict = on_evict
+        self.state_store = state_store
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stop = threading.Event()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id, user_id=None, create=True):
+        """Return the session for session_id, loading or creating it if needed.
+
+        With create=False an unknown session is None (read-only callers must not fill the store).
+        user_id is only applied to a new session; raises SessionUserMismatch if an existing
+        one belongs to someone else.
+        """
+        evicted = []
+        stored = None
+        if self.state_store is not None and self.peek(session_id) is None:
+            try:
+                stored = self.state_store.load(session_id)
+            except Exception as e:
+                log.warning("session store read failed: %s", e, extra={"session_id": session_id})
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                if stored is not None:
+                    session = Session.from_dict(session_id, stored)
+                elif not create:
+                    return None
+                else:
+                    session = Session(session_id, user_id or DEFAULT_USER_ID)
+                self._sessions[session_id] = session
+                if len(self._sessions) > self.max_sessions:
+                    evicted = self._evict_lru_locked(len(self._sessions) - self.max_sessions, keep=session_id)
+            else:
+                self._sessions.move_to_end(session_id)
+            mismatch = bool(user_id) and session.user_id != user_id
+            if not mismatch:
+                session.touch()
+        self._notify(evicted)
+        if mismatch:
+            log.warning("session requested for another user", extra={"session_id": session_id})
+            raise SessionUserMismatch(session_id)
+        return session
+
+    def save(self, session):
+        """Write the conversation state through to the shared store (no-op without one)."""
+        if self.state_store is None:
+            return
+        try:
+            self.state_store.save(session.session_id, session.to_dict(), owner=WORKER_ID)
+        except Exception as e:
+            log.warning("session store write failed: %s", e, extra={"session_id": session.session_id})
+
+    def peek(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def sessions(self):
+        with self._lock:
+            return list(self._sessions.values())
+
+    def evict_idle(self):
+        """Drop sessions idle longer than idle_timeout. Busy sessions are skipped."""
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            for session_id, session in list(self._sessions.items()):
+                if session.idle_for(now) < self.idle_timeout:
+                    # OrderedDict is in LRU order, everything after this is fresher
+                    break
+                if not session.lock.acquire(blocking=False):
+                    continue
+                try:
+                    del self._sessions[session_id]
+                    evicted.append(session)
+                finally:
+                    session.lock.release()
+        self._notify(evicted)
+        return len(evicted)
+
+    def _eviction_tier(self, session, now):
+        """Order in which sessions make room: 0 = nothing to lose, 1 = no browser, 2 = browser
+        but idle past the timeout. None: holds a browser and is in use, never evicted for room."""
+        if session.driver is None and session.prewarm is None:
+            return 0 if session.waiting_for in OPENING_STATES and session.hibernated is None else 1
+        if session.idle_for(now) >= self.idle_timeout:
+            return 2
+        return None
+
+    def _evict_lru_locked(self, count, keep=None):
+        now = time.monotonic()
+        tiers = ([], [], [])
+        for session_id, session in self._sessions.items():
+            tier = None if session_id == keep else self._eviction_tier(session, now)
+            if tier is not None:
+                tiers[tier].append((session_id, session))
+        evicted = []
+        for session_id, session in (entry for tier in tiers for entry in tier):
+            if len(evicted) >= count:
+                break
+            if not session.lock.acquire(blocking=False):
+                continue
+            try:
+                del self._sessions[session_id]
+                evicted.append(session)
+            finally:
+                session.lock.release()
+        if len(evicted) < count:
+            # Better over the limit than dropping a booking that is under way
+            log.warning("session store over capacity", extra={"sessions": len(self._sessions), "max": self.max_sessions})
+        return evicted
+
+    def _notify(self, evicted):
+        if not self.on_evict:
+            return
+        for session in evicted:
+            try:
+                self.on_evict(session)
+            except Exception as e:
+                log.warning("session eviction hook failed: %s", e, extra={"session_id": session.session_id})
+
+    def start_sweeper(self, interval=60):
+        """Evict idle sessions from a daemon thread."""
+        if self._sweeper and self._sweeper.is_alive():
+            return
+
+        def _run():
+            while not self._stop.wait(interval):
+                try:
+                    count = self.evict_idle()
+                    if count:
+                        log.info("evicted idle sessions", extra={"count": count})
+                except Exception as e:
+                    log.warning("session sweeper error: %s", e)
+
+        self._stop.clear()
+        self._sweeper = threading.Thread(target=_run, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
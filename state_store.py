@@ -0,0 +1,140 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# === SHARED STATE STORE CONFIG ===
+# "memory" (one process) or "sqlite:///relative.db" / "sqlite:////absolute/path.db" (shared by
+# every worker on the host)
+STATE_STORE_URL = os.getenv("NOVA_STATE_STORE", "memory")
+# A worker that has not heartbeated for this long is considered gone
+WORKER_TTL = float(os.getenv("NOVA_WORKER_TTL", "15"))
+
+
+class MemoryStateStore:
+    """In-process store: the default, and the stand-in for tests and single-worker runs."""
+
+    def __init__(self):
+        self._sessions = {}  # session_id -> (data, owner, updated)
+        self._workers = {}  # worker_id -> (url, seen)
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+        return dict(entry[0]) if entry else None
+
+    def save(self, session_id, data, owner=""):
+        with self._lock:
+            self._sessions[session_id] = (dict(data), owner, time.time())
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def owner(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+        return entry[1] if entry else None
+
+    def set_owner(self, session_id, owner):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry:
+                self._sessions[session_id] = (entry[0], owner, entry[2])
+
+    def heartbeat(self, worker_id, url):
+        with self._lock:
+            self._workers[worker_id] = (url, time.time())
+
+    def workers(self, ttl=WORKER_TTL):
+        """{worker_id: url} for workers seen within ttl seconds."""
+        cutoff = time.time() - ttl
+        with self._lock:
+            return {worker_id: url for worker_id, (url, seen) in self._workers.items() if seen >= cutoff}
+
+    def prune(self, older_than):
+        """Drop sessions not updated for older_than seconds. Returns how many."""
+        cutoff = time.time() - older_than
+        with self._lock:
+            stale = [sid for sid, (_, _, updated) in self._sessions.items() if updated < cutoff]
+            for sid in stale:
+                del self._sessions[sid]
+        return len(stale)
+
+
+class SQLiteStateStore:
+    """Sessions and worker heartbeats in one SQLite file, shared by worker processes on a host.
+
+    WAL mode lets readers run alongside the single writer; each thread has its own connection.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, owner TEXT NOT NULL DEFAULT '', updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+            conn.execute("CREATE TABLE IF NOT EXISTS workers (worker_id TEXT PRIMARY KEY, url TEXT NOT NULL, seen REAL NOT NULL)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id):
+        row = self._conn().execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, session_id, data, owner=""):
+        self._conn().execute(
+            "INSERT INTO sessions (session_id, data, owner, updated) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, owner = excluded.owner, updated = excluded.updated",
+            (session_id, json.dumps(data, ensure_ascii=False), owner, time.time()),
+        )
+
+    def delete(self, session_id):
+        self._conn().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def owner(self, session_id):
+        row = self._conn().execute("SELECT owner FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def set_owner(self, session_id, owner):
+        self._conn().execute("UPDATE sessions SET owner = ? WHERE session_id = ?", (owner, session_id))
+
+    def heartbeat(self, worker_id, url):
+        self._conn().execute(
+            "INSERT INTO workers (worker_id, url, seen) VALUES (?, ?, ?) "
+            "ON CONFLICT(worker_id) DO UPDATE SET url = excluded.url, seen = excluded.seen",
+            (worker_id, url, time.time()),
+        )
+
+    def workers(self, ttl=WORKER_TTL):
+        rows = self._conn().execute("SELECT worker_id, url FROM workers WHERE seen >= ?", (time.time() - ttl,))
+        return dict(rows.fetchall())
+
+    def prune(self, older_than):
+        cursor = self._conn().execute("DELETE FROM sessions WHERE updated < ?", (time.time() - older_than,))
+        return cursor.rowcount
+
+
+def open_store(url=STATE_STORE_URL):
+    """Build the store named by NOVA_STATE_STORE."""
+    if not url or url == "memory":
+        return MemoryStateStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteStateStore(url[len("sqlite:///"):])
+    raise ValueError(f"unsupported NOVA_STATE_STORE {url!r} (use 'memory' or 'sqlite:///path')")
@@ -0,0 +1,159 @@
+import time
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from deadlines import DeadlineExceeded, cap, check, current
+from metrics import fallbacks, histogram, timeouts
+
+# === EVENT-DRIVEN DOM WAITS ===
+# One async script per wait: checks immediately, then resolves from a MutationObserver
+# (with a tight poll as a backstop) the moment a matching element is ready.
+WAIT_JS = """
+var selectors = arguments[0], mode = arguments[1], timeoutMs = arguments[2], stale = arguments[3] || [];
+var done = arguments[arguments.length - 1];
+function lookup(sel) {
+  if (sel.charAt(0) === '/' || sel.charAt(0) === '(') {
+    return document.evaluate(sel, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+  }
+  var found = document.querySelectorAll(sel);
+  for (var j = 0; j < found.length; j++) {
+    if (stale.indexOf(found[j].textContent) < 0) return found[j];
+  }
+  return null;
+}
+function ready(el) {
+  if (mode === 'present') return true;
+  var r = el.getBoundingClientRect();
+  var visible = r.width > 0 && r.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+  return mode === 'visible' ? visible : visible && !el.disabled && el.getAttribute('aria-disabled') !== 'true';
+}
+function probe() {
+  for (var i = 0; i < selectors.length; i++) {
+    var el = null;
+    try { el = lookup(selectors[i]); } catch (e) {}
+    if (el && ready(el)) return {element: el, index: i};
+  }
+  return null;
+}
+var hit = probe();
+if (hit) { done({element: hit.element, index: hit.index, reason: 'immediate'}); return; }
+var finished = false, observer = null, poll = null, timer = null;
+function finish(result) {
+  if (finished) return;
+  finished = true;
+  if (observer) observer.disconnect();
+  clearInterval(poll);
+  clearTimeout(timer);
+  done(result);
+}
+function check(reason) {
+  var h = probe();
+  if (h) finish({element: h.element, index: h.index, reason: reason});
+}
+observer = new MutationObserver(function () { check('mutation'); });
+observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true, characterData: true});
+poll = setInterval(function () { check('poll'); }, 50);
+timer = setTimeout(function () {
+  finish({element: null, index: -1, reason: document.readyState === 'complete' ? 'not_rendered' : 'page_loading'});
+}, timeoutMs);
+"""
+
+TEXTS_JS = "return Array.prototype.map.call(document.querySelectorAll(arguments[0]), function (e) { return e.textContent; });"
+
+# Spare time for the WebDriver round trip on top of the in-page timeout
+SCRIPT_TIMEOUT_SLACK = 5
+
+wait_seconds = histogram("nova_dom_wait_seconds", "Time spent waiting for the page, per booking step")
+
+
+class WaitTimeout(TimeoutException):
+    """An element did not become ready in time. `reason` says why."""
+
+    def __init__(self, step, selectors, reason, waited):
+        self.step = step
+        self.selectors = selectors
+        self.reason = reason
+        self.waited = waited
+        super().__init__(f"{step}: {selectors} not ready after {waited:.1f}s ({reason})")
+
+
+def _ensure_script_timeout(driver, seconds):
+    current = getattr(driver, "_nova_script_timeout", 0)
+    if current >= seconds:
+        return
+    driver.set_script_timeout(seconds)
+    try:
+        driver._nova_script_timeout = seconds
+    except AttributeError:
+        pass
+
+
+def snapshot_texts(driver, selector):
+    """Text of the elements currently matching selector, to ignore them in a later wait."""
+    try:
+        return driver.execute_script(TEXTS_JS, selector) or []
+    except WebDriverException:
+        return []
+
+
+def wait_for(driver, selectors, timeout=10, mode="clickable", step="wait", exclude_texts=None):
+    """Return the first ready element among selectors (CSS, or XPath starting with '/').
+
+    mode is "present", "visible" or "clickable". exclude_texts skips CSS matches whose
+    textContent is listed (e.g. suggestions that were on screen before typing).
+    Raises WaitTimeout with a reason instead of blocking for a fixed sleep.
+    """
+    return wait_for_match(driver, selectors, timeout, mode, step, exclude_texts)[0]
+
+
+def wait_for_match(driver, selectors, timeout=10, mode="clickable", step="wait", exclude_texts=None):
+    """wait_for, returning (element, index of the selector that matched).
+
+    The timeout is cut to the thread's deadline (see deadlines.py); running out of budget
+    raises DeadlineExceeded rather than WaitTimeout.
+    """
+    if isinstance(selectors, str):
+        selectors = [selectors]
+    check(step)
+    timeout = cap(timeout)
+    started = time.monotonic()
+    outcome = "timeout"
+    try:
+        _ensure_script_timeout(driver, timeout + SCRIPT_TIMEOUT_SLACK)
+        try:
+            result = driver.execute_async_script(WAIT_JS, list(selectors), mode, int(timeout * 1000), exclude_texts or [])
+        except TimeoutException:
+            result = {"element": None, "reason": "script_timeout"}
+        except WebDriverException:
+            # Navigation tore down the page mid-wait; fall back to polling for the time left
+            fallbacks.inc(kind="wait_poll")
+            result = _poll(driver, selectors, mode, started + timeout, exclude_texts)
+        element = (result or {}).get("element")
+        if element is None:
+            deadline = current()
+            if deadline is not None and deadline.expired:
+                outcome = "deadline"
+                raise DeadlineExceeded(step)
+            timeouts.inc(kind="dom_wait")
+            raise WaitTimeout(step, selectors, (result or {}).get("reason", "not_rendered"), time.monotonic() - started)
+        outcome = "ok"
+        return element, (result or {}).get("index", 0)
+    finally:
+        wait_seconds.observe(time.monotonic() - started, step=step, outcome=outcome)
+
+
+def _poll(driver, selectors, mode, deadline, exclude_texts):
+    exclude = set(exclude_texts or [])
+    while time.monotonic() < deadline:
+        for index, selector in enumerate(selectors):
+            by = "xpath" if selector[:1] in ("/", "(") else "css selector"
+            try:
+                for element in driver.find_elements(by, selector):
+                    if exclude and element.get_attribute("textContent") in exclude:
+                        continue
+                    if mode == "present" or (element.is_displayed() and (mode == "visible" or element.is_enabled())):
+                        return {"element": element, "index": index, "reason": "poll"}
+            except WebDriverException:
+                pass
+        time.sleep(0.05)
+    return {"element": None, "reason": "not_rendered"}